@@ -7,6 +7,7 @@ Single-agent workflow for the AI Recall System build engine with automated reset
 - Delegates execution to blueprint_execution.
 - Manages debug log loop with capped retries, two-LLM processing, and state reset.
 - Stages fixes on temporary files, validating before overwriting originals.
+- Waits for its target scripts and ai_coding_guidelines.md to be indexed (not the whole tree) before starting.
 """
 
 import os
@@ -14,12 +15,10 @@ import sys
 import time
 import json
 import logging
-import chromadb
 import subprocess
 import re
 import shutil
 import traceback
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from datetime import datetime
 
 sys.path.append("/mnt/f/projects/ai-recall-system")
@@ -27,9 +26,14 @@ sys.path.append("/mnt/f/projects/ai-recall-system")
 from code_base.agent_manager import AgentManager
 from scripts.aggregator_search import aggregator_search
 from scripts.index_codebase import reindex_single_file
+from scripts.index_manifest import bump_collection_generation, get_manifest
+from scripts.index_priority import readiness, wait_until_ready
+from scripts.recall_daemon import get_chroma_client, get_embed_model
 from scripts.blueprint_execution import BlueprintExecution
 
 # Configure basic logging without correlation_id until it's set
+INDEX_WAIT_SECONDS = 120  # max wait for a cold indexing run to reach the target scripts
+
 logger = logging.getLogger('agent')
 logger.setLevel(logging.DEBUG)
 console_handler = logging.StreamHandler(sys.stdout)
@@ -58,16 +62,13 @@ class BuildAgent:
         self.test_source_dir = f"{self.project_dir}/tests/test_cases"  # Source directory for test scripts
         self.test_scripts_dir = f"{self.project_dir}/code_base/test_scripts"  # Runtime directory for test scripts
         self.debug_log_file = f"{self.project_dir}/logs/DEBUG_LOGS_TEST.JSON"
-        self.embed_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        # Warm embedder + client from the recall daemon if it is running, else in-process
+        self.embed_model = get_embed_model()
+        chroma_client = get_chroma_client(f"{self.project_dir}/chroma_db")
         self.collections = {
-            "execution_logs": chromadb.PersistentClient(path=f"{self.project_dir}/chroma_db").get_or_create_collection("execution_logs"),
-            "blueprint_versions": chromadb.PersistentClient(path=f"{self.project_dir}/chroma_db").get_or_create_collection("blueprint_versions"),
-            "blueprint_revisions": chromadb.PersistentClient(path=f"{self.project_dir}/chroma_db").get_or_create_collection("blueprint_revisions"),
-            "knowledge_base": chromadb.PersistentClient(path=f"{self.project_dir}/chroma_db").get_or_create_collection("knowledge_base"),
-            "work_sessions": chromadb.PersistentClient(path=f"{self.project_dir}/chroma_db").get_or_create_collection("work_sessions"),
-            "blueprints": chromadb.PersistentClient(path=f"{self.project_dir}/chroma_db").get_or_create_collection("blueprints"),
-            "debugging_logs": chromadb.PersistentClient(path=f"{self.project_dir}/chroma_db").get_or_create_collection("debugging_logs"),
-            "project_codebase": chromadb.PersistentClient(path=f"{self.project_dir}/chroma_db").get_or_create_collection("project_codebase")
+            name: chroma_client.get_or_create_collection(name)
+            for name in ("execution_logs", "blueprint_versions", "blueprint_revisions", "knowledge_base",
+                         "work_sessions", "blueprints", "debugging_logs", "project_codebase")
         }
         self.blueprint_executor = BlueprintExecution(agent_manager=self.agent_manager, test_mode=self.test_mode, collections=self.collections)
         self.debug_logs = []
@@ -115,15 +116,53 @@ class BuildAgent:
             documents=[json.dumps(data)],
             metadatas=[meta]
         )
+        # cached search results over this collection are stale now
+        bump_collection_generation(collection.name, f"{self.project_dir}/chroma_db")
         logger.info(f"Logged entry '{entry_id}' to {collection_name}", extra={'correlation_id': self.correlation_id})
 
-    def retrieve_context(self, query):
-        """Retrieve context for the query using aggregator_search."""
+    def lookup_function_chunk(self, script_path, line_no):
+        """
+        Fetch the indexed chunk (function/method/class body) of script_path that contains line_no,
+        straight from project_codebase metadata instead of a similarity search.
+        """
+        collection = self.collections["project_codebase"]
+        where = {"$and": [
+            {"filepath": script_path},
+            {"start_line": {"$lte": int(line_no)}},
+            {"end_line": {"$gte": int(line_no)}}
+        ]}
+        try:
+            results = collection.get(where=where, include=["documents", "metadatas"])
+            if not results.get("ids"):
+                # Script not indexed yet (e.g. just reset from tests/test_cases): index it once and retry
+                reindex_single_file(script_path, collection, self.embed_model)
+                results = collection.get(where=where, include=["documents", "metadatas"])
+        except Exception as e:
+            logger.warning(f"Function lookup failed for {script_path}:{line_no}: {e}", extra={'correlation_id': self.correlation_id})
+            return None
+        matches = list(zip(results.get("documents") or [], results.get("metadatas") or []))
+        if not matches:
+            return None
+        # Prefer the narrowest symbol chunk (a method over its class body)
+        doc, meta = min(matches, key=lambda m: (m[1].get("function_name", "") == "", m[1]["end_line"] - m[1]["start_line"]))
+        logger.debug(f"Function lookup for {script_path}:{line_no} -> {meta.get('qualified_name') or meta.get('node_type')} "
+                     f"(lines {meta['start_line']}-{meta['end_line']})", extra={'correlation_id': self.correlation_id})
+        return doc
+
+    def retrieve_context(self, query, script_path=None, line_no=None):
+        """Retrieve context for the query using aggregator_search, led by the failing function's chunk when known."""
         try:
+            function_context = []
+            if script_path and line_no:
+                function_chunk = self.lookup_function_chunk(script_path, line_no)
+                if function_chunk:
+                    function_context = [function_chunk]
             results = aggregator_search(query, top_n=3, mode="guidelines_code")
+            if results.partial:
+                logger.warning(f"Partial context for query '{query}': skipped {results.skipped}", extra={'correlation_id': self.correlation_id})
             guidelines_context = [r["document"] for r in results if r.get("metadata", {}).get("filename") == "ai_coding_guidelines.md"]
             code_context = [r["document"] for r in results if r.get("metadata", {}).get("filename", "").endswith(".py")]
-            context = "\n".join(guidelines_context[:1] + code_context[:2])
+            context = "\n".join(function_context + guidelines_context[:1] + code_context[:2 - len(function_context)])
             if not context:
                 logger.warning(f"No relevant context (guidelines or Python code) found for query: {query}", extra={'correlation_id': self.correlation_id})
                 guidelines_results = aggregator_search(query, top_n=1, mode="guidelines_code")
@@ -198,11 +237,65 @@ class BuildAgent:
         logger.debug(f"Reset debug logs to: {json.dumps(debug_logs, indent=4)}", extra={'correlation_id': self.correlation_id})
         logger.info("Reset test scripts and debug logs to initial states.", extra={'correlation_id': self.correlation_id})
 
+    def target_script_paths(self):
+        """Runtime paths of the scripts named by unresolved debug logs."""
+        try:
+            with open(self.debug_log_file, "r") as f:
+                logs = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read debug logs for index wait: {e}", extra={'correlation_id': self.correlation_id})
+            return []
+        paths = []
+        for log in logs:
+            stack_trace = log.get("stack_trace", "")
+            if log.get("resolved", False) or "'" not in stack_trace:
+                continue
+            path = os.path.join(self.test_scripts_dir, stack_trace.split("'")[1])
+            if os.path.exists(path) and path not in paths:
+                paths.append(path)
+        return paths
+
+    def guidelines_indexed(self):
+        try:
+            found = self.collections["knowledge_base"].get(where={"filename": "ai_coding_guidelines.md"}, limit=1, include=[])
+        except Exception as e:
+            logger.warning(f"Guidelines lookup failed: {e}", extra={'correlation_id': self.correlation_id})
+            return False
+        return bool(found.get("ids"))
+
+    def wait_for_index(self, timeout=INDEX_WAIT_SECONDS):
+        """
+        Waits for the scripts this run will repair and ai_coding_guidelines.md to be indexed,
+        logging overall readiness while a cold indexing run is in progress. Scripts still
+        pending when the run ends (or at the timeout) are indexed directly.
+        """
+        manifest = get_manifest(f"{self.project_dir}/chroma_db")
+        collection = self.collections["project_codebase"]
+        deadline = time.time() + timeout
+
+        def log_wait(status, pending):
+            logger.info(f"Waiting for index: project_codebase {status['fraction']:.0%} indexed, "
+                        f"{len(pending)} target script(s) pending", extra={'correlation_id': self.correlation_id})
+
+        pending = wait_until_ready(self.target_script_paths(), collection, manifest, timeout, poll_seconds=1.0, on_wait=log_wait)
+        for script_path in pending:
+            logger.info(f"Indexing target script directly: {script_path}", extra={'correlation_id': self.correlation_id})
+            reindex_single_file(script_path, collection, self.embed_model, manifest=manifest)
+
+        while not self.guidelines_indexed():
+            status = readiness(manifest, "knowledge_base")
+            if not status["running"] or time.time() >= deadline:
+                logger.warning("ai_coding_guidelines.md is not indexed; continuing without it", extra={'correlation_id': self.correlation_id})
+                break
+            logger.info(f"Waiting for index: knowledge_base {status['fraction']:.0%} indexed", extra={'correlation_id': self.correlation_id})
+            time.sleep(1.0)
+
     def run(self):
         """Run the agent to process unresolved issues with retry logic."""
         logger.info("Starting Build Agent with blueprint-driven execution and RAG for ai_coding_guidelines.md...", extra={'correlation_id': self.correlation_id})
         
         self.reset_state()
+        self.wait_for_index()
         
         blueprint_path = f"{self.project_dir}/blueprints/agent_blueprint_v1.json"
         if not os.path.exists(blueprint_path):
@@ -242,7 +335,12 @@ class BuildAgent:
                 with open(script_path, "r") as f:
                     script_content = f.read()
 
-                context = self.retrieve_context(f"{error} in {script_name}")
+                line_match = re.search(r"line (\d+)", stack_trace)
+                context = self.retrieve_context(
+                    f"{error} in {script_name}",
+                    script_path=script_path,
+                    line_no=int(line_match.group(1)) if line_match else None
+                )
                 logger.info(f"Filtered context for {error_id} (guidelines + Python, max 1000 chars): {context}...", extra={'correlation_id': self.correlation_id})
 
                 task_prompt = (
@@ -25,6 +25,7 @@ sys.path.append("/mnt/f/projects/ai-recall-system")
 
 from code_base.network_utils import detect_api_url
 from code_base.test_case_generator import get_error_handler
+from scripts.index_throttle import llm_request
 
 # Configure basic logging without correlation_id until it's set
 logger = logging.getLogger('agent_manager')
@@ -328,17 +329,19 @@ if __name__ == "__main__":
                 "Use try/except for ZeroDivisionError or KeyError ONLY, returning None in except, NO returns outside except. "
                 "For KeyError at line 8 in process_data, ensure the function raises a KeyError when the key is missing to be caught by the except block. STRICT ADHERENCE REQUIRED."
             )
-            response = requests.post(
-                self.api_url,
-                json={
-                    "model": model,
-                    "messages": [{"role": "user", "content": full_prompt}],
-                    "max_tokens": 2048,
-                    "temperature": 0.01,
-                    "top_p": 0.9
-                },
-                timeout=timeout
-            )
+            # Background indexers pause while this marker exists (scripts/index_throttle.py)
+            with llm_request(timeout):
+                response = requests.post(
+                    self.api_url,
+                    json={
+                        "model": model,
+                        "messages": [{"role": "user", "content": full_prompt}],
+                        "max_tokens": 2048,
+                        "temperature": 0.01,
+                        "top_p": 0.9
+                    },
+                    timeout=timeout
+                )
             response.raise_for_status()
             response_text = response.json().get("choices", [{}])[0].get("message", {}).get("content", "").strip()
             code_match = re.search(r"```(?:python)?\s*([\s\S]*?)\s*```", response_text, re.DOTALL)
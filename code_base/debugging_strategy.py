@@ -2,10 +2,15 @@ import json
 import datetime
 import hashlib
 import os
+import sys
 import logging
 
 import chromadb  # For storing snippet strategies in Chroma
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.index_manifest import bump_collection_generation
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -101,6 +106,7 @@ class DebuggingStrategy:
                     documents=[doc_json],
                     metadatas=[metadata]
                 )
+            bump_collection_generation(self.strategies_collection_name)
             logging.info(f"Synced strategy doc ID '{doc_id}' to Chroma collection '{self.strategies_collection_name}'.")
         except Exception as e:
             logging.error(f"Failed to sync strategy with Chroma: {e}")
@@ -13,6 +13,8 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Add the parent directory of code_base to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from scripts.index_manifest import bump_collection_generation
+
 from .agent_manager import AgentManager
 from .debugging_strategy import DebuggingStrategy  # [NEW] We import it here so we can link them
 
@@ -105,6 +107,7 @@ class SingleAgentWorkflow:
                     metadatas=[metadata]
                 )
                 logging.info(f"Added new log entry '{entry['id']}' to Chroma collection '{self.debug_collection_name}'.")
+            bump_collection_generation(self.debug_collection_name)
         except Exception as e:
             logging.error(f"Failed to sync debug log with Chroma: {e}")
 
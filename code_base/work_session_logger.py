@@ -5,6 +5,8 @@ import traceback
 
 import chromadb
 
+from scripts.index_manifest import bump_collection_generation
+
 from .network_utils import detect_api_url
 
 class WorkSessionLogger:
@@ -48,6 +50,7 @@ class WorkSessionLogger:
             ids=[timestamp],
             documents=[json.dumps(log_entry)]
         )
+        bump_collection_generation(self.collection.name)
 
         # Format for Markdown
         markdown_entry = f"## [{timestamp}] {task}\n"
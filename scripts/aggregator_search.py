@@ -6,14 +6,45 @@ We unify embedding + naive results in "both" mode, but we deduplicate if the
 same doc_id / same collection is found from both approaches, picking the one
 with the lower distance so the doc appears only once in final output.
 
+Query embeddings go through the persistent embedding cache (scripts/embeddings.py),
+so a repeated query never reloads or re-runs the model.
+When scripts/recall_daemon.py is running, the whole search runs in the daemon against its
+warm model and Chroma client; otherwise it runs in-process (chromadb is only imported then)
+on a process-wide AggregatorSearcher that keeps its client, embedder and collection
+handles between calls.
+Each result's source file gets a retrieval hit in the index manifest, so frequently
+retrieved files are indexed early on a cold run (scripts/index_priority.py).
+Naive / both mode substring matches come from the trigram index next to chroma_db
+(scripts/lexical_index.py) and only the matching documents are fetched, instead of
+pulling and lowercasing every document of every collection per query.
+Hybrid / guidelines_code modes rank with reciprocal-rank fusion instead: the vector
+neighbours and the BM25 keyword hits of the same lexical index are each ranked, and a
+document scores sum(weight / (RRF_K + rank)) over both lists (FUSION_WEIGHTS per mode),
+so a strong keyword match can outrank a mediocre vector hit. In "both" mode substring
+hits always rank below every vector hit (distance 9.0 + rank).
+Each collection's hits are cached per (query, top_n, mode) with the collection's
+generation from the index manifest (scripts/query_cache.py); a repeated query only
+searches the collections written to since, and not even the embedder if none were.
+
 Usage:
-   python aggregator_search.py "division error" [top_n] [--mode naive|both|guidelines_code]
+   python aggregator_search.py "division error" [top_n] [--mode naive|both|hybrid|guidelines_code]
 """
 
+import os
 import sys
-import chromadb
+import time
 import logging
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.recall_daemon import RecallDaemonError, daemon_client, get_embed_model, local_chroma_client
+from scripts.index_manifest import get_manifest
+from scripts.lexical_index import SYNC_PAGE_SIZE, get_lexical_index
+from scripts.query_cache import QUERY_CACHE_ENABLED, QueryCache
 CHROMA_PATH = "/mnt/f/projects/ai-recall-system/chroma_db"
 
 COLLECTIONS_TO_QUERY = [
@@ -27,6 +58,20 @@ COLLECTIONS_TO_QUERY = [
     "blueprint_versions",
 ]
 
+SEARCH_WORKERS = 8                  # collections searched at once
+SEARCH_DEADLINE_SECONDS = 10.0      # whole search; later collections are skipped
+COLLECTION_TIMEOUT_SECONDS = 5.0    # one collection's query (+ naive scan) once it starts
+POLL_SECONDS = 0.25
+
+SEARCH_MODES = ("naive", "both", "hybrid", "guidelines_code")   # besides the default "embedding"
+EMBEDDING_MODES = ("embedding", "both", "hybrid", "guidelines_code")
+# Reciprocal-rank fusion per mode: weight of the vector ranking and of the BM25 keyword ranking
+FUSION_WEIGHTS = {
+    "hybrid": {"vector": 1.0, "keyword": 1.0},
+    "guidelines_code": {"vector": 1.0, "keyword": 0.5},
+}
+RRF_K = 60                          # damps the head of each ranking (standard RRF constant)
+
 # Configure logging
 logging.basicConfig(
     level=logging.DEBUG,
@@ -63,30 +108,161 @@ def naive_substring_search(docs_dict, query, coll_name):
     logger.debug(f"Naive search in {coll_name} found {len(results)} matches for query '{query}'")
     return results
 
-def aggregator_search(query, top_n=3, mode="embedding"):
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    emb_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+def reciprocal_rank_fusion(results, weights, k=RRF_K):
+    """
+    Orders result dicts by weighted reciprocal-rank fusion of their "vector_distance"
+    (lower is better) and "bm25" (bm25(): lower is better) values; a result missing one
+    of them is simply absent from that ranking. Sets "fusion_score" on each result and
+    returns them best first (ties keep their input order).
+    """
+    import numpy as np
+
+    if not results:
+        return []
+    scores = np.zeros(len(results))
+    for key, weight in (("vector_distance", weights.get("vector", 0.0)), ("bm25", weights.get("keyword", 0.0))):
+        if not weight:
+            continue
+        values = np.array([r.get(key, np.inf) for r in results], dtype=float)
+        ranks = np.empty(len(values))
+        ranks[np.argsort(values, kind="stable")] = np.arange(1, len(values) + 1)
+        scores += np.where(np.isfinite(values), weight / (k + ranks), 0.0)
+    fused = []
+    for i in np.argsort(-scores, kind="stable"):
+        results[i]["fusion_score"] = float(scores[i])
+        fused.append(results[i])
+    return fused
+
+def record_retrievals(results, chroma_path=None):
+    """Counts a retrieval hit per (collection, filepath) of the results in the index manifest."""
+    chroma_path = chroma_path or CHROMA_PATH
+    if not os.path.isdir(chroma_path):
+        return
+    by_collection = {}
+    for r in results:
+        filepath = (r.get("metadata") or {}).get("filepath")
+        if filepath:
+            by_collection.setdefault(r["collection"], set()).add(filepath)
+    try:
+        manifest = get_manifest(chroma_path)
+        for coll_name, filepaths in by_collection.items():
+            manifest.record_retrievals(coll_name, sorted(filepaths))
+    except Exception as e:
+        logger.warning(f"Could not record retrievals: {e}")
+
+class SearchResults(list):
+    """
+    Search results (a list of result dicts) plus .skipped: {collection: reason} for
+    collections that failed or timed out, so callers can tell partial results apart.
+    """
+
+    def __init__(self, results=(), skipped=None):
+        super().__init__(results)
+        self.skipped = dict(skipped or {})
 
-    combined_map = {}  # key=(collection, doc_id), value= best record
-    fetch_count = top_n * 3 if mode in ("embedding", "both", "guidelines_code") else 0
+    @property
+    def partial(self):
+        return bool(self.skipped)
 
-    if mode in ("embedding", "both", "guidelines_code"):
-        query_embed = emb_model.embed_query(query)
-        logger.debug(f"Embedded query '{query}' with shape {len(query_embed)}")
+class AggregatorSearcher:
+    """
+    Keeps a Chroma client, an embedder and the collection handles for the life of the
+    process, so a search only pays for the queries themselves.
+    client / emb_model default to an in-process PersistentClient on chroma_path and
+    get_embed_model(), created on first use. Handles are cached per collection name;
+    one whose query fails is dropped and fetched again once (the collection may have
+    been deleted and recreated by an indexer).
+    Collections are searched concurrently on a bounded thread pool. A collection that
+    errors, runs past collection_timeout or misses the overall deadline is skipped and
+    the search returns what the others found (see SearchResults.skipped); a timed-out
+    query cannot be interrupted and finishes in the background.
+    cache: a QueryCache for per-collection hits (default: a new one unless
+    RECALL_QUERY_CACHE=0); it is only used when chroma_path holds an index manifest,
+    whose generation counters tell when a cached entry went stale.
+    """
+
+    def __init__(self, client=None, emb_model=None, chroma_path=None, max_workers=SEARCH_WORKERS,
+                 deadline=SEARCH_DEADLINE_SECONDS, collection_timeout=COLLECTION_TIMEOUT_SECONDS, cache=None):
+        self.chroma_path = chroma_path or CHROMA_PATH
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.collection_timeout = collection_timeout
+        self.cache = cache if cache is not None else (QueryCache() if QUERY_CACHE_ENABLED else None)
+        self._client = client
+        self._emb_model = emb_model
+        self._collections = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = local_chroma_client(self.chroma_path)
+            return self._client
 
-    for coll_name in COLLECTIONS_TO_QUERY:
+    @property
+    def emb_model(self):
+        with self._lock:
+            if self._emb_model is None:
+                self._emb_model = get_embed_model()
+            return self._emb_model
+
+    def collection(self, coll_name):
+        """The cached handle for `coll_name`, or None if it cannot be opened."""
+        with self._lock:
+            coll = self._collections.get(coll_name)
+        if coll is not None:
+            return coll
         try:
-            coll = client.get_or_create_collection(coll_name)
+            coll = self.client.get_or_create_collection(coll_name)
         except Exception as e:
             logger.error(f"Could not access collection '{coll_name}': {e}")
-            continue
+            return None
+        with self._lock:
+            return self._collections.setdefault(coll_name, coll)
+
+    def forget(self, coll_name=None):
+        """Drops one cached handle (or all), e.g. after the collection was deleted."""
+        with self._lock:
+            if coll_name is None:
+                self._collections.clear()
+            else:
+                self._collections.pop(coll_name, None)
 
-        if mode in ("embedding", "both", "guidelines_code"):
+    def _call(self, coll_name, method, **kwargs):
+        """coll.<method>(**kwargs), retried once on a fresh handle (raises if both attempts fail)."""
+        for attempt in (1, 2):
+            coll = self.collection(coll_name)
+            if coll is None:
+                raise RuntimeError(f"Could not access collection '{coll_name}'")
             try:
-                res = coll.query(query_embeddings=[query_embed], n_results=fetch_count)
-            except Exception as e:
-                logger.error(f"Error (embedding) in '{coll_name}': {e}")
-                res = None
+                return getattr(coll, method)(**kwargs)
+            except Exception:
+                self.forget(coll_name)
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        """Stops the thread pool (a timed-out query still finishes in the background)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="aggregator_search")
+            return self._pool
+
+    def _search_collection(self, coll_name, query, mode, query_embed, fetch_count, started):
+        """All hits from one collection, best distance per doc_id (runs on the pool)."""
+        started[coll_name] = time.monotonic()
+        found = {}
+        fusion = FUSION_WEIGHTS.get(mode)
+        if mode in EMBEDDING_MODES:
+            res = self._call(coll_name, "query", query_embeddings=[query_embed], n_results=fetch_count)
 
             if res and "documents" in res and res["documents"]:
                 docs = res["documents"][0]
@@ -109,61 +285,291 @@ def aggregator_search(query, top_n=3, mode="embedding"):
                     # Force naive-only docs to rank via substring
                     if meta.get("naive_only", False) and dist < 9.0:
                         dist = 9.0
-                    key = (coll_name, doc_id)
-                    if key not in combined_map or dist < combined_map[key]["distance"]:
-                        combined_map[key] = {
+                    if doc_id not in found or dist < found[doc_id]["distance"]:
+                        found[doc_id] = {
                             "collection": coll_name,
                             "doc_id": doc_id,
                             "distance": dist,
                             "document": doc_text,
                             "metadata": meta
                         }
-                logger.debug(f"Embedding search in {coll_name} added {len([k for k in combined_map.keys() if k[0] == coll_name])} unique docs")
+                        if fusion and dist < 9.0:
+                            found[doc_id]["vector_distance"] = dist
+                logger.debug(f"Embedding search in {coll_name} added {len(found)} unique docs")
 
-        if mode in ("naive", "both"):
-            try:
-                naive_docs = coll.get(limit=9999)
-            except Exception as e:
-                logger.error(f"Error (naive get) in '{coll_name}': {e}")
-                naive_docs = None
+        if fusion and fusion.get("keyword"):
+            for r in self._keyword_search(coll_name, query, fetch_count, found):
+                found.setdefault(r["doc_id"], r)["bm25"] = r["bm25"]
+            logger.debug(f"Keyword search in {coll_name} added {len(found)} unique docs")
 
-            if naive_docs and "documents" in naive_docs and naive_docs["documents"]:
-                naive_results = naive_substring_search(naive_docs, query, coll_name)
+        if mode in ("naive", "both"):
+            naive_results = self._naive_search(coll_name, query, fetch_count)
+            if naive_results:
                 for r in naive_results:
-                    key = (r["collection"], r["doc_id"])
-                    if key not in combined_map or r["distance"] < combined_map[key]["distance"]:
-                        combined_map[key] = r
-                logger.debug(f"Naive search in {coll_name} added {len([k for k in combined_map.keys() if k[0] == coll_name])} unique docs")
-
-    combined_list = list(combined_map.values())
-    combined_list.sort(key=lambda x: x["distance"])
-
-    # Filter for guidelines_code mode
-    if mode == "guidelines_code":
-        combined_list = [r for r in combined_list if 
-                        (r["metadata"].get("filename", "").endswith(".md") or 
-                         r["metadata"].get("filename", "").endswith(".py"))]
-        logger.debug(f"Filtered to {len(combined_list)} guidelines/code docs for mode 'guidelines_code'")
-
-    # Ensure ai_coding_guidelines.md is included if available
-    if mode == "guidelines_code" and combined_list:
-        for r in combined_list:
-            if r["metadata"].get("filename") == "ai_coding_guidelines.md":
-                logger.debug(f"Ensuring ai_coding_guidelines.md inclusion")
-                break
+                    if r["doc_id"] not in found or r["distance"] < found[r["doc_id"]]["distance"]:
+                        found[r["doc_id"]] = r
+                logger.debug(f"Naive search in {coll_name} added {len(found)} unique docs")
+        return list(found.values())
+
+    def _sync_lexical(self, lexical, coll_name):
+        """
+        Catches the lexical index up with the collection at its manifest generation. If the
+        sync picked up documents, results cached before it may miss them, so the generation
+        is bumped as well (the index already holds that new generation).
+        """
+        manifest = get_manifest(self.chroma_path)
+        generation = manifest.generations([coll_name])[coll_name]
+        if any(lexical.sync_collection(self.collection(coll_name), generation=generation)):
+            lexical.advance_generation(coll_name, manifest.bump_generation(coll_name))
+
+    def _naive_search(self, coll_name, query, limit):
+        """
+        Substring hits (distance 9.0 + rank) from the lexical index, fetched by id; the index
+        is caught up with the collection first. Without an index the documents are scanned.
+        """
+        lexical = get_lexical_index(self.chroma_path)
+        if lexical is None:
+            return naive_substring_search(self._scan_documents(coll_name), query, coll_name)[:limit]
+        self._sync_lexical(lexical, coll_name)
+        ids = lexical.substring_search(coll_name, query, limit=limit)
+        if not ids:
+            return []
+        found = self._call(coll_name, "get", ids=ids, include=["documents", "metadatas"])
+        by_id = {doc_id: (doc, meta) for doc_id, doc, meta in
+                 zip(found.get("ids") or [], found.get("documents") or [], found.get("metadatas") or [])}
+        results = []
+        for doc_id in (i for i in ids if i in by_id):
+            doc_text, meta = by_id[doc_id]
+            results.append({
+                "collection": coll_name,
+                "doc_id": doc_id,
+                "distance": 9.0 + len(results),
+                "document": doc_text,
+                "metadata": meta if isinstance(meta, dict) else {}
+            })
+        logger.debug(f"Naive search in {coll_name} found {len(results)} matches for query '{query}' (lexical index)")
+        return results
+
+    def _keyword_search(self, coll_name, query, limit, found):
+        """
+        BM25 hits from the lexical index as result dicts with a "bm25" score (distance
+        9.0 + rank); only documents not already in `found` are fetched. Empty without an index.
+        """
+        lexical = get_lexical_index(self.chroma_path)
+        if lexical is None:
+            return []
+        self._sync_lexical(lexical, coll_name)
+        scored = lexical.keyword_search(coll_name, query, limit=limit)
+        missing = [doc_id for doc_id, _ in scored if doc_id not in found]
+        by_id = {}
+        if missing:
+            fetched = self._call(coll_name, "get", ids=missing, include=["documents", "metadatas"])
+            by_id = {doc_id: (doc, meta) for doc_id, doc, meta in
+                     zip(fetched.get("ids") or [], fetched.get("documents") or [], fetched.get("metadatas") or [])}
+        results = []
+        for rank, (doc_id, score) in enumerate(scored):
+            if doc_id in found:
+                results.append({"doc_id": doc_id, "bm25": score})
+            elif doc_id in by_id:
+                doc_text, meta = by_id[doc_id]
+                results.append({
+                    "collection": coll_name,
+                    "doc_id": doc_id,
+                    "distance": 9.0 + rank,
+                    "document": doc_text,
+                    "metadata": meta if isinstance(meta, dict) else {},
+                    "bm25": score
+                })
+        return results
+
+    def _scan_documents(self, coll_name):
+        """Every document of the collection, read page by page (fallback without a lexical index)."""
+        docs = {"ids": [], "documents": [], "metadatas": []}
+        offset = 0
+        while True:
+            page = self._call(coll_name, "get", limit=SYNC_PAGE_SIZE, offset=offset) or {}
+            for key in docs:
+                docs[key].extend(page.get(key) or [])
+            if len(page.get("ids") or []) < SYNC_PAGE_SIZE:
+                return docs
+            offset += SYNC_PAGE_SIZE
+
+    def _generations(self, collections):
+        """{coll_name: generation} from the index manifest, or None (no cache / no manifest)."""
+        if self.cache is None or not os.path.isdir(self.chroma_path):
+            return None
+        try:
+            return get_manifest(self.chroma_path).generations(collections)
+        except Exception as e:
+            logger.warning(f"Could not read collection generations, not caching: {e}")
+            return None
+
+    def _fan_out(self, collections, query, mode, query_embed, fetch_count):
+        """
+        Runs _search_collection for every collection on the pool. Returns
+        ({coll_name: hits}, {coll_name: reason}, {coll_name: seconds}) for the collections
+        that answered, those skipped (error, per-collection timeout, or the global deadline)
+        and how long each answering collection took.
+        """
+        deadline = time.monotonic() + self.deadline
+        started = {}
+        pool = self._executor()
+        futures = {pool.submit(self._search_collection, name, query, mode, query_embed, fetch_count, started): name
+                   for name in collections}
+        hits, skipped, timings = {}, {}, {}
+        pending = set(futures)
+        while pending:
+            # wake up for the earliest per-collection timeout or the deadline
+            now = time.monotonic()
+            wake = min([deadline] + [started[futures[f]] + self.collection_timeout
+                                     for f in pending if futures[f] in started])
+            done, _ = wait(pending, timeout=max(0.0, min(wake - now, POLL_SECONDS)), return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                try:
+                    hits[futures[future]] = future.result()
+                    timings[futures[future]] = time.monotonic() - started[futures[future]]
+                except Exception as e:
+                    skipped[futures[future]] = f"error: {e}"
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                if now >= deadline:
+                    future.cancel()
+                    skipped[name] = f"missed the {self.deadline:.1f}s search deadline"
+                elif name in started and now - started[name] >= self.collection_timeout:
+                    skipped[name] = f"timed out after {self.collection_timeout:.1f}s"
+                else:
+                    continue
+                pending.discard(future)
+        for name, reason in skipped.items():
+            logger.warning(f"Skipped collection '{name}' in search: {reason}")
+        return hits, skipped, timings
+
+    def search(self, query, top_n=3, mode="embedding", collections=None):
+        """
+        collections: names to search (defaults to COLLECTIONS_TO_QUERY, read per call).
+        Collections are searched concurrently; returns SearchResults (a list of up to top_n
+        result dicts: collection, doc_id, distance, document, metadata) whose .skipped maps
+        each collection that failed or timed out to the reason.
+        Collections whose hits for this query are cached at their current generation are
+        not searched again.
+        """
+        if collections is None:
+            collections = list(COLLECTIONS_TO_QUERY)
+        combined_map = {}  # key=(collection, doc_id), value= best record
+        fetch_count = top_n * 3  # per collection: embedding neighbours / substring hits
+
+        generations = self._generations(collections)
+        hits, to_search, found = {}, [], {}
+        for coll_name in collections:
+            cached = None
+            if generations is not None:
+                cached = self.cache.get((coll_name, query, top_n, mode), generations[coll_name])
+            if cached is None:
+                to_search.append(coll_name)
+            else:
+                hits[coll_name] = [dict(r) for r in cached]
+
+        skipped = {}
+        if to_search:
+            query_embed = None
+            embed_seconds = 0.0
+            if mode in EMBEDDING_MODES:
+                start = time.monotonic()
+                query_embed = self.emb_model.embed_query(query)
+                embed_seconds = time.monotonic() - start
+                logger.debug(f"Embedded query '{query}' with shape {len(query_embed)}")
+
+            found, skipped, timings = self._fan_out(to_search, query, mode, query_embed, fetch_count)
+            hits.update(found)
+            if generations is not None:
+                for coll_name, coll_hits in found.items():
+                    # cost: what a hit saves, this collection's search plus its share of the embedding
+                    self.cache.put((coll_name, query, top_n, mode), generations[coll_name],
+                                   [dict(r) for r in coll_hits], timings[coll_name] + embed_seconds / len(to_search))
         else:
-            # If not found, prioritize any guideline
+            logger.debug(f"All {len(collections)} collection(s) answered from the query cache for '{query}'")
+
+        for coll_name in collections:
+            for r in hits.get(coll_name, []):
+                combined_map[(coll_name, r["doc_id"])] = r
+
+        combined_list = list(combined_map.values())
+        combined_list.sort(key=lambda x: x["distance"])
+        if mode in FUSION_WEIGHTS:
+            combined_list = reciprocal_rank_fusion(combined_list, FUSION_WEIGHTS[mode])
+
+        # Filter for guidelines_code mode
+        if mode == "guidelines_code":
+            combined_list = [r for r in combined_list if 
+                            (r["metadata"].get("filename", "").endswith(".md") or 
+                             r["metadata"].get("filename", "").endswith(".py"))]
+            logger.debug(f"Filtered to {len(combined_list)} guidelines/code docs for mode 'guidelines_code'")
+
+        # Ensure ai_coding_guidelines.md is included if available
+        if mode == "guidelines_code" and combined_list:
             for r in combined_list:
-                if r["metadata"].get("filename", "").endswith(".md"):
-                    logger.debug(f"Ensuring guideline inclusion, added {r['metadata'].get('filename')}")
+                if r["metadata"].get("filename") == "ai_coding_guidelines.md":
+                    logger.debug(f"Ensuring ai_coding_guidelines.md inclusion")
                     break
+            else:
+                # If not found, prioritize any guideline
+                for r in combined_list:
+                    if r["metadata"].get("filename", "").endswith(".md"):
+                        logger.debug(f"Ensuring guideline inclusion, added {r['metadata'].get('filename')}")
+                        break
 
-    return combined_list[:top_n]
+        results = SearchResults(combined_list[:top_n], skipped=skipped)
+        # Only freshly searched hits are counted: a cache hit would write to SQLite on every
+        # repeat of a query whose retrievals were already recorded when it was first searched
+        searched = [r for r in results if r["collection"] in found]
+        if searched:
+            record_retrievals(searched, self.chroma_path)
+        return results
+
+_searchers = {}
+_searchers_lock = threading.Lock()
+
+def get_searcher(chroma_path=None):
+    """The process-wide AggregatorSearcher for `chroma_path` (default CHROMA_PATH)."""
+    chroma_path = chroma_path or CHROMA_PATH
+    with _searchers_lock:
+        searcher = _searchers.get(chroma_path)
+        if searcher is None:
+            searcher = _searchers[chroma_path] = AggregatorSearcher(chroma_path=chroma_path)
+        return searcher
+
+def aggregator_search(query, top_n=3, mode="embedding", client=None, emb_model=None, collections=None):
+    """
+    client / emb_model: search with an existing Chroma client and embedder. Without them
+    the search is sent to the daemon if one serves CHROMA_PATH, else it runs on the
+    process-wide AggregatorSearcher (get_searcher), which stays warm between calls.
+    collections: names to search (defaults to COLLECTIONS_TO_QUERY).
+    Returns SearchResults; .skipped names collections left out after an error or timeout.
+    """
+    if client is None and emb_model is None:
+        daemon = daemon_client()
+        if daemon is not None:
+            try:
+                if daemon.serves(CHROMA_PATH):
+                    if collections is None:
+                        collections = list(COLLECTIONS_TO_QUERY)
+                    found = daemon.call("search", query=query, top_n=top_n, mode=mode, collections=collections)
+                    return SearchResults(found["results"], skipped=found["skipped"])
+            except RecallDaemonError as e:
+                logger.warning(f"{e}; searching in-process")
+        return get_searcher().search(query, top_n=top_n, mode=mode, collections=collections)
+    searcher = AggregatorSearcher(client=client, emb_model=emb_model)
+    try:
+        return searcher.search(query, top_n=top_n, mode=mode, collections=collections)
+    finally:
+        searcher.close()
 
 def main():
     args = sys.argv[1:]
     if not args:
-        print("Usage: python aggregator_search.py <query> [top_n] [--mode naive|both|guidelines_code]")
+        print("Usage: python aggregator_search.py <query> [top_n] [--mode naive|both|hybrid|guidelines_code]")
         sys.exit(1)
 
     query_text = args[0]
@@ -176,19 +582,21 @@ def main():
         elif args[1].startswith("--mode"):
             pass
         else:
-            if args[1] in ("naive", "both", "guidelines_code"):
+            if args[1] in SEARCH_MODES:
                 mode = args[1]
 
     if "--mode" in args:
         idx = args.index("--mode")
         if idx + 1 < len(args):
             possible_mode = args[idx + 1]
-            if possible_mode in ("naive", "both", "guidelines_code"):
+            if possible_mode in SEARCH_MODES:
                 mode = possible_mode
 
     results = aggregator_search(query_text, top_n, mode)
 
     print(f"\n🔎 aggregator_search for: '{query_text}' (mode={mode}, top {top_n} overall)\n")
+    for coll_name, reason in results.skipped.items():
+        print(f"⚠ Skipped collection '{coll_name}': {reason}")
     for i, r in enumerate(results, start=1):
         c_name = r["collection"]
         dist = r["distance"]
@@ -25,6 +25,7 @@ PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 sys.path.append(PARENT_DIR)
 
 from code_base.agent_manager import AgentManager
+from scripts.index_manifest import bump_collection_generation
 
 # Configure basic logging without correlation_id until it's set
 logger = logging.getLogger('blueprint_execution')
@@ -258,6 +259,7 @@ class BlueprintExecution:
                 "correlation_id": correlation_id or 'N/A'
             }]
         )
+        bump_collection_generation("execution_logs")
         print(f"✅ Execution log stored: {execution_trace_id}")
         return execution_trace_id
 
@@ -291,6 +293,7 @@ class BlueprintExecution:
                 documents=[json.dumps(blueprint_data)],
                 metadatas=[{"blueprint_id": blueprint_id}]
             )
+            bump_collection_generation("blueprint_versions")
             print(f"🔹 Blueprint evolved: {blueprint_id}_{new_version}")
 
     def get_thresholds_for_task(self, task_name):
@@ -326,6 +329,7 @@ class BlueprintExecution:
             documents=[json.dumps(revision_entry)],
             metadatas=[{"blueprint_id": blueprint_id}]
         )
+        bump_collection_generation("blueprint_revisions")
         print(f"🔹 Blueprint Revision Proposal Generated: {revision_id}")
         return revision_id
 
@@ -4,10 +4,21 @@
 cleanup_collections.py
 
 Wipes all collections in ChromaDB to start fresh, excluding none.
+Also clears the indexers' per-file chunk manifest so it never points at wiped chunks,
+and the lexical (trigram / BM25) index so naive search never returns them.
 """
 
+import os
+import sys
 import chromadb
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.index_manifest import get_manifest
+from scripts.lexical_index import get_lexical_index
+
 def wipe_all_collections(chroma_path="/mnt/f/projects/ai-recall-system/chroma_db"):
     client = chromadb.PersistentClient(path=chroma_path)
     
@@ -17,10 +28,16 @@ def wipe_all_collections(chroma_path="/mnt/f/projects/ai-recall-system/chroma_db
     for c in collections:
         print(f" - {c}")
 
+    manifest = get_manifest(chroma_path)
+    lexical = get_lexical_index(chroma_path)
+
     # Delete all collections
     for collection_name in collections:
         try:
             client.delete_collection(collection_name)
+            manifest.clear_collection(getattr(collection_name, "name", collection_name))
+            if lexical is not None:
+                lexical.clear_collection(getattr(collection_name, "name", collection_name))
             print(f"✅ Wiped collection '{collection_name}'")
         except Exception as e:
             print(f"❌ Could not wipe '{collection_name}': {e}")
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+embedding_backends.py
+
+Pluggable embedding backends for all-MiniLM-L6-v2, selected with RECALL_EMBED_BACKEND:
+ - "torch"      langchain_huggingface.HuggingFaceEmbeddings, full-precision PyTorch (default)
+ - "onnx"       the same model exported to ONNX and run with ONNX Runtime on CPU
+ - "onnx-int8"  the ONNX model with int8 dynamic quantization of its weights
+
+Every backend has the HuggingFaceEmbeddings interface (embed_documents / embed_query),
+so scripts/embeddings.py, the EmbeddingPool workers and the recall daemon load them
+through load_backend() unchanged. The ONNX backends mirror the sentence-transformers
+pipeline: tokenize (truncate at 256 word pieces), mean-pool the last hidden state over
+the attention mask, L2-normalize. They only need onnxruntime, tokenizers and numpy,
+not torch, which is where the latency and RSS savings come from.
+
+The ONNX files live in a local model directory (RECALL_ONNX_MODEL_DIR):
+    model.onnx, model_int8.onnx, tokenizer.json
+created once with --export (needs torch + transformers + onnxruntime on that host).
+parity_check() reports cosine agreement of a backend against the PyTorch vectors.
+
+Usage:
+    python embedding_backends.py --export
+        (export model.onnx + model_int8.onnx + tokenizer.json to the model dir)
+    python embedding_backends.py --parity --backend onnx-int8
+        (cosine agreement vs. PyTorch on sample chunks from the repo)
+    python embedding_backends.py --bench --backend onnx
+        (per-chunk latency and peak RSS of a backend)
+"""
+
+import os
+import sys
+import math
+import time
+import logging
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = "torch"
+ONNX_MODEL_DIR = os.environ.get(
+    "RECALL_ONNX_MODEL_DIR",
+    "/mnt/f/projects/ai-recall-system/models/all-MiniLM-L6-v2-onnx"
+)
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+MAX_SEQ_LENGTH = 256        # all-MiniLM-L6-v2 max_seq_length
+ONNX_BATCH_SIZE = 64        # texts per session.run()
+PARITY_MIN_COSINE = 0.99    # parity_check() passes when every text agrees at least this much
+
+logger = logging.getLogger(__name__)
+
+def backend_name():
+    """The configured backend (RECALL_EMBED_BACKEND), validated."""
+    name = os.environ.get("RECALL_EMBED_BACKEND", DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown RECALL_EMBED_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return name
+
+##############################################################################
+# Backends
+##############################################################################
+
+class TorchBackend:
+    """Full-precision PyTorch through langchain_huggingface (the original path)."""
+
+    name = "torch"
+
+    def __init__(self, model_name=MODEL_NAME):
+        from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+        self.model = HuggingFaceEmbeddings(model_name=model_name)
+
+    def embed_documents(self, texts):
+        return self.model.embed_documents(list(texts))
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+class OnnxBackend:
+    """
+    all-MiniLM-L6-v2 on ONNX Runtime (CPU). quantized=True loads the int8 model.
+    threads: intra-op threads (default: OMP_NUM_THREADS if set, e.g. by EmbeddingPool workers).
+    """
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=False, threads=None,
+                 max_length=MAX_SEQ_LENGTH, batch_size=ONNX_BATCH_SIZE):
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.np = np
+        self.name = "onnx-int8" if quantized else "onnx"
+        self.batch_size = batch_size
+        model_path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found; run 'python embedding_backends.py --export' first")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads is None:
+            threads = int(os.environ.get("OMP_NUM_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts):
+        np = self.np
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]          # (batch, tokens, 384)
+
+        # Mean pooling over real tokens, then L2 normalization (sentence-transformers pipeline)
+        mask = attention_mask[:, :, None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[i:i + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0]
+
+def load_backend(name=None, model_name=MODEL_NAME, model_dir=None):
+    """Creates the named backend (default: RECALL_EMBED_BACKEND)."""
+    name = name or backend_name()
+    if name == "torch":
+        return TorchBackend(model_name)
+    if name in ("onnx", "onnx-int8"):
+        return OnnxBackend(model_dir or ONNX_MODEL_DIR, quantized=name == "onnx-int8")
+    raise ValueError(f"Unknown embedding backend {name!r}; expected one of {', '.join(BACKENDS)}")
+
+##############################################################################
+# Export / parity
+##############################################################################
+
+def export_onnx_model(model_name=MODEL_NAME, model_dir=ONNX_MODEL_DIR, quantize=True):
+    """
+    Exports the transformer to model_dir/model.onnx (+ tokenizer.json) and, with
+    quantize=True, an int8 dynamically-quantized model_int8.onnx next to it.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(model_dir)   # writes tokenizer.json for fast tokenizers
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    axes = {n: {0: "batch", 1: "tokens"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "tokens"}
+    onnx_path = os.path.join(model_dir, ONNX_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), onnx_path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes=axes, opset_version=14
+        )
+    print(f"✅ Exported {model_name} to {onnx_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(model_dir, ONNX_INT8_FILE)
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"✅ Quantized (int8 dynamic) to {int8_path}")
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def parity_check(backend, reference, texts, min_cosine=PARITY_MIN_COSINE):
+    """
+    Embeds `texts` with both models and compares them pairwise.
+    Returns {"n", "min", "mean", "worst_text", "passed"}.
+    """
+    texts = list(texts)
+    got = backend.embed_documents(texts)
+    want = reference.embed_documents(texts)
+    scores = [_cosine(a, b) for a, b in zip(got, want)]
+    worst = min(range(len(scores)), key=scores.__getitem__) if scores else None
+    return {
+        "n": len(scores),
+        "min": scores[worst] if scores else 0.0,
+        "mean": sum(scores) / len(scores) if scores else 0.0,
+        "worst_text": texts[worst] if scores else "",
+        "passed": bool(scores) and scores[worst] >= min_cosine,
+    }
+
+def sample_texts(limit=200):
+    """Token-sized chunks of the repo's own code and docs, for parity and benchmarks."""
+    from scripts.indexing_utils import iter_files
+    from scripts.token_chunker import RegexTokenCounter, chunk_lines_by_tokens
+
+    texts = []
+    roots = [os.path.join(PARENT_DIR, d) for d in ("scripts", "knowledge_base")]
+    for filepath, _ in sorted(iter_files(roots, {"__pycache__"}, lambda p: p.endswith((".py", ".md")))):
+        with open(filepath, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+        texts.extend(t for t, _, _, _ in chunk_lines_by_tokens(lines, counter=RegexTokenCounter()) if t.strip())
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+def _peak_rss_mb():
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backends: export ONNX models, check parity, benchmark.")
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="Backend to check/benchmark (default: RECALL_EMBED_BACKEND).")
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR, help="Directory holding the ONNX files.")
+    parser.add_argument("--export", action="store_true", help="Export model.onnx / model_int8.onnx / tokenizer.json.")
+    parser.add_argument("--parity", action="store_true", help="Cosine agreement vs. the PyTorch backend.")
+    parser.add_argument("--bench", action="store_true", help="Per-chunk latency and peak RSS.")
+    parser.add_argument("--samples", type=int, default=200, help="Texts used by --parity / --bench.")
+    args = parser.parse_args()
+
+    if args.export:
+        export_onnx_model(model_dir=args.model_dir)
+    if args.parity or args.bench:
+        texts = sample_texts(args.samples)
+        backend = load_backend(args.backend, model_dir=args.model_dir)
+        if args.bench:
+            backend.embed_documents(texts[:4])   # warm-up
+            start = time.perf_counter()
+            backend.embed_documents(texts)
+            elapsed = time.perf_counter() - start
+            print(f"⏱ {backend.name}: {len(texts)} chunk(s) in {elapsed:.2f}s, "
+                  f"{elapsed / max(1, len(texts)) * 1000:.1f} ms/chunk, peak RSS {_peak_rss_mb():.0f} MB")
+        if args.parity:
+            result = parity_check(backend, TorchBackend(), texts)
+            status = "✅" if result["passed"] else "❌"
+            print(f"{status} {backend.name} vs torch over {result['n']} chunk(s): "
+                  f"mean cosine {result['mean']:.5f}, min {result['min']:.5f}")
+            if not result["passed"]:
+                print(f"   Worst chunk: {result['worst_text'][:200]!r}")
+                sys.exit(1)
+    if not (args.export or args.parity or args.bench):
+        parser.print_help()
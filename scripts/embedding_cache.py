@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+embedding_cache.py
+
+Persistent, content-addressed embedding cache shared by the indexers and aggregator_search.
+
+ - Keyed by (model name, sha256 of the normalized text), so unchanged files after a wipe,
+   renamed files, identical mock files and repeated agent queries never hit the model twice.
+ - Vectors are stored as float32 blobs in SQLite (WAL mode, safe across the indexer processes).
+ - Size-bounded: once the cache grows past max_entries, the least recently used
+   entries are evicted.
+ - Hit / miss counters are kept per process and reported by stats().
+
+The cache lives next to Chroma but outside its collections, so cleanup_collections.py
+does not wipe it:
+    <chroma_db>/embedding_cache.sqlite3
+
+Usage:
+    python embedding_cache.py --stats
+    python embedding_cache.py --clear
+"""
+
+import os
+import sys
+import time
+import array
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "RECALL_EMBED_CACHE_PATH",
+    "/mnt/f/projects/ai-recall-system/chroma_db/embedding_cache.sqlite3"
+)
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RECALL_EMBED_CACHE_MAX_ENTRIES", "200000"))
+EVICT_CHECK_EVERY = 1000    # inserts between size checks
+SQLITE_MAX_VARS = 500       # keys per IN (...) lookup
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model     TEXT NOT NULL,
+    key       TEXT NOT NULL,
+    dim       INTEGER NOT NULL,
+    vector    BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, key)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+"""
+
+def normalize_text(text: str) -> str:
+    return text.strip().replace("\r\n", "\n")
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def _pack(vector):
+    return array.array("f", vector).tobytes()
+
+def _unpack(blob):
+    vec = array.array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+class EmbeddingCache:
+    """
+    SQLite-backed (model, text hash) -> float32 vector store with LRU eviction.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._inserts_since_check = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, model_name, keys):
+        """
+        Returns {key: vector} for the keys present in the cache and refreshes their LRU stamp.
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique_keys), SQLITE_MAX_VARS):
+                part = unique_keys[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [model_name] + part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _unpack(blob)
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                        [(now, model_name, key) for key in found]
+                    )
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, model_name, items):
+        """Stores (key, vector) pairs."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, key, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                    [(model_name, key, len(vec), _pack(vec), now) for key, vec in items]
+                )
+            self._inserts_since_check += len(items)
+            if self._inserts_since_check >= EVICT_CHECK_EVERY:
+                self._inserts_since_check = 0
+                self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until the cache is back under max_entries."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            excess = count - self.max_entries
+            if excess <= 0:
+                return 0
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (excess,)
+                )
+            self.evictions += excess
+            logger.info(f"Evicted {excess} least recently used embedding(s) from {self.path}")
+            return excess
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM embeddings")
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachedEmbeddings:
+    """
+    Drop-in replacement for HuggingFaceEmbeddings (embed_documents / embed_query)
+    that consults the EmbeddingCache first and only sends misses to the model.
+    The underlying model is created lazily by `loader`, so fully cached runs never load it.
+    """
+
+    def __init__(self, model_name, loader, cache):
+        self.model_name = model_name
+        self._loader = loader
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.cache = cache
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._loader()
+        return self._model
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        keys = [text_key(t) for t in texts]
+        cached = self.cache.get_many(self.model_name, keys)
+
+        # Embed each distinct missing text once, in a single model call
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.model.embed_documents(list(missing.values()))
+            fresh = list(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model_name, fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        return self.cache.stats()
+
+##############################################################################
+# Shared instances
+##############################################################################
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+    """Returns the process-wide EmbeddingCache for `path`."""
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = EmbeddingCache(path, max_entries=max_entries)
+            _caches[path] = cache
+        return cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the persistent embedding cache.")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help="Cache file location.")
+    parser.add_argument("--stats", action="store_true", help="Print the number of cached vectors.")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached vector.")
+    args = parser.parse_args()
+
+    cache = get_embedding_cache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"🗑️ Cleared embedding cache at {args.path}")
+    if args.stats or not args.clear:
+        print(f"📦 Embedding cache at {args.path}: {cache.size()} vector(s), max {cache.max_entries}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+embedding_pool.py
+
+Multi-core embedding executor for CPU-only boxes.
+
+One torch process embedding on the calling thread leaves most cores idle during cold
+indexing (e.g. tests/mock_data/codebase/large_project plus the real tree). EmbeddingPool:
+ - runs N worker processes (spawned, never forked after torch is loaded), each loading
+   the model once with a pinned torch / OpenMP thread count, so workers do not fight
+   over cores
+ - shards every embed_documents() call into batches and spreads them over the workers,
+   returning vectors in input order (calls smaller than one tuned batch per worker are
+   split evenly so no worker idles)
+ - autotunes the batch size (BatchAutotuner) from observed texts/second: it keeps growing
+   or shrinking the batch while throughput improves, then settles
+ - has the HuggingFaceEmbeddings interface (embed_documents / embed_query) plus submit()
+   returning a Future, so it can sit behind CachedEmbeddings (scripts/embeddings.py) and
+   be handed to reindex_single_file, index_markdown_files or aggregator_search unchanged
+ - if a worker dies the broken executor is shut down, the affected batches are embedded
+   in-process (off the executor's callback thread) and the next call starts a fresh pool;
+   after MAX_POOL_RESTARTS breaks the pool stays in-process
+
+load_embed_model(use_pool=True) wraps the shared pool with the embedding cache; the
+indexers and the recall daemon ask for it when pool_enabled(). The pool is opt-in:
+each worker holds its own copy of the model, which is a lot of memory to spend unasked.
+
+Config (environment):
+    RECALL_EMBED_POOL=1             turn the pool on (default: off, embed in-process)
+    RECALL_EMBED_WORKERS=N          worker processes (default: cores // threads per worker)
+    RECALL_EMBED_THREADS=N          torch threads per worker (default: 2)
+
+Usage:
+    python embedding_pool.py --bench tests/mock_data/codebase/large_project
+        (embed every line of a tree through the pool and report throughput)
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+THREADS_PER_WORKER = int(os.environ.get("RECALL_EMBED_THREADS", "2"))
+MAX_POOL_RESTARTS = 2       # broken pools rebuilt before falling back to in-process for good
+INITIAL_BATCH_SIZE = 32
+MIN_BATCH_SIZE = 8
+MAX_BATCH_SIZE = 512
+
+logger = logging.getLogger(__name__)
+
+def pool_enabled():
+    """True only when RECALL_EMBED_POOL turns the pool on."""
+    return os.environ.get("RECALL_EMBED_POOL", "0").lower() in ("1", "true", "yes")
+
+def cpu_workers(threads_per_worker=THREADS_PER_WORKER):
+    """Workers that fill the machine at `threads_per_worker` threads each."""
+    return max(1, (os.cpu_count() or 1) // max(1, threads_per_worker))
+
+def default_workers(threads_per_worker=THREADS_PER_WORKER):
+    """RECALL_EMBED_WORKERS, else cpu_workers() if the pool is enabled, else 0 (in-process)."""
+    configured = int(os.environ.get("RECALL_EMBED_WORKERS", "0"))
+    if configured > 0:
+        return configured
+    return cpu_workers(threads_per_worker) if pool_enabled() else 0
+
+##############################################################################
+# Batch size autotuning
+##############################################################################
+
+class BatchAutotuner:
+    """
+    Hill-climbs the batch size on measured throughput (texts / second).
+    Each size is measured over `samples_per_step` batches; the size then doubles
+    (or halves) while throughput improves by more than `tolerance`, tries the other
+    direction once from the best size, and settles on the best one.
+    """
+
+    def __init__(self, initial=INITIAL_BATCH_SIZE, min_size=MIN_BATCH_SIZE, max_size=MAX_BATCH_SIZE,
+                 samples_per_step=3, tolerance=0.05):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = max(min_size, min(max_size, initial))
+        self.samples_per_step = samples_per_step
+        self.tolerance = tolerance
+        self.direction = 2.0            # multiply (grow) first, 0.5 = shrink
+        self.best = None                # (size, throughput)
+        self.turned = False             # already tried the other direction
+        self.converged = False
+        self.history = []               # (size, throughput) per finished step
+        self._samples = []
+        self._lock = threading.Lock()
+
+    def observe(self, batch_size, texts, seconds):
+        """Records one batch of `texts` texts embedded in `seconds` at `batch_size`."""
+        with self._lock:
+            if self.converged or batch_size != self.size or seconds <= 0:
+                return
+            self._samples.append(texts / seconds)
+            if len(self._samples) < self.samples_per_step:
+                return
+            throughput = sum(self._samples) / len(self._samples)
+            self._samples = []
+            self.history.append((self.size, throughput))
+            self._step(throughput)
+
+    def _step(self, throughput):
+        if self.best is None or throughput > self.best[1] * (1 + self.tolerance):
+            self.best = (self.size, throughput)
+            if not self._move(self.size):
+                self._turn()
+        else:
+            self._turn()
+
+    def _move(self, from_size):
+        nxt = int(max(self.min_size, min(self.max_size, from_size * self.direction)))
+        if nxt == from_size:
+            return False
+        self.size = nxt
+        return True
+
+    def _turn(self):
+        """Goes back to the best size and probes the other direction once, then settles."""
+        best_size = self.best[0]
+        if not self.turned:
+            self.turned = True
+            self.direction = 1 / self.direction
+            if self._move(best_size):
+                return
+        self.size = best_size
+        self.converged = True
+        logger.info(f"Embedding batch size settled at {best_size} ({self.best[1]:.1f} texts/sec)")
+
+##############################################################################
+# Worker side
+##############################################################################
+
+_worker_model = None
+
+def _load_model(model_name):
+    from scripts.embeddings import _load_backend as load
+    return load(model_name)
+
+def _init_worker(model_name, threads, loader):
+    """Pins the worker's thread pools before torch / ONNX Runtime start, then loads the model once."""
+    global _worker_model
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+    _worker_model = loader(model_name)
+
+def _embed_batch(texts):
+    start = time.perf_counter()
+    vectors = _worker_model.embed_documents(texts)
+    return [list(map(float, v)) for v in vectors], time.perf_counter() - start
+
+##############################################################################
+# Pool
+##############################################################################
+
+class EmbeddingPool:
+    """
+    Process pool with the HuggingFaceEmbeddings interface.
+    loader(model_name) -> model must be a picklable module-level function (workers are spawned).
+    workers=0 embeds in-process (same API, no processes); workers=None uses default_workers().
+    """
+
+    def __init__(self, model_name=MODEL_NAME, workers=None, threads_per_worker=THREADS_PER_WORKER,
+                 loader=_load_model, autotuner=None):
+        self.model_name = model_name
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.workers = default_workers(self.threads_per_worker) if workers is None else workers
+        self.loader = loader
+        self.autotuner = autotuner or BatchAutotuner()
+        self._executor = None
+        self._fallback_executor = None
+        self._local_model = None
+        self._lock = threading.Lock()
+        self.restarts = 0
+        self.texts_embedded = 0
+        self.busy_seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.threads_per_worker, self.loader)
+                )
+                logger.info(f"Started embedding pool: {self.workers} worker(s) x {self.threads_per_worker} thread(s)")
+            return self._executor
+
+    def _pool_broke(self, executor, error):
+        """Drops a broken executor so the next submit() rebuilds it (or stays in-process)."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+            if self.restarts > MAX_POOL_RESTARTS:
+                self.workers = 0
+            logger.error(f"Embedding pool broke ({error}); "
+                         + ("embedding in-process from now on" if self.workers == 0 else "restarting it on the next call"))
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fallback(self):
+        """Single thread that embeds the batches of a broken pool in-process."""
+        with self._lock:
+            if self._fallback_executor is None:
+                self._fallback_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-fallback")
+            return self._fallback_executor
+
+    def _embed_local(self, texts):
+        with self._lock:
+            if self._local_model is None:
+                self._local_model = self.loader(self.model_name)
+        start = time.perf_counter()
+        vectors = self._local_model.embed_documents(texts)
+        return [list(map(float, v)) for v in vectors], time.perf_counter() - start
+
+    def _shards(self, texts):
+        size = self.autotuner.size
+        if self.workers > 1 and len(texts) < size * self.workers:
+            # Too few texts to give every worker a tuned batch: split them evenly instead
+            size = max(MIN_BATCH_SIZE, -(-len(texts) // self.workers))
+        return size, [texts[i:i + size] for i in range(0, len(texts), size)]
+
+    def _record(self, size, shard, seconds):
+        self.autotuner.observe(size, len(shard), seconds)
+        self.texts_embedded += len(shard)
+        self.busy_seconds += seconds
+
+    def submit(self, texts):
+        """Embeds `texts` asynchronously; the Future resolves to vectors in input order."""
+        texts = list(texts)
+        result = Future()
+        if not texts:
+            result.set_result([])
+            return result
+        size, shards = self._shards(texts)
+        executor = self._get_executor()
+        if executor is None:
+            try:
+                vectors = []
+                for shard in shards:
+                    shard_vectors, seconds = self._embed_local(shard)
+                    self._record(size, shard, seconds)
+                    vectors.extend(shard_vectors)
+                result.set_result(vectors)
+            except Exception as e:
+                result.set_exception(e)
+            return result
+
+        try:
+            futures = [executor.submit(_embed_batch, shard) for shard in shards]
+        except BrokenProcessPool as e:
+            self._pool_broke(executor, e)
+            return self.submit(texts)
+        parts = [None] * len(futures)
+        pending = [len(futures)]
+        lock = threading.Lock()
+
+        def fail(e):
+            with lock:
+                if not result.done():
+                    result.set_exception(e)
+
+        def finish(i, shard, vectors, seconds):
+            self._record(size, shard, seconds)
+            with lock:
+                parts[i] = vectors
+                pending[0] -= 1
+                if pending[0] == 0 and not result.done():
+                    result.set_result([v for part in parts for v in part])
+
+        def embed_in_process(i, shard):
+            try:
+                vectors, seconds = self._embed_local(shard)
+            except Exception as e:
+                fail(e)
+                return
+            finish(i, shard, vectors, seconds)
+
+        def collect(i, shard, fut):
+            try:
+                vectors, seconds = fut.result()
+            except BrokenProcessPool as e:
+                self._pool_broke(executor, e)
+                self._fallback().submit(embed_in_process, i, shard)
+                return
+            except Exception as e:
+                fail(e)
+                return
+            finish(i, shard, vectors, seconds)
+
+        for i, (shard, fut) in enumerate(zip(shards, futures)):
+            fut.add_done_callback(lambda f, i=i, shard=shard: collect(i, shard, f))
+        return result
+
+    def embed_documents(self, texts):
+        return self.submit(texts).result()
+
+    def embed_query(self, text):
+        return self.submit([text]).result()[0]
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "batch_size": self.autotuner.size,
+            "converged": self.autotuner.converged,
+            "texts": self.texts_embedded,
+            "texts_per_worker_second": self.texts_embedded / self.busy_seconds if self.busy_seconds else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            fallback, self._fallback_executor = self._fallback_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if fallback is not None:
+            fallback.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_embedding_pool(model_name=MODEL_NAME):
+    """Returns the process-wide EmbeddingPool for `model_name` (workers start on first use)."""
+    with _pools_lock:
+        pool = _pools.get(model_name)
+        if pool is None:
+            pool = _pools[model_name] = EmbeddingPool(model_name)
+        return pool
+
+def _bench(root, limit, workers):
+    from scripts.indexing_utils import iter_files
+    lines = []
+    for filepath, _ in iter_files([root], {"__pycache__", ".git"}, lambda p: p.endswith((".py", ".md", ".txt", ".json"))):
+        with open(filepath, "r", encoding="utf-8", errors="replace") as f:
+            lines.extend(line.strip() for line in f if line.strip())
+    lines = lines[:limit]
+    with EmbeddingPool(workers=workers) as pool:
+        start = time.perf_counter()
+        pool.embed_documents(lines)
+        elapsed = time.perf_counter() - start
+        print(f"✅ Embedded {len(lines)} text(s) in {elapsed:.2f}s ({len(lines) / elapsed:.1f}/sec)")
+        print(f"   📊 {pool.stats()}")
+        print(f"   🔧 autotune steps (batch size, texts/sec): {[(s, round(t, 1)) for s, t in pool.autotuner.history]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-core embedding pool with batch-size autotuning.")
+    parser.add_argument("--bench", metavar="DIR", help="Embed the lines of every text file under DIR and report throughput.")
+    parser.add_argument("--limit", type=int, default=20000, help="Max texts for --bench.")
+    parser.add_argument("--workers", type=int, default=cpu_workers(), help="Worker processes for --bench (0 = in-process).")
+    args = parser.parse_args()
+
+    if args.bench:
+        _bench(args.bench, args.limit, args.workers)
+    else:
+        parser.print_help()
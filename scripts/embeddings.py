@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+embeddings.py
+
+Single place where the MiniLM embedding model is constructed for the indexers,
+aggregator_search and the BuildAgent.
+
+load_embed_model() returns an object with the HuggingFaceEmbeddings interface
+(embed_documents / embed_query) backed by the persistent embedding cache in
+embedding_cache.py. The model itself is only loaded on the first cache miss.
+
+Set RECALL_EMBED_CACHE=0 to bypass the cache.
+With use_pool=True cache misses go to the shared multi-process EmbeddingPool
+(scripts/embedding_pool.py) instead of one in-process model.
+RECALL_EMBED_BACKEND=torch|onnx|onnx-int8 picks the model implementation
+(scripts/embedding_backends.py); non-torch backends get their own cache namespace.
+"""
+
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.embedding_cache import DEFAULT_CACHE_PATH, CachedEmbeddings, get_embedding_cache
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+def cache_enabled():
+    return os.environ.get("RECALL_EMBED_CACHE", "1").lower() not in ("0", "false", "no")
+
+def _load_backend(model_name):
+    from scripts.embedding_backends import load_backend
+    return load_backend(model_name=model_name)
+
+def cache_model_key(model_name=MODEL_NAME, backend=None):
+    """Cache namespace for a model: quantized/ONNX vectors are never mixed with PyTorch ones."""
+    from scripts.embedding_backends import backend_name
+    backend = backend or backend_name()
+    return model_name if backend == "torch" else f"{model_name}#{backend}"
+
+def _load_pool(model_name):
+    from scripts.embedding_pool import get_embedding_pool
+    return get_embedding_pool(model_name)
+
+def load_embed_model(model_name=MODEL_NAME, use_cache=None, cache_path=DEFAULT_CACHE_PATH, use_pool=False):
+    """
+    Returns the embedding model used across the recall system.
+    With the cache enabled (default) this is a CachedEmbeddings wrapper that loads
+    the configured backend lazily; otherwise the plain backend instance.
+    use_pool=True embeds through the process-wide EmbeddingPool (bulk indexing, daemons).
+    """
+    if use_cache is None:
+        use_cache = cache_enabled()
+    load = _load_pool if use_pool else _load_backend
+    if not use_cache:
+        return load(model_name)
+    return CachedEmbeddings(
+        cache_model_key(model_name),
+        loader=lambda: load(model_name),
+        cache=get_embedding_cache(cache_path)
+    )
+
+def describe_cache_stats(embed_model):
+    """One-line hit/miss summary for end-of-run logging ('' when uncached)."""
+    if not hasattr(embed_model, "stats"):
+        return ""
+    s = embed_model.stats()
+    return f"embedding cache: {s['hits']} hit(s), {s['misses']} miss(es), {s['hit_rate']:.0%} hit rate"
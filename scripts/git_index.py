@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+git_index.py
+
+Git-driven change sets for the indexers (index_codebase.py --since / --git-hook).
+
+After a branch switch or a large pull, the stat walk still visits every file under
+the roots. Git already knows what changed:
+ - git_changed_paths() asks `git diff --name-status -M <rev>` (committed and uncommitted
+   changes since <rev>, with renames) plus untracked files
+ - plan_git_index() turns that into a plan for apply_index_plan(): modified/added files
+   whose stat signature differs from the manifest, deleted files, and renames (their
+   chunks and vectors are moved before the new path is synced)
+ - the last indexed commit is recorded in the collection's metadata
+   (get_indexed_commit / set_indexed_commit), so the next run diffs from there
+ - install_hooks() adds post-commit / post-checkout / post-merge hooks that run the
+   indexer in the background
+
+Usage:
+    python git_index.py <rev>
+        (print the paths changed since <rev> in the current repository)
+"""
+
+import os
+import sys
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.indexing_utils import path_in_skip_dirs
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+INDEXED_COMMIT_KEY = "last_indexed_commit"
+HOOK_NAMES = ("post-commit", "post-checkout", "post-merge")
+HOOK_MARKER = "# ai-recall-system: reindex changed files"
+GIT_TIMEOUT = 60
+
+class GitError(RuntimeError):
+    """git is missing, the path is not in a repository, or the revision is unknown."""
+
+def _git(repo, *args):
+    try:
+        result = subprocess.run(["git", "-C", repo, *args], capture_output=True, text=True, timeout=GIT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise GitError(f"git {' '.join(args)} failed: {e}") from e
+    if result.returncode != 0:
+        raise GitError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+def git_toplevel(path):
+    return _git(path, "rev-parse", "--show-toplevel").strip()
+
+def git_head(repo):
+    return _git(repo, "rev-parse", "HEAD").strip()
+
+def git_changed_paths(repo, since):
+    """
+    Paths changed between `since` and the working tree, as absolute paths:
+    {"modified": [...], "deleted": [...], "renamed": [(old, new)]}.
+    Untracked (not ignored) files count as modified.
+    """
+    _git(repo, "rev-parse", "--verify", "--quiet", f"{since}^{{commit}}")
+    fields = _git(repo, "diff", "--name-status", "-M", "-z", since, "--").split("\0")
+    changes = {"modified": [], "deleted": [], "renamed": []}
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i]
+        if status[0] in ("R", "C"):
+            old, new = fields[i + 1], fields[i + 2]
+            i += 3
+            if status[0] == "R":
+                changes["renamed"].append((os.path.join(repo, old), os.path.join(repo, new)))
+            else:
+                changes["modified"].append(os.path.join(repo, new))
+            continue
+        path = os.path.join(repo, fields[i + 1])
+        i += 2
+        changes["deleted" if status[0] == "D" else "modified"].append(path)
+
+    untracked = _git(repo, "ls-files", "--others", "--exclude-standard", "-z")
+    changes["modified"].extend(os.path.join(repo, p) for p in untracked.split("\0") if p)
+    return changes
+
+##############################################################################
+# Plans
+##############################################################################
+
+def _in_scope(filepath, root_dirs, skip_dirs, accept):
+    under = any(filepath.startswith(root.rstrip(os.sep) + os.sep) for root in root_dirs)
+    return under and accept(filepath) and not path_in_skip_dirs(filepath, skip_dirs)
+
+def plan_git_index(changes, root_dirs, skip_dirs, accept, known_states):
+    """
+    A plan for apply_index_plan() from git_changed_paths():
+      "candidates": [(filepath, size, mtime_ns)] changed files whose stat differs from the manifest
+      "deleted":    files git reports deleted (or renamed out of scope)
+      "renamed":    [(old, new)] renames within scope, moved before "candidates" are synced
+      "unchanged":  changed-by-git files whose stat already matches the manifest
+    """
+    candidates, deleted, renamed = [], [], []
+    unchanged = 0
+
+    def consider(filepath):
+        nonlocal unchanged
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            if filepath in known_states:
+                deleted.append(filepath)
+            return
+        known = known_states.get(filepath)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            unchanged += 1
+        else:
+            candidates.append((filepath, st.st_size, st.st_mtime_ns))
+
+    for old, new in changes["renamed"]:
+        old_in, new_in = (_in_scope(p, root_dirs, skip_dirs, accept) for p in (old, new))
+        if old_in and new_in and os.path.exists(new):
+            renamed.append((old, new))
+            st = os.stat(new)
+            candidates.append((new, st.st_size, st.st_mtime_ns))
+            continue
+        if old_in:
+            deleted.append(old)
+        if new_in:
+            consider(new)
+    for filepath in changes["modified"]:
+        if _in_scope(filepath, root_dirs, skip_dirs, accept):
+            consider(filepath)
+    for filepath in changes["deleted"]:
+        if _in_scope(filepath, root_dirs, skip_dirs, accept):
+            deleted.append(filepath)
+
+    seen = set()
+    candidates = [c for c in candidates if not (c[0] in seen or seen.add(c[0]))]
+    return {"candidates": candidates, "unchanged": unchanged,
+            "deleted": sorted(set(deleted)), "renamed": renamed}
+
+##############################################################################
+# Collection metadata
+##############################################################################
+
+def get_indexed_commit(collection):
+    return (collection.metadata or {}).get(INDEXED_COMMIT_KEY)
+
+def set_indexed_commit(collection, commit):
+    # hnsw:* settings cannot be re-sent to modify(); everything else is kept
+    metadata = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+    metadata[INDEXED_COMMIT_KEY] = commit
+    collection.modify(metadata=metadata)
+
+##############################################################################
+# Hooks
+##############################################################################
+
+def install_hooks(repo, command, hook_names=HOOK_NAMES):
+    """
+    Adds `command` (run in the background) to the repository's hooks, appending to
+    existing hooks. Returns the hook paths written.
+    """
+    hooks_dir = _git(repo, "rev-parse", "--git-path", "hooks").strip()
+    if not os.path.isabs(hooks_dir):
+        hooks_dir = os.path.join(repo, hooks_dir)
+    os.makedirs(hooks_dir, exist_ok=True)
+
+    block = f"{HOOK_MARKER}\n{command} >/dev/null 2>&1 &\n"
+    written = []
+    for name in hook_names:
+        path = os.path.join(hooks_dir, name)
+        existing = ""
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                existing = f.read()
+            if HOOK_MARKER in existing:
+                continue
+        with open(path, "w", encoding="utf-8") as f:
+            if existing:
+                f.write(existing.rstrip("\n") + "\n\n" + block)
+            else:
+                f.write("#!/bin/sh\n" + block)
+        os.chmod(path, 0o755)
+        written.append(path)
+    return written
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python git_index.py <rev>")
+        sys.exit(1)
+    repo = git_toplevel(os.getcwd())
+    for kind, paths in git_changed_paths(repo, sys.argv[1]).items():
+        for path in paths:
+            print(f"{kind}: {path}")
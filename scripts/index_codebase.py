@@ -2,44 +2,97 @@
 """
 index_codebase.py 
 
- - Uses line-based chunking for code files (.py, .js, .tsx).
- - For large chunks, we split line-based with overlap.
+ - Python files are chunked by symbol: one chunk per top-level function, class body and
+   method (plus module-level code), so editing one function re-embeds one chunk.
+   Symbols over the model's token budget, .js/.tsx files and unparsable .py files fall back
+   to token-packed line windows with overlap (scripts/token_chunker.py).
+ - Chunks are sized with the embedding model's tokenizer (CHUNK_MAX_TOKENS), so every stored
+   line reaches the vector; each chunk records its 'token_count'. After changing the budget,
+   run once with --full so unchanged files are re-chunked.
  - No markdown or JSON files—those are handled by knowledge_base_test and debugging_logs collections.
- - We store 'start_line','end_line','function_name','class_name','node_type' in metadata, ensuring no None values.
- - Watchers with debouncing for partial saves, rename & delete handling.
+ - We store 'start_line','end_line' (1-based, inclusive),'function_name','class_name','qualified_name',
+   'node_type' in metadata, ensuring no None values.
+ - Watchers with debouncing for partial saves, rename & delete handling. --watch runs this
+   indexer's source through scripts/indexing_daemon.py; run that script directly to watch
+   the codebase, debug logs and project structure with one model, client and observer.
  - Root directory covers /code_base, /scripts, /tests, /frontend (no node_modules, dist, etc.).
+ - Chunks are embedded and written in batches (see scripts/indexing_utils.py); a full walk
+   batches across files, not just within one file.
+ - One-shot runs stat-compare the tree against the manifest's (size, mtime_ns, content hash)
+   signatures and only touch new, changed or deleted files; a no-op run never connects to
+   Chroma or loads the model. Use --full to re-read every file.
+ - --since <rev> / --git-hook ask git for the files changed, renamed and deleted since a
+   revision (default: the last indexed commit, kept in the collection's metadata) and
+   only touch those (scripts/git_index.py); --install-hooks runs that after every
+   commit, checkout and merge.
+ - Cold runs index in priority order (scripts/index_priority.py): files named by unresolved
+   debug log entries, recently modified files and frequently retrieved files first, and
+   those are flushed to Chroma before the rest. Progress is kept in the manifest, so
+   readiness can be checked while the run is going (python index_priority.py).
+ - Runs from the command line are reniced and pause embedding while an LLM request is
+   in flight or the machine is busy (scripts/index_throttle.py); --no-throttle disables it.
  
 Usage:
     python index_codebase.py
         (one-shot indexing)
     python index_codebase.py --watch
         (start watchers in real-time)
+    python index_codebase.py --batch-size 128
+        (chunks embedded per model call / written per Chroma transaction)
+    python index_codebase.py --full
+        (ignore the stat manifest and re-read every file)
+    python index_codebase.py --since HEAD~20
+        (reindex only what git reports changed since a revision)
+    python index_codebase.py --git-hook
+        (same, since the last indexed commit; what the installed git hooks run)
+    python index_codebase.py --install-hooks
+        (add post-commit / post-checkout / post-merge hooks that run --git-hook)
+    python index_codebase.py --no-throttle
+        (index at full priority, ignoring LLM requests and system load)
 """
 
 import os
 import sys
+import ast
 import time
 import hashlib
-import threading
 import logging
 
-import chromadb
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
 
-import watchdog.events
-import watchdog.observers
-from watchdog.events import FileSystemEventHandler
+from scripts.indexing_utils import (
+    EMBED_BATCH_SIZE, apply_index_plan, format_plan_summary,
+    plan_incremental_index, record_file_state, sync_file_chunks
+)
+from scripts.indexing_daemon import IndexSource, run_daemon
+from scripts.git_index import (
+    GitError, get_indexed_commit, git_changed_paths, git_head, git_toplevel, install_hooks,
+    plan_git_index, set_indexed_commit
+)
+from scripts.index_manifest import get_manifest
+from scripts.index_priority import ProgressTracker, prioritize_plan
+from scripts.index_throttle import get_throttle, lower_priority
+from scripts.embeddings import describe_cache_stats
+from scripts.recall_daemon import get_chroma_client, get_embed_model
+from scripts.token_chunker import (
+    DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, chunk_lines_by_tokens, get_token_counter
+)
 
 ##############################################################################
 # CONFIG
 ##############################################################################
 
 CHROMA_DB_PATH = "/mnt/f/projects/ai-recall-system/chroma_db"
+PROJECT_ROOT = "/mnt/f/projects/ai-recall-system"
 COLLECTION_NAME = "project_codebase"
 LOG_FILE = "/mnt/f/projects/ai-recall-system/logs/script_logs/index_codebase.log"
 
-CHUNK_SIZE_DEFAULT = 300    # lines, for all code files
-CHUNK_OVERLAP = 50         # overlap for all code files
+CHUNK_SIZE_DEFAULT = 300    # lines, for chunk_lines_with_range (legacy line windows)
+CHUNK_OVERLAP = 50         # overlap for chunk_lines_with_range
+CHUNK_MAX_TOKENS = DEFAULT_MAX_TOKENS          # word pieces per chunk (model limit minus [CLS]/[SEP])
+CHUNK_OVERLAP_TOKENS = DEFAULT_OVERLAP_TOKENS  # word pieces shared by consecutive windows
 ALLOWED_EXTENSIONS = {".py", ".js", ".tsx"}  # Only code files, no markdown or JSON
 SKIP_DIRS = {
     "chroma_db", ".git", "__pycache__", ".idea", "venv", ".pytest_cache", 
@@ -52,6 +105,8 @@ ROOT_DIRS = ["/mnt/f/projects/ai-recall-system/code_base",
              "/mnt/f/projects/ai-recall-system/tests", 
              "/mnt/f/projects/ai-recall-system/frontend"]  # Focus on code directories
 DEBOUNCE_SECONDS = 2.0
+WATCH_MAX_WORKERS = 4       # concurrent reindex jobs in watch mode
+STORM_THRESHOLD = 256       # pending paths before watchers switch to one reconcile pass
 
 # Setup logging
 logging.basicConfig(
@@ -92,18 +147,180 @@ def chunk_lines_with_range(lines, start_idx, chunk_size=300, overlap=0):
             i += (chunk_size - overlap)
     return results
 
+##############################################################################
+# PYTHON AST CHUNKING
+##############################################################################
+
+class PyFunctionChunk:
+    """
+    A contiguous, 1-based inclusive line span of one symbol.
+    node_type: function, async_function, method, async_method, class (class-level lines
+    outside its methods) or module (top-level code outside any def/class).
+    """
+
+    def __init__(self, name, start_line, end_line, node_type="function", parent_class=None):
+        self.name = name
+        self.start_line = start_line
+        self.end_line = end_line
+        self.node_type = node_type
+        self.parent_class = parent_class
+
+    def __repr__(self):
+        return f"PyFunctionChunk({self.node_type} {self.name!r} {self.start_line}-{self.end_line})"
+
+def _node_start(node):
+    """First line of a def/class, including its decorators."""
+    return min([node.lineno] + [d.lineno for d in node.decorator_list])
+
+def _leading_comment_start(lines, start, floor):
+    """Extends `start` upward over the comment block directly above it (not past `floor`)."""
+    first = start
+    i = start - 1
+    while i > floor and (not lines[i - 1].strip() or lines[i - 1].lstrip().startswith("#")):
+        if lines[i - 1].strip():
+            first = i
+        i -= 1
+    return first
+
+def _uncovered_runs(start, end, spans):
+    """Line runs in [start, end] not covered by any (s, e) in spans."""
+    runs = []
+    cur = start
+    for s, e in sorted(spans):
+        if s > cur:
+            runs.append((cur, s - 1))
+        cur = max(cur, e + 1)
+    if cur <= end:
+        runs.append((cur, end))
+    return runs
+
+def _symbol_spans(nodes, lines, floor):
+    """(node, start, end) for each def/class in `nodes`, with leading comments attached."""
+    spans = []
+    prev_end = floor
+    for node in nodes:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        end = getattr(node, "end_lineno", node.lineno)
+        start = _leading_comment_start(lines, _node_start(node), prev_end)
+        spans.append((node, start, end))
+        prev_end = end
+    return spans
+
+def parse_python_ast(filepath, code=None):
+    """
+    Splits a Python file into PyFunctionChunks covering every line: top-level functions,
+    methods, class-level code and module-level code. Nested functions stay inside their
+    enclosing symbol. Returns [] if the file cannot be parsed.
+    """
+    if code is None:
+        with open(filepath, "r", encoding="utf-8") as f:
+            code = f.read()
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError) as e:
+        logger.warning(f"AST parse error in {filepath}: {e}")
+        print(f"⚠ AST parse error in {filepath}: {e}")
+        return []
+
+    lines = code.splitlines()
+    results = []
+    top_spans = _symbol_spans(tree.body, lines, 0)
+
+    for node, start, end in top_spans:
+        if isinstance(node, ast.ClassDef):
+            method_spans = _symbol_spans(
+                [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))],
+                lines, _node_start(node)
+            )
+            for method, m_start, m_end in method_spans:
+                node_type = "async_method" if isinstance(method, ast.AsyncFunctionDef) else "method"
+                results.append(PyFunctionChunk(method.name, m_start, m_end, node_type, node.name))
+            for r_start, r_end in _uncovered_runs(start, end, [(s, e) for _, s, e in method_spans]):
+                results.append(PyFunctionChunk(node.name, r_start, r_end, "class"))
+        else:
+            node_type = "async_function" if isinstance(node, ast.AsyncFunctionDef) else "function"
+            results.append(PyFunctionChunk(node.name, start, end, node_type))
+
+    for r_start, r_end in _uncovered_runs(1, len(lines), [(s, e) for _, s, e in top_spans]):
+        results.append(PyFunctionChunk("", r_start, r_end, "module"))
+
+    results.sort(key=lambda fc: fc.start_line)
+    return results
+
+def build_python_chunks(lines, func_chunk, line_counts=None):
+    """
+    Turns one PyFunctionChunk into chunk dicts (text, 1-based start/end lines, symbol names,
+    token count). Spans over CHUNK_MAX_TOKENS are split into overlapping token windows that
+    all keep the symbol's names. Blank-only spans produce nothing.
+    line_counts: optional per-line token counts for the whole file.
+    """
+    start_idx = func_chunk.start_line - 1
+    snippet_lines = lines[start_idx:func_chunk.end_line]
+    if not any(line.strip() for line in snippet_lines):
+        return []
+
+    snippet_counts = line_counts[start_idx:func_chunk.end_line] if line_counts is not None else None
+    is_function = func_chunk.node_type in ("function", "method", "async_function", "async_method")
+    function_name = func_chunk.name if is_function else ""
+    class_name = func_chunk.parent_class or (func_chunk.name if func_chunk.node_type == "class" else "")
+    qualified_name = ".".join(n for n in (class_name, function_name) if n)
+
+    output = []
+    windows = chunk_lines_by_tokens(snippet_lines, start_idx, max_tokens=CHUNK_MAX_TOKENS,
+                                    overlap_tokens=CHUNK_OVERLAP_TOKENS, line_counts=snippet_counts)
+    for chunk_text, real_start, real_end, token_count in windows:
+        output.append({
+            "text": chunk_text,
+            "start_line": real_start + 1,
+            "end_line": real_end + 1,
+            "function_name": function_name,
+            "class_name": class_name,
+            "qualified_name": qualified_name,
+            "node_type": func_chunk.node_type,
+            "token_count": token_count
+        })
+    return output
+
+def _line_window_chunks(lines, line_counts=None):
+    """Fallback for non-Python or unparsable files: overlapping token-packed line windows."""
+    return [
+        {
+            "text": chunk_text,
+            "start_line": st_line + 1,
+            "end_line": end_line + 1,
+            "function_name": "",
+            "class_name": "",
+            "qualified_name": "",
+            "node_type": "lines",
+            "token_count": token_count
+        }
+        for chunk_text, st_line, end_line, token_count in chunk_lines_by_tokens(
+            lines, 0, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, line_counts=line_counts
+        )
+    ]
+
 ##############################################################################
 # reindex_single_file
 ##############################################################################
 
-def reindex_single_file(filepath, collection, embed_model):
+def accept_file(filepath):
+    """True for files this indexer owns (code extensions, not in SKIP_FILES)."""
+    ext = os.path.splitext(filepath)[1].lower()
+    return ext in ALLOWED_EXTENSIONS and os.path.basename(filepath) not in SKIP_FILES
+
+def build_file_chunks(filepath):
+    """
+    Reads and chunks a single code file (by symbol for .py, line windows otherwise).
+    Returns a list of (doc_id, chunk_text, metadata), or None if the file is skipped.
+    """
     ext = os.path.splitext(filepath)[1].lower()
     if ext not in ALLOWED_EXTENSIONS:
-        return 0
+        return None
     if not os.path.exists(filepath) or os.path.isdir(filepath):
-        return 0
+        return None
     if os.path.basename(filepath) in SKIP_FILES:
-        return 0
+        return None
 
     try:
         with open(filepath, "r", encoding="utf-8") as f:
@@ -111,196 +328,253 @@ def reindex_single_file(filepath, collection, embed_model):
     except Exception as e:
         logger.error(f"Error reading {filepath}: {e}")
         print(f"⚠ Error reading {filepath}: {e}")
-        return 0
+        return None
 
     if not text.strip():
-        return 0
-
-    # Remove old doc_ids for this file
-    existing_results = collection.get(limit=9999)
-    if existing_results and "ids" in existing_results and existing_results["ids"]:
-        matched_ids = []
-        for doc_id in existing_results["ids"]:
-            if doc_id.startswith(f"{filepath}::chunk_"):
-                matched_ids.append(doc_id)
-        if matched_ids:
-            collection.delete(ids=matched_ids)
-            logger.info(f"Removed {len(matched_ids)} old chunk(s) for updated file: {filepath}")
-            print(f"   🔸 Removed {len(matched_ids)} old chunk(s) for updated file: {filepath}")
+        return None
 
     lines = text.splitlines()
-    new_chunks_for_file = 0
-
-    # Use line-based chunking for all code files
-    chunk_size = CHUNK_SIZE_DEFAULT
-    overlap = CHUNK_OVERLAP
-    line_blocks = chunk_lines_with_range(lines, 0, chunk_size=chunk_size, overlap=overlap)
-    for idx, (chunk_text, st_line, end_line) in enumerate(line_blocks):
-        if not chunk_text.strip():
-            continue
+    mod_time = os.path.getmtime(filepath)
+
+    line_counts = get_token_counter().count_many(lines)
+
+    code_chunks = []
+    if ext == ".py":
+        for fc in parse_python_ast(filepath, code=text):
+            code_chunks.extend(build_python_chunks(lines, fc, line_counts))
+    if not code_chunks:
+        code_chunks = _line_window_chunks(lines, line_counts)
+
+    chunks = []
+    for idx, cdict in enumerate(c for c in code_chunks if c["text"].strip()):
+        chunk_text = cdict["text"]
         chunk_hash = compute_md5_hash(chunk_text)
         doc_id = f"{filepath}::chunk_{idx}::hash_{chunk_hash}"
 
-        embedding = embed_model.embed_documents([chunk_text])[0]
-
         meta = {
             "filepath": filepath,
             "rel_path": filepath,
             "chunk_index": idx,
             "hash": chunk_hash,
-            "mod_time": os.path.getmtime(filepath),
-            "start_line": int(st_line),
-            "end_line": int(end_line),
-            "function_name": "",  # Empty for now, as we’re not using AST
-            "class_name": "",     # Empty for now, as we’re not using AST
-            "node_type": "lines"  # Generic for all code files
+            "mod_time": mod_time,
+            "start_line": int(cdict["start_line"]),
+            "end_line": int(cdict["end_line"]),
+            "function_name": cdict["function_name"],
+            "class_name": cdict["class_name"],
+            "qualified_name": cdict["qualified_name"],
+            "node_type": cdict["node_type"],
+            "token_count": int(cdict["token_count"])
         }
+        chunks.append((doc_id, chunk_text, meta))
 
-        collection.add(
-            documents=[chunk_text],
-            embeddings=[embedding],
-            metadatas=[meta],
-            ids=[doc_id]
-        )
-        new_chunks_for_file += 1
+    return chunks
+
+def reindex_single_file(filepath, collection, embed_model, writer=None, manifest=None):
+    """
+    Re-chunks one file and syncs its chunks in the collection, embedding only
+    chunks whose content hash is not already stored for this file.
+    If a ChunkBatchWriter is given, the new chunks are queued on it (so a directory
+    walk batches across files); otherwise they are embedded and written here in batches.
+    Old chunks are found through the per-file manifest, not a collection scan.
+    Returns the number of newly embedded chunks.
+    """
+    chunks = build_file_chunks(filepath)
+    if not chunks:
+        return 0
+
+    if manifest is None:
+        manifest = get_manifest(CHROMA_DB_PATH)
 
+    stats = sync_file_chunks(collection, filepath, chunks, embed_model, manifest=manifest, writer=writer)
+    if stats["removed"]:
+        logger.info(f"Removed {stats['removed']} stale chunk(s) for updated file: {filepath}")
+        print(f"   🔸 Removed {stats['removed']} stale chunk(s) for updated file: {filepath}")
+
+    new_chunks_for_file = stats["added"]
     if new_chunks_for_file > 0:
-        logger.info(f"Re-indexed {new_chunks_for_file} chunk(s) from {filepath}")
-        print(f"   ⮑ Re-indexed {new_chunks_for_file} chunk(s) from {filepath}")
+        logger.info(f"Re-indexed {new_chunks_for_file} new chunk(s) from {filepath} "
+                    f"({stats['kept']} unchanged chunk(s) kept)")
+        print(f"   ⮑ Re-indexed {new_chunks_for_file} new chunk(s) from {filepath} ({stats['kept']} unchanged chunk(s) kept)")
 
+    record_file_state(manifest, collection.name, filepath, writer=writer)
     return new_chunks_for_file
 
 ##############################################################################
 # One-shot indexing
 ##############################################################################
 
-def index_codebase():
-    logger.info(f"Connecting to Chroma at '{CHROMA_DB_PATH}'")
-    print(f"🔗 Connecting to Chroma at '{CHROMA_DB_PATH}' ...")
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
-    embed_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    total_files = 0
-    total_new_chunks = 0
+def record_indexed_commit(collection):
+    """Stores the current HEAD in the collection's metadata (no-op outside a git repository)."""
+    try:
+        commit = git_head(git_toplevel(PROJECT_ROOT))
+        set_indexed_commit(collection, commit)
+    except (GitError, OSError, ValueError) as e:
+        logger.warning(f"Could not record the indexed commit: {e}")
+        return None
+    logger.info(f"Recorded indexed commit {commit}")
+    return commit
+
+def index_codebase(batch_size=EMBED_BATCH_SIZE, full=False, throttled=False):
+    """
+    Stat-manifest walk of ROOT_DIRS; records HEAD once the plan has been applied.
+    Returns the apply_index_plan summary, or None when the index was already up to date.
+    """
+    start_time = time.perf_counter()
+    manifest = get_manifest(CHROMA_DB_PATH)
+    known_states = {} if full else manifest.file_states(COLLECTION_NAME)
 
     for root_dir in ROOT_DIRS:
         if not os.path.exists(root_dir):
             logger.warning(f"Root dir not found: {root_dir}. Skipping.")
             print(f"⚠ Root dir not found: {root_dir}. Skipping.")
-            continue
 
-        for current_root, dirs, files in os.walk(root_dir):
-            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+    # Stat-only pass: nothing is read, chunked or embedded for unchanged files
+    plan = plan_incremental_index(ROOT_DIRS, SKIP_DIRS, accept_file, known_states)
+    if not plan["candidates"] and not plan["deleted"]:
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Index up to date: {plan['unchanged']} file(s) unchanged ({elapsed:.2f}s).")
+        print(f"\n✅ Index up to date: {plan['unchanged']} file(s) unchanged, nothing to reindex ({elapsed:.2f}s).")
+        return
 
-            for filename in files:
-                filepath = os.path.join(current_root, filename)
-                added = reindex_single_file(filepath, collection, embed_model)
-                if added > 0:
-                    total_files += 1
-                    total_new_chunks += added
-
-    logger.info(f"Done indexing. Processed {total_files} files total. Added {total_new_chunks} new chunks.")
-    print(f"\n✅ Done indexing. Processed {total_files} files total. Added {total_new_chunks} new chunks.")
+    logger.info(f"Connecting to Chroma at '{CHROMA_DB_PATH}'")
+    print(f"🔗 Connecting to Chroma at '{CHROMA_DB_PATH}' ...")
+    client = get_chroma_client(CHROMA_DB_PATH)
+    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    embed_model = get_embed_model(bulk=True)
+
+    prioritize_plan(plan, manifest, COLLECTION_NAME)
+    if plan["priority_count"]:
+        print(f"🔝 Indexing {plan['priority_count']} priority file(s) first.")
+    progress = ProgressTracker(manifest, COLLECTION_NAME, plan)
+    summary = apply_index_plan(plan, collection, embed_model, manifest, known_states,
+                               reindex_single_file, batch_size=batch_size,
+                               progress=progress, priority_count=plan["priority_count"],
+                               throttle=get_throttle(throttled))
+    progress.finish()
+    record_indexed_commit(collection)
+
+    elapsed = time.perf_counter() - start_time
+    plan_summary = format_plan_summary(summary, elapsed)
+    logger.info(f"Done indexing. Processed {summary['files_with_new_chunks']} files total. "
+                f"Added {summary['new_chunks']} new chunks in {summary['batches']} batch(es), "
+                f"{summary['chunks_per_second']:.1f} chunks/sec. {plan_summary}")
+    print(f"\n✅ Done indexing. Processed {summary['files_with_new_chunks']} files total. "
+          f"Added {summary['new_chunks']} new chunks in {summary['batches']} batch(es), "
+          f"{summary['chunks_per_second']:.1f} chunks/sec.")
+    print(f"   📊 {plan_summary}")
+    cache_summary = describe_cache_stats(embed_model)
+    if cache_summary:
+        logger.info(cache_summary)
+        print(f"   📦 {cache_summary}")
+    return summary
+
+def index_codebase_since(since=None, batch_size=EMBED_BATCH_SIZE, throttled=False):
+    """
+    Reindexes only the files git reports changed, renamed or deleted since `since`
+    (default: the last indexed commit in the collection's metadata), then records HEAD.
+    Falls back to the stat-manifest walk when there is no usable revision.
+    """
+    start_time = time.perf_counter()
+    client = get_chroma_client(CHROMA_DB_PATH)
+    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    since = since or get_indexed_commit(collection)
+    try:
+        if not since:
+            raise GitError("no indexed commit recorded yet")
+        repo = git_toplevel(PROJECT_ROOT)
+        changes = git_changed_paths(repo, since)
+    except GitError as e:
+        logger.info(f"Git-diff mode unavailable ({e}); running the stat-manifest walk")
+        print(f"⚠ Git-diff mode unavailable ({e}); running the stat-manifest walk instead.")
+        if index_codebase(batch_size=batch_size, throttled=throttled) is None:
+            record_indexed_commit(collection)   # nothing to walk; the full index records HEAD itself
+        return
+
+    manifest = get_manifest(CHROMA_DB_PATH)
+    known_states = manifest.file_states(COLLECTION_NAME)
+    plan = plan_git_index(changes, ROOT_DIRS, SKIP_DIRS, accept_file, known_states)
+    if not plan["candidates"] and not plan["deleted"] and not plan["renamed"]:
+        record_indexed_commit(collection)
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Index up to date with git since {since} ({elapsed:.2f}s).")
+        print(f"\n✅ Index up to date with git since {since[:12]}, nothing to reindex ({elapsed:.2f}s).")
+        return
+
+    print(f"🔀 Git reports {len(plan['candidates'])} changed, {len(plan['renamed'])} renamed and "
+          f"{len(plan['deleted'])} deleted file(s) since {since[:12]}")
+    embed_model = get_embed_model(bulk=True)
+    summary = apply_index_plan(plan, collection, embed_model, manifest, known_states,
+                               reindex_single_file, batch_size=batch_size, throttle=get_throttle(throttled))
+    commit = record_indexed_commit(collection)
+
+    plan_summary = format_plan_summary(summary, time.perf_counter() - start_time)
+    logger.info(f"Git-diff reindex since {since} -> {commit}: {plan_summary}")
+    print(f"\n✅ Git-diff reindex done: {summary['new_chunks']} new chunk(s).")
+    print(f"   📊 {plan_summary}")
+
+def install_git_hooks():
+    repo = git_toplevel(PROJECT_ROOT)
+    command = f'"{sys.executable}" "{os.path.abspath(__file__)}" --git-hook'
+    written = install_hooks(repo, command)
+    for path in written:
+        print(f"✅ Installed git hook: {path}")
+    if not written:
+        print("✅ Git hooks already installed.")
 
 ##############################################################################
 # Watchers
 ##############################################################################
 
-class CodebaseEventHandler(FileSystemEventHandler):
-    def __init__(self, collection, embed_model):
-        super().__init__()
-        self.collection = collection
-        self.embed_model = embed_model
-        self._pending_changes = {}
-        self._lock = threading.Lock()
-
-    def on_modified(self, event):
-        if not event.is_directory:
-            self._handle_change(event.src_path)
-
-    def on_created(self, event):
-        if not event.is_directory:
-            self._handle_change(event.src_path)
-
-    def on_moved(self, event):
-        if not event.is_directory:
-            logger.info(f"File renamed from {event.src_path} -> {event.dest_path}")
-            print(f"\n🔄 File renamed from {event.src_path} -> {event.dest_path}")
-            self.remove_file_chunks(event.src_path)
-            ext = os.path.splitext(event.dest_path)[1].lower()
-            if ext in ALLOWED_EXTENSIONS:
-                self._handle_change(event.dest_path)
-
-    def on_deleted(self, event):
-        if not event.is_directory:
-            logger.info(f"File deleted: {event.src_path}, removing old chunks.")
-            print(f"\n❌ File deleted: {event.src_path}, removing old chunks.")
-            self.remove_file_chunks(event.src_path)
-
-    def remove_file_chunks(self, filepath):
-        existing_results = self.collection.get(limit=9999)
-        if existing_results and "ids" in existing_results and existing_results["ids"]:
-            matched_ids = []
-            for doc_id in existing_results["ids"]:
-                if doc_id.startswith(f"{filepath}::chunk_"):
-                    matched_ids.append(doc_id)
-            if matched_ids:
-                self.collection.delete(ids=matched_ids)
-                logger.info(f"Removed {len(matched_ids)} old chunk(s) for deleted/renamed file: {filepath}")
-                print(f"   🔸 Removed {len(matched_ids)} old chunk(s) for deleted/renamed file: {filepath}")
-
-    def _handle_change(self, filepath):
-        with self._lock:
-            self._pending_changes[filepath] = time.time()
-        threading.Thread(target=self._debounce_and_index, args=(filepath,)).start()
-
-    def _debounce_and_index(self, filepath):
-        time.sleep(DEBOUNCE_SECONDS)
-        with self._lock:
-            last_t = self._pending_changes.get(filepath, None)
-            if not last_t:
-                return
-            if (time.time() - last_t) >= DEBOUNCE_SECONDS:
-                self._pending_changes.pop(filepath, None)
-            else:
-                return
-
-        logger.info(f"Debounced re-index for file: {filepath}")
-        print(f"\n🔄 Debounced re-index for file: {filepath}")
-        reindex_single_file(filepath, self.collection, self.embed_model)
-
-def watch_for_changes():
-    logger.info(f"Connecting to Chroma at '{CHROMA_DB_PATH}' for watchers...")
-    print(f"🔗 Connecting to Chroma at '{CHROMA_DB_PATH}' for watchers...")
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
-    embed_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    event_handler = CodebaseEventHandler(collection, embed_model)
-    observer = watchdog.observers.Observer()
-
-    for root_dir in ROOT_DIRS:
-        if os.path.exists(root_dir):
-            observer.schedule(event_handler, path=root_dir, recursive=True)
-            logger.info(f"Watching {root_dir} for changes...")
-            print(f"👀 Watching {root_dir} for changes...")
-
-    observer.start()
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        observer.stop()
-    observer.join()
+def index_source():
+    """
+    Describes this indexer for scripts/indexing_daemon.py. reindex_single_file is
+    looked up at call time so patched module globals are honoured.
+    """
+    return IndexSource(
+        name="codebase",
+        collection_name=COLLECTION_NAME,
+        root_dirs=ROOT_DIRS,
+        skip_dirs=SKIP_DIRS,
+        accept=accept_file,
+        reindex_fn=lambda *args, **kwargs: reindex_single_file(*args, **kwargs)
+    )
+
+def watch_for_changes(throttled=None):
+    """
+    Watches only this indexer's roots. To watch every indexer with one model,
+    client and observer, run scripts/indexing_daemon.py instead.
+    """
+    run_daemon(
+        [index_source()],
+        chroma_path=CHROMA_DB_PATH,
+        initial_sync=False,
+        throttled=throttled,
+        debounce_seconds=DEBOUNCE_SECONDS,
+        max_workers=WATCH_MAX_WORKERS,
+        storm_threshold=STORM_THRESHOLD
+    )
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Index codebase + watchers + line-based chunking for code files only.")
     parser.add_argument("--watch", action="store_true", help="Watch for file changes in real time.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding call / Chroma write.")
+    parser.add_argument("--full", action="store_true", help="Ignore the stat manifest and re-read every file.")
+    parser.add_argument("--since", metavar="REV", help="Reindex only files git reports changed since REV.")
+    parser.add_argument("--git-hook", action="store_true", help="Reindex files changed since the last indexed commit.")
+    parser.add_argument("--install-hooks", action="store_true", help="Install post-commit/checkout/merge hooks running --git-hook.")
+    parser.add_argument("--no-throttle", action="store_true", help="Index at full priority, ignoring LLM requests and system load.")
     args = parser.parse_args()
 
-    if args.watch:
-        watch_for_changes()
+    throttled = False if args.no_throttle else None
+    if get_throttle(throttled) is not None and not args.install_hooks and not args.watch:
+        lower_priority()
+
+    if args.install_hooks:
+        install_git_hooks()
+    elif args.watch:
+        watch_for_changes(throttled=throttled)
+    elif args.since or args.git_hook:
+        index_codebase_since(args.since, batch_size=args.batch_size, throttled=throttled)
     else:
-        index_codebase()
\ No newline at end of file
+        index_codebase(batch_size=args.batch_size, full=args.full, throttled=throttled)
\ No newline at end of file
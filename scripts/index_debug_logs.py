@@ -2,31 +2,57 @@
 """
 index_debug_logs.py 
 
-Indexes debug logs (e.g., .json, .txt) from /logs into a debugging_logs (or debugging_logs_test) collection
-for RAG retrieval, using line-based chunking for large files.
+Indexes debug logs (e.g., .json, .txt, .log) from /logs into a debugging_logs (or debugging_logs_test) collection
+for RAG retrieval, using token-packed line chunks sized to the embedding model
+(scripts/token_chunker.py).
+Append-only logs (TAIL_EXTENSIONS) are tail-indexed from a byte-offset checkpoint
+(scripts/tail_indexer.py): an append only embeds the new tail, while rotation, truncation
+or a rewrite triggers a full rebuild of that file.
+JSON logs (debug_logs.json, debugging_strategy_log.json) are indexed one document per
+entry (scripts/json_records.py), so an update only re-embeds the entries that changed;
+malformed JSON falls back to line chunks.
+One-shot runs only touch files whose stat signature changed; --watch runs this indexer's
+source through scripts/indexing_daemon.py, which can also watch every indexer at once.
+Runs from the command line are reniced and pause embedding while an LLM request is in
+flight or the machine is busy (scripts/index_throttle.py); --no-throttle disables it.
 
 Usage:
     python index_debug_logs.py
         (one-shot indexing)
     python index_debug_logs.py --watch
         (start watchers in real-time)
+    python index_debug_logs.py --batch-size 128
+        (chunks embedded per model call / written per Chroma transaction)
+    python index_debug_logs.py --full
+        (ignore the stat manifest and re-read every file)
     python index_debug_logs.py --test
         (use debugging_logs_test for testing)
+    python index_debug_logs.py --no-throttle
+        (index at full priority, ignoring LLM requests and system load)
 """
 
 import os
 import sys
 import time
 import hashlib
-import threading
 import argparse
 
-import chromadb
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-
-import watchdog.events
-import watchdog.observers
-from watchdog.events import FileSystemEventHandler
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.indexing_utils import (
+    EMBED_BATCH_SIZE, apply_index_plan, format_plan_summary, hash_file,
+    plan_incremental_index, record_file_state, sync_file_chunks
+)
+from scripts.indexing_daemon import IndexSource, run_daemon
+from scripts.index_manifest import get_manifest
+from scripts.index_throttle import get_throttle, lower_priority
+from scripts.embeddings import describe_cache_stats
+from scripts.recall_daemon import get_chroma_client, get_embed_model
+from scripts.token_chunker import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, chunk_lines_by_tokens
+from scripts.tail_indexer import index_file_tail, tail_signature
+from scripts.json_records import JSONRecordError, build_record_chunks
 
 ##############################################################################
 # CONFIG
@@ -35,17 +61,23 @@ from watchdog.events import FileSystemEventHandler
 CHROMA_DB_PATH = "/mnt/f/projects/ai-recall-system/chroma_db"
 COLLECTION_NAME_BASE = "debugging_logs"
 
-CHUNK_SIZE_DEFAULT = 300    # lines, for debug logs
-CHUNK_OVERLAP = 50         # overlap for debug logs
-ALLOWED_EXTENSIONS = {".json", ".txt"}  # Only debug log files
+CHUNK_SIZE_DEFAULT = 300    # lines, for chunk_lines_with_range (legacy line windows)
+CHUNK_OVERLAP = 50         # overlap for chunk_lines_with_range
+CHUNK_MAX_TOKENS = DEFAULT_MAX_TOKENS          # word pieces per chunk (model limit minus [CLS]/[SEP])
+CHUNK_OVERLAP_TOKENS = DEFAULT_OVERLAP_TOKENS  # word pieces shared by consecutive chunks
+ALLOWED_EXTENSIONS = {".json", ".txt", ".log"}  # Only debug log files
+TAIL_EXTENSIONS = {".txt", ".log"}  # Append-only logs, indexed from a byte-offset checkpoint
 SKIP_DIRS = {
     "chroma_db", ".git", "__pycache__", ".idea", "venv", ".pytest_cache", 
-    "node_modules", ".next", "dist", "archive", "knowledge_base", "agent_knowledge_bases", "code_base", "scripts", "tests", "frontend"
+    "node_modules", ".next", "dist", "archive", "knowledge_base", "agent_knowledge_bases", "code_base", "scripts", "tests", "frontend",
+    "script_logs"  # the indexers' own logs: indexing them would retrigger the watchers
 }
 SKIP_FILES = {"compiled_debug_logs.md", "work_session.md", "debugging_strategies.json", "daily_summary.md", "daily_summary.json"}  # Exclude markdown, keep these skipped
 
 ROOT_DIRS = ["/mnt/f/projects/ai-recall-system/logs"]  # Focus on debug logs
 DEBOUNCE_SECONDS = 2.0
+WATCH_MAX_WORKERS = 2       # concurrent reindex jobs in watch mode
+STORM_THRESHOLD = 256       # pending paths before watchers switch to one reconcile pass
 
 ##############################################################################
 # UTILS
@@ -82,199 +114,233 @@ def chunk_lines_with_range(lines, start_idx, chunk_size=300, overlap=0):
 # reindex_single_file
 ##############################################################################
 
-def reindex_single_file(filepath, collection, embed_model):
+def chunk_metadata(filepath, chunk_index, chunk_hash, start_line, end_line, token_count, mod_time):
+    return {
+        "filepath": filepath,
+        "rel_path": filepath,
+        "chunk_index": chunk_index,
+        "hash": chunk_hash,
+        "mod_time": mod_time,
+        "start_line": int(start_line),
+        "end_line": int(end_line),
+        "token_count": int(token_count),
+        "log_type": "debug"  # Generic for debug logs
+    }
+
+def is_tail_file(filepath):
+    return os.path.splitext(filepath)[1].lower() in TAIL_EXTENSIONS
+
+def file_state_hash(filepath):
+    """Content signature for the stat manifest; append-only logs are not hashed in full."""
+    return tail_signature(filepath) if is_tail_file(filepath) else hash_file(filepath)
+
+def accept_file(filepath):
+    """True for files this indexer owns (allowed extensions, not in SKIP_FILES)."""
+    ext = os.path.splitext(filepath)[1].lower()
+    return ext in ALLOWED_EXTENSIONS and os.path.basename(filepath) not in SKIP_FILES
+
+def build_json_record_chunks(filepath):
+    """
+    One chunk per JSON log entry, keyed by its "id". Returns None (after a warning)
+    if the file is not an array/object of records, so the caller falls back to lines.
+    """
+    try:
+        return build_record_chunks(filepath, compute_md5_hash, base_meta={"log_type": "debug"},
+                                   max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS)
+    except (JSONRecordError, UnicodeDecodeError) as e:
+        print(f"⚠ {filepath} is not valid JSON records ({e}); falling back to line chunks.")
+        return None
+
+def build_file_chunks(filepath):
+    """
+    Reads and chunks a single debug logs file.
+    Returns a list of (doc_id, chunk_text, metadata), or None if the file is skipped.
+    """
     ext = os.path.splitext(filepath)[1].lower()
     if ext not in ALLOWED_EXTENSIONS:
-        return 0
+        return None
     if not os.path.exists(filepath) or os.path.isdir(filepath):
-        return 0
+        return None
     if os.path.basename(filepath) in SKIP_FILES:
-        return 0
+        return None
+
+    if ext == ".json" and os.path.getsize(filepath) > 0:
+        chunks = build_json_record_chunks(filepath)
+        if chunks is not None:
+            return chunks
 
     try:
         with open(filepath, "r", encoding="utf-8") as f:
             text = f.read()
     except Exception as e:
         print(f"⚠ Error reading {filepath}: {e}")
-        return 0
+        return None
 
     if not text.strip():
-        return 0
-
-    # Remove old doc_ids for this file
-    existing_results = collection.get(limit=9999)
-    if existing_results and "ids" in existing_results and existing_results["ids"]:
-        matched_ids = []
-        for doc_id in existing_results["ids"]:
-            if doc_id.startswith(f"{filepath}::chunk_"):
-                matched_ids.append(doc_id)
-        if matched_ids:
-            collection.delete(ids=matched_ids)
-            print(f"   🔸 Removed {len(matched_ids)} old chunk(s) for updated file: {filepath}")
+        return None
 
     lines = text.splitlines()
-    new_chunks_for_file = 0
+    mod_time = os.path.getmtime(filepath)
+    chunks = []
 
-    # Use line-based chunking for debug logs
-    chunk_size = CHUNK_SIZE_DEFAULT
-    overlap = CHUNK_OVERLAP
-    line_blocks = chunk_lines_with_range(lines, 0, chunk_size=chunk_size, overlap=overlap)
-    for idx, (chunk_text, st_line, end_line) in enumerate(line_blocks):
+    # Pack lines up to the embedding model's token limit
+    line_blocks = chunk_lines_by_tokens(lines, 0, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS)
+    for idx, (chunk_text, st_line, end_line, token_count) in enumerate(line_blocks):
         if not chunk_text.strip():
             continue
         chunk_hash = compute_md5_hash(chunk_text)
         doc_id = f"{filepath}::chunk_{idx}::hash_{chunk_hash}"
 
-        embedding = embed_model.embed_documents([chunk_text])[0]
-
-        meta = {
-            "filepath": filepath,
-            "rel_path": filepath,
-            "chunk_index": idx,
-            "hash": chunk_hash,
-            "mod_time": os.path.getmtime(filepath),
-            "start_line": int(st_line),
-            "end_line": int(end_line),
-            "log_type": "debug"  # Generic for debug logs
-        }
-
-        collection.add(
-            documents=[chunk_text],
-            embeddings=[embedding],
-            metadatas=[meta],
-            ids=[doc_id]
-        )
-        new_chunks_for_file += 1
+        meta = chunk_metadata(filepath, idx, chunk_hash, st_line, end_line, token_count, mod_time)
+        chunks.append((doc_id, chunk_text, meta))
+
+    return chunks
+
+def reindex_single_file(filepath, collection, embed_model, writer=None, manifest=None):
+    """
+    Re-chunks one file and syncs its chunks in the collection, embedding only
+    chunks whose content hash is not already stored for this file.
+    If a ChunkBatchWriter is given, the new chunks are queued on it (so a directory
+    walk batches across files); otherwise they are embedded and written here in batches.
+    Old chunks are found through the per-file manifest, not a collection scan.
+    Append-only logs (TAIL_EXTENSIONS) go through reindex_log_tail() instead.
+    Returns the number of newly embedded chunks.
+    """
+    if is_tail_file(filepath):
+        return reindex_log_tail(filepath, collection, embed_model, writer=writer, manifest=manifest)
 
+    chunks = build_file_chunks(filepath)
+    if chunks is None:
+        return 0
+
+    if manifest is None:
+        manifest = get_manifest(CHROMA_DB_PATH)
+
+    stats = sync_file_chunks(collection, filepath, chunks, embed_model, manifest=manifest, writer=writer)
+    if stats["removed"]:
+        print(f"   🔸 Removed {stats['removed']} stale chunk(s) for updated file: {filepath}")
+
+    new_chunks_for_file = stats["added"]
     if new_chunks_for_file > 0:
-        print(f"   ⮑ Re-indexed {new_chunks_for_file} chunk(s) from {filepath}")
+        print(f"   ⮑ Re-indexed {new_chunks_for_file} new chunk(s) from {filepath} ({stats['kept']} unchanged chunk(s) kept)")
 
+    record_file_state(manifest, collection.name, filepath, writer=writer)
     return new_chunks_for_file
 
+def reindex_log_tail(filepath, collection, embed_model, writer=None, manifest=None):
+    """
+    Embeds only the lines appended to an append-only log since its checkpoint
+    (full rebuild after rotation / truncation / rewrite). Returns the number of new chunks.
+    """
+    if not accept_file(filepath) or not os.path.isfile(filepath):
+        return 0
+    if manifest is None:
+        manifest = get_manifest(CHROMA_DB_PATH)
+
+    try:
+        stats = index_file_tail(
+            collection, filepath, embed_model, manifest,
+            make_meta=chunk_metadata, hash_fn=compute_md5_hash, writer=writer,
+            max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS
+        )
+    except OSError as e:
+        print(f"⚠ Error reading {filepath}: {e}")
+        return 0
+
+    if stats["rebuilt"]:
+        print(f"   🔁 {filepath} was {stats['rebuilt']}: rebuilt its index ({stats['removed']} old chunk(s) removed)")
+    if stats["added"] > 0:
+        print(f"   ⮑ Indexed {stats['added']} chunk(s) from {stats['bytes']} new byte(s) of {filepath}")
+
+    record_file_state(manifest, collection.name, filepath, file_state_hash(filepath), writer=writer)
+    return stats["added"]
+
 ##############################################################################
 # One-shot indexing
 ##############################################################################
 
-def index_debug_logs(test_mode=False):
+def index_debug_logs(test_mode=False, batch_size=EMBED_BATCH_SIZE, full=False, throttled=False):
+    start_time = time.perf_counter()
     collection_name = f"{COLLECTION_NAME_BASE}_test" if test_mode else COLLECTION_NAME_BASE
-    print(f"🔗 Connecting to Chroma at '{CHROMA_DB_PATH}' for {collection_name} ...")
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = client.get_or_create_collection(name=collection_name)
-    embed_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    total_files = 0
-    total_new_chunks = 0
+    manifest = get_manifest(CHROMA_DB_PATH)
+    known_states = {} if full else manifest.file_states(collection_name)
 
     for root_dir in ROOT_DIRS:
         if not os.path.exists(root_dir):
             print(f"⚠ Root dir not found: {root_dir}. Skipping.")
-            continue
 
-        for current_root, dirs, files in os.walk(root_dir):
-            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+    # Stat-only pass: nothing is read, chunked or embedded for unchanged files
+    plan = plan_incremental_index(ROOT_DIRS, SKIP_DIRS, accept_file, known_states)
+    if not plan["candidates"] and not plan["deleted"]:
+        elapsed = time.perf_counter() - start_time
+        print(f"\n✅ Index up to date: {plan['unchanged']} file(s) unchanged, nothing to reindex ({elapsed:.2f}s).")
+        return
 
-            for filename in files:
-                filepath = os.path.join(current_root, filename)
-                added = reindex_single_file(filepath, collection, embed_model)
-                if added > 0:
-                    total_files += 1
-                    total_new_chunks += added
+    print(f"🔗 Connecting to Chroma at '{CHROMA_DB_PATH}' for {collection_name} ...")
+    client = get_chroma_client(CHROMA_DB_PATH)
+    collection = client.get_or_create_collection(name=collection_name)
+    embed_model = get_embed_model(bulk=True)
 
-    print(f"\n✅ Done indexing. Processed {total_files} files total. Added {total_new_chunks} new chunks.")
+    summary = apply_index_plan(plan, collection, embed_model, manifest, known_states,
+                               reindex_single_file, batch_size=batch_size,
+                               content_hash_fn=file_state_hash, throttle=get_throttle(throttled))
+
+    print(f"\n✅ Done indexing. Processed {summary['files_with_new_chunks']} files total. "
+          f"Added {summary['new_chunks']} new chunks in {summary['batches']} batch(es), "
+          f"{summary['chunks_per_second']:.1f} chunks/sec.")
+    print(f"   📊 {format_plan_summary(summary, time.perf_counter() - start_time)}")
+    cache_summary = describe_cache_stats(embed_model)
+    if cache_summary:
+        print(f"   📦 {cache_summary}")
 
 ##############################################################################
 # Watchers
 ##############################################################################
 
-class DebugLogsEventHandler(FileSystemEventHandler):
-    def __init__(self, collection, embed_model):
-        super().__init__()
-        self.collection = collection
-        self.embed_model = embed_model
-        self._pending_changes = {}
-        self._lock = threading.Lock()
-
-    def on_modified(self, event):
-        if not event.is_directory:
-            self._handle_change(event.src_path)
-
-    def on_created(self, event):
-        if not event.is_directory:
-            self._handle_change(event.src_path)
-
-    def on_moved(self, event):
-        if not event.is_directory:
-            print(f"\n🔄 File renamed from {event.src_path} -> {event.dest_path}")
-            self.remove_file_chunks(event.src_path)
-            ext = os.path.splitext(event.dest_path)[1].lower()
-            if ext in ALLOWED_EXTENSIONS:
-                self._handle_change(event.dest_path)
-
-    def on_deleted(self, event):
-        if not event.is_directory:
-            print(f"\n❌ File deleted: {event.src_path}, removing old chunks.")
-            self.remove_file_chunks(event.src_path)
-
-    def remove_file_chunks(self, filepath):
-        existing_results = self.collection.get(limit=9999)
-        if existing_results and "ids" in existing_results and existing_results["ids"]:
-            matched_ids = []
-            for doc_id in existing_results["ids"]:
-                if doc_id.startswith(f"{filepath}::chunk_"):
-                    matched_ids.append(doc_id)
-            if matched_ids:
-                self.collection.delete(ids=matched_ids)
-                print(f"   🔸 Removed {len(matched_ids)} old chunk(s) for deleted/renamed file: {filepath}")
-
-    def _handle_change(self, filepath):
-        with self._lock:
-            self._pending_changes[filepath] = time.time()
-        threading.Thread(target=self._debounce_and_index, args=(filepath,)).start()
-
-    def _debounce_and_index(self, filepath):
-        time.sleep(DEBOUNCE_SECONDS)
-        with self._lock:
-            last_t = self._pending_changes.get(filepath, None)
-            if not last_t:
-                return
-            if (time.time() - last_t) >= DEBOUNCE_SECONDS:
-                self._pending_changes.pop(filepath, None)
-            else:
-                return
-
-        print(f"\n🔄 Debounced re-index for file: {filepath}")
-        reindex_single_file(filepath, self.collection, self.embed_model)
-
-def watch_for_changes(test_mode=False):
-    collection_name = f"{COLLECTION_NAME_BASE}_test" if test_mode else COLLECTION_NAME_BASE
-    print(f"🔗 Connecting to Chroma at '{CHROMA_DB_PATH}' for watchers on {collection_name}...")
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = client.get_or_create_collection(name=collection_name)
-    embed_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    event_handler = DebugLogsEventHandler(collection, embed_model)
-    observer = watchdog.observers.Observer()
-
-    for root_dir in ROOT_DIRS:
-        if os.path.exists(root_dir):
-            observer.schedule(event_handler, path=root_dir, recursive=True)
-            print(f"👀 Watching {root_dir} for changes...")
-
-    observer.start()
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        observer.stop()
-    observer.join()
+def index_source(test_mode=False):
+    """
+    Describes this indexer for scripts/indexing_daemon.py. reindex_single_file is
+    looked up at call time so patched module globals are honoured.
+    """
+    return IndexSource(
+        name="debug_logs",
+        collection_name=f"{COLLECTION_NAME_BASE}_test" if test_mode else COLLECTION_NAME_BASE,
+        root_dirs=ROOT_DIRS,
+        skip_dirs=SKIP_DIRS,
+        accept=accept_file,
+        reindex_fn=lambda *args, **kwargs: reindex_single_file(*args, **kwargs),
+        content_hash_fn=file_state_hash
+    )
+
+def watch_for_changes(test_mode=False, throttled=None):
+    """
+    Watches only this indexer's roots. To watch every indexer with one model,
+    client and observer, run scripts/indexing_daemon.py instead.
+    """
+    run_daemon(
+        [index_source(test_mode=test_mode)],
+        chroma_path=CHROMA_DB_PATH,
+        initial_sync=False,
+        throttled=throttled,
+        debounce_seconds=DEBOUNCE_SECONDS,
+        max_workers=WATCH_MAX_WORKERS,
+        storm_threshold=STORM_THRESHOLD
+    )
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Index debug logs + watchers + line-based chunking for debug files only.")
     parser.add_argument("--watch", action="store_true", help="Watch for file changes in real time.")
     parser.add_argument("--test", action="store_true", help="Use debugging_logs_test for testing.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding call / Chroma write.")
+    parser.add_argument("--full", action="store_true", help="Ignore the stat manifest and re-read every file.")
+    parser.add_argument("--no-throttle", action="store_true", help="Index at full priority, ignoring LLM requests and system load.")
     args = parser.parse_args()
 
+    throttled = False if args.no_throttle else None
+    if get_throttle(throttled) is not None and not args.watch:
+        lower_priority()
+
     if args.watch:
-        watch_for_changes(test_mode=args.test)
+        watch_for_changes(test_mode=args.test, throttled=throttled)
     else:
-        index_debug_logs(test_mode=args.test)
\ No newline at end of file
+        index_debug_logs(test_mode=args.test, batch_size=args.batch_size, full=args.full, throttled=throttled)
\ No newline at end of file
@@ -3,17 +3,50 @@
 index_knowledgebase.py
 
 Indexes markdown files from /knowledge_base and /agent_knowledge_bases into the knowledge_base ChromaDB collection,
-deduplicating by mtime and hash, using a "newest version only" system. Run manually when markdowns change.
+deduplicating by content hash, using a "newest version only" system.
+
+A run hashes every markdown file in parallel, looks up what is already stored with ONE
+batched metadata query, and only re-chunks the files whose hash changed. Their chunks are
+embedded in batches with the shared MiniLM model (scripts/embeddings.py, with the
+embedding cache) and written with bulk upserts, replacing the file's previous chunks.
+--watch runs this indexer's source through scripts/indexing_daemon.py like the other indexers.
+
+Usage:
+    python index_knowledgebase.py
+        (one-shot indexing)
+    python index_knowledgebase.py --watch
+        (start watchers in real-time)
+    python index_knowledgebase.py --batch-size 128
+        (chunks embedded per model call / written per Chroma transaction)
+    python index_knowledgebase.py --workers 8
+        (threads hashing and chunking files)
+    python index_knowledgebase.py --test
+        (use knowledge_base_test for testing; MODE=test does the same)
 """
 
 import os
 import re
+import sys
 import time
 import logging
 import hashlib
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-import chromadb
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.indexing_utils import (
+    EMBED_BATCH_SIZE, HASH_BLOCK_SIZE, embed_and_write, mark_collection_changed, record_file_chunks, record_file_state
+)
+from scripts.indexing_daemon import IndexSource, run_daemon
+from scripts.index_manifest import get_manifest
+from scripts.lexical_index import get_lexical_index, lexical_index_for
+from scripts.embeddings import describe_cache_stats
+from scripts.recall_daemon import get_chroma_client, get_embed_model
 
 # Configure logging to file
 LOG_FILE = "/mnt/f/projects/ai-recall-system/logs/script_logs/index_knowledgebase.log"
@@ -24,31 +57,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize ChromaDB and embeddings
-chroma_client = chromadb.PersistentClient(path="/mnt/f/projects/ai-recall-system/chroma_db/")
-embed_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+##############################################################################
+# CONFIG
+##############################################################################
+
+CHROMA_DB_PATH = "/mnt/f/projects/ai-recall-system/chroma_db/"
+COLLECTION_NAME_BASE = "knowledge_base"
+KNOWLEDGE_BASE_DIR = "/mnt/f/projects/ai-recall-system/knowledge_base/"
+AGENT_KNOWLEDGE_BASES_DIR = "/mnt/f/projects/ai-recall-system/agent_knowledge_bases/"
+KNOWLEDGEBASE_DIRS = [KNOWLEDGE_BASE_DIR, AGENT_KNOWLEDGE_BASES_DIR]
+
+CHUNK_SIZE_CHARS = 500      # approximate characters per markdown chunk
+HASH_WORKERS = min(8, (os.cpu_count() or 1) * 2)  # threads hashing / chunking files
+SKIP_DIRS = {".git", "__pycache__", ".idea", "venv", "node_modules"}
+DEBOUNCE_SECONDS = 2.0
+WATCH_MAX_WORKERS = 2       # concurrent reindex jobs in watch mode
+STORM_THRESHOLD = 256       # pending paths before watchers switch to one reconcile pass
+
+##############################################################################
+# UTILS
+##############################################################################
 
-def chunk_markdown(text, chunk_size=500):
+def chunk_markdown(text, chunk_size=CHUNK_SIZE_CHARS):
     """
     Chunks markdown text into segments of approximately chunk_size characters,
     preserving section boundaries where possible.
+    Lines are collected in a list with a running length and joined once per chunk.
     """
     sections = re.split(r"\n#{1,6}\s+", text)  # Split by markdown headers
     chunks = []
-    current_chunk = ""
+    current = []        # lines of the chunk being built
+    current_len = 0     # len("\n".join(current))
     for section in sections:
         if not section.strip():
             continue
-        lines = section.strip().split("\n")
-        for line in lines:
-            if len(current_chunk) + len(line) + 1 > chunk_size:  # +1 for newline
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = line
+        for line in section.strip().split("\n"):
+            if current_len + len(line) + 1 > chunk_size:  # +1 for newline
+                if current_len:
+                    chunks.append("\n".join(current).strip())
+                current = [line]
+                current_len = len(line)
+            elif current_len:
+                current.append(line)
+                current_len += len(line) + 1
             else:
-                current_chunk += "\n" + line if current_chunk else line
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+                current = [line]
+                current_len = len(line)
+    if current_len:
+        chunks.append("\n".join(current).strip())
     return chunks
 
 def get_file_hash(filepath):
@@ -57,87 +113,257 @@ def get_file_hash(filepath):
     """
     sha256_hash = hashlib.sha256()
     with open(filepath, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
+        for byte_block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
 
-def index_markdown_file(markdown_path, collection_name="knowledge_base"):
+def _is_agent_readme(filepath):
+    agent_root = os.path.abspath(AGENT_KNOWLEDGE_BASES_DIR)
+    return (os.path.basename(filepath) == "README.md"
+            and os.path.dirname(os.path.dirname(os.path.abspath(filepath))) == agent_root)
+
+def accept_file(filepath):
+    """True for .md files directly in /knowledge_base and README.md files of each agent folder."""
+    if _is_agent_readme(filepath):
+        return True
+    return (filepath.endswith(".md")
+            and os.path.dirname(os.path.abspath(filepath)) == os.path.abspath(KNOWLEDGE_BASE_DIR))
+
+def doc_key_for(markdown_path):
+    """
+    Chunk id prefix of a file: filename-based, with the agent name for agent READMEs
+    (e.g. engineer_knowledge_README.md for .../engineer_knowledge/README.md).
+    """
+    base_name = os.path.basename(markdown_path)
+    if "agent_knowledge_bases" in markdown_path:
+        return f"{Path(markdown_path).parent.name}_{base_name}"
+    return base_name
+
+def source_for(markdown_path):
+    if "agent_knowledge_bases" in markdown_path:
+        return f"agent_{Path(markdown_path).parent.name}"
+    return os.path.dirname(markdown_path).split("/")[-1]
+
+def list_markdown_files(directories=None):
+    """Every .md file in /knowledge_base plus the README.md of each agent folder."""
+    paths = []
+    for directory in directories or KNOWLEDGEBASE_DIRS:
+        if not os.path.isdir(directory):
+            logger.warning(f"⚠️ Knowledge base dir not found: {directory}. Skipping.")
+            continue
+        if "agent_knowledge_bases" in directory:
+            for agent_dir in sorted(os.listdir(directory)):
+                readme_path = os.path.join(directory, agent_dir, "README.md")
+                if os.path.isfile(readme_path):
+                    paths.append(readme_path)
+        else:
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith(".md"):
+                    paths.append(os.path.join(directory, filename))
+    return paths
+
+def collection_name_for(test_mode=False, collection_name=COLLECTION_NAME_BASE):
+    # Test mode from the flag, or from MODE=test in the environment
+    test_mode = test_mode or "test" in os.environ.get("MODE", "").lower()
+    return f"{collection_name}_test" if test_mode else collection_name
+
+##############################################################################
+# Bulk indexing
+##############################################################################
+
+def _stat_and_hash(markdown_path):
+    return markdown_path, Path(markdown_path).stat().st_mtime, get_file_hash(markdown_path)
+
+def hash_files(paths, max_workers=HASH_WORKERS):
+    """
+    Hashes files on a thread pool. Returns {path: (mtime, hash)};
+    unreadable files are logged and left out.
+    """
+    states = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="kb-hash") as pool:
+        futures = [pool.submit(_stat_and_hash, p) for p in paths]
+        for future in futures:
+            try:
+                path, mtime, file_hash = future.result()
+            except OSError as e:
+                logger.error(f"❌ Error hashing {e.filename}: {e}")
+                continue
+            states[path] = (mtime, file_hash)
+    return states
+
+def load_indexed_states(collection, filenames):
+    """
+    One metadata query for every file in `filenames`.
+    Returns {doc_key: {"ids": [chunk ids], "hashes": {stored file hashes}}}.
+    """
+    indexed = defaultdict(lambda: {"ids": [], "hashes": set()})
+    if not filenames or collection.count() == 0:
+        return indexed
+    results = collection.get(where={"filename": {"$in": sorted(set(filenames))}}, include=["metadatas"])
+    for doc_id, meta in zip(results.get("ids") or [], results.get("metadatas") or []):
+        meta = meta or {}
+        # Ids are "{doc_key}_{chunk_index}"; older chunks have no doc_key metadata
+        doc_key = meta.get("doc_key") or doc_id.rsplit("_", 1)[0]
+        indexed[doc_key]["ids"].append(doc_id)
+        indexed[doc_key]["hashes"].add(meta.get("hash", ""))
+    return indexed
+
+def build_markdown_chunks(markdown_path, mtime, file_hash):
+    """Reads and chunks one markdown file into (doc_id, chunk_text, metadata) tuples."""
+    with open(markdown_path, "r", encoding="utf-8") as f:
+        chunks = chunk_markdown(f.read())
+    doc_key = doc_key_for(markdown_path)
+    source = source_for(markdown_path)
+    return [
+        (f"{doc_key}_{i}", chunk, {
+            "filename": os.path.basename(markdown_path),
+            "filepath": markdown_path,
+            "doc_key": doc_key,
+            "chunk_index": i,
+            "total_chunks": len(chunks),
+            "source": source,
+            "mtime": mtime,
+            "hash": file_hash
+        })
+        for i, chunk in enumerate(chunks)
+    ]
+
+def index_markdown_files(paths, collection, embed_model, batch_size=EMBED_BATCH_SIZE,
+                         max_workers=HASH_WORKERS, writer=None, manifest=None):
+    """
+    Indexes `paths` into `collection`, re-embedding only files whose content hash changed:
+      - files are hashed (and changed files chunked) on a thread pool
+      - stored hashes come from one batched get() over all filenames
+      - old chunks of changed files are deleted in one call
+      - new chunks are embedded in batches and written with bulk upserts
+        (or queued on a ChunkBatchWriter if given)
+    Returns {"files", "skipped", "indexed", "chunks", "removed", "errors"}.
+    """
+    summary = {"files": len(paths), "skipped": 0, "indexed": 0, "chunks": 0, "removed": 0, "errors": 0}
+    states = hash_files(paths, max_workers=max_workers)
+    summary["errors"] = len(paths) - len(states)
+    indexed = load_indexed_states(collection, [os.path.basename(p) for p in states])
+
+    changed = []
+    for path, (mtime, file_hash) in states.items():
+        stored = indexed.get(doc_key_for(path))
+        if stored and stored["hashes"] == {file_hash}:
+            logger.info(f"✅ Skipped indexing {os.path.basename(path)}: No changes detected (hash: {file_hash}).")
+            summary["skipped"] += 1
+        else:
+            changed.append(path)
+    if not changed:
+        return summary
+
+    def chunk_one(path):
+        try:
+            return path, build_markdown_chunks(path, *states[path])
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"❌ Error indexing {os.path.basename(path)}: {e}")
+            return path, None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="kb-chunk") as pool:
+        chunked = [(path, chunks) for path, chunks in pool.map(chunk_one, changed) if chunks is not None]
+    summary["errors"] += len(changed) - len(chunked)
+
+    # Newest version only: drop every stored chunk of the changed files
+    lexical = lexical_index_for(manifest) if manifest is not None else get_lexical_index(CHROMA_DB_PATH)
+    if manifest is None and os.path.isdir(CHROMA_DB_PATH):
+        generations = get_manifest(CHROMA_DB_PATH)   # only bumps the collection's generation
+    else:
+        generations = manifest
+    stale_ids = [doc_id for path, _ in chunked for doc_id in indexed.get(doc_key_for(path), {"ids": []})["ids"]]
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+        if lexical is not None:
+            lexical.remove(collection.name, stale_ids)
+        summary["removed"] = len(stale_ids)
+
+    all_chunks = [chunk for _, chunks in chunked for chunk in chunks]
+    if writer is not None:
+        writer.add(all_chunks)
+    elif all_chunks:
+        embed_and_write(collection, all_chunks, embed_model, batch_size=batch_size, upsert=True, lexical=lexical)
+    if stale_ids or (all_chunks and writer is None):
+        mark_collection_changed(generations, collection, lexical)
+
+    for path, chunks in chunked:
+        record_file_chunks(collection, path, chunks, manifest, writer=writer)
+        logger.info(f"✅ Indexed {os.path.basename(path)} into {collection.name} with {len(chunks)} chunks.")
+    summary["indexed"] = len(chunked)
+    summary["chunks"] = len(all_chunks)
+    return summary
+
+##############################################################################
+# Single file / watchers
+##############################################################################
+
+def reindex_single_file(filepath, collection, embed_model, writer=None, manifest=None):
+    """
+    Indexes one markdown file (used by scripts/indexing_daemon.py).
+    Returns the number of newly embedded chunks.
+    """
+    if not os.path.isfile(filepath) or not accept_file(filepath):
+        return 0
+    if manifest is None:
+        manifest = get_manifest(CHROMA_DB_PATH)
+    summary = index_markdown_files([filepath], collection, embed_model, writer=writer, manifest=manifest, max_workers=1)
+    if summary["chunks"]:
+        print(f"   ⮑ Re-indexed {summary['chunks']} chunk(s) from {filepath} ({summary['removed']} old chunk(s) replaced)")
+    record_file_state(manifest, collection.name, filepath, writer=writer)
+    return summary["chunks"]
+
+def index_markdown_file(markdown_path, collection_name=COLLECTION_NAME_BASE):
     """
     Indexes a single markdown file into the specified ChromaDB collection,
-    deduplicating by mtime and hash, using a "newest version only" system.
+    deduplicating by hash, using a "newest version only" system.
     Adds agent identifier for READMEs in /agent_knowledge_bases.
     """
     try:
-        # Determine test mode from environment or default to False
-        test_mode = "test" in os.environ.get("MODE", "").lower()
-        collection_name = f"{collection_name}_test" if test_mode else collection_name
-
-        # Get file metadata for deduplication
-        mtime = Path(markdown_path).stat().st_mtime
-        file_hash = get_file_hash(markdown_path)
-
-        # Read the markdown file
-        with open(markdown_path, "r", encoding="utf-8") as f:
-            markdown_text = f.read()
-
-        # Generate a unique ID (no versioning, just filename-based with agent identifier if applicable)
-        base_name = os.path.basename(markdown_path)
-        if "agent_knowledge_bases" in markdown_path:
-            # Extract agent name from path (e.g., engineer_knowledge from .../engineer_knowledge/README.md)
-            agent_name = Path(markdown_path).parent.name
-            doc_id = f"{agent_name}_{base_name}"
-        else:
-            doc_id = base_name
-
-        # Chunk the markdown
-        chunks = chunk_markdown(markdown_text)
-        collection = chroma_client.get_or_create_collection(name=collection_name)
-
-        # Check for existing versions by filename, mtime, and hash
-        existing_docs = collection.get(
-            where={"filename": base_name}
-        )["metadatas"] if collection.count() > 0 else []
-        should_index = True
-        for meta in existing_docs:
-            if meta.get("mtime", 0) == mtime and meta.get("hash", "") == file_hash:
-                logger.info(f"✅ Skipped indexing {base_name}: No changes detected (mtime: {mtime}, hash: {file_hash}).")
-                should_index = False
-                break
-
-        if should_index:
-            # Clean up any old versions of this file (keep only newest)
-            collection.delete(
-                where={"filename": base_name}
-            )
-            logger.info(f"🗑️ Removed old version of {base_name} from {collection_name}.")
-
-            # Store each chunk with metadata (no version, just mtime, hash, and agent if applicable)
-            for i, chunk in enumerate(chunks):
-                metadata = {
-                    "filename": base_name,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "source": os.path.dirname(markdown_path).split("/")[-1] if "agent_knowledge_bases" not in markdown_path else f"agent_{agent_name}",
-                    "mtime": mtime,
-                    "hash": file_hash
-                }
-                collection.upsert(
-                    ids=[f"{doc_id}_{i}"],
-                    documents=[chunk],
-                    metadatas=[metadata]
-                )
-            logger.info(f"✅ Indexed {base_name} into {collection_name} with {len(chunks)} chunks.")
-        return True
+        client = get_chroma_client(CHROMA_DB_PATH)
+        collection = client.get_or_create_collection(name=collection_name_for(collection_name=collection_name))
+        summary = index_markdown_files([markdown_path], collection, get_embed_model(), max_workers=1)
+        return summary["errors"] == 0
     except Exception as e:
         logger.error(f"❌ Error indexing {os.path.basename(markdown_path)}: {e}")
         return False
 
-if __name__ == "__main__":
-    # Define directories to index
-    knowledgebase_dirs = [
-        "/mnt/f/projects/ai-recall-system/knowledge_base/",
-        "/mnt/f/projects/ai-recall-system/agent_knowledge_bases/"
-    ]
+def index_source(test_mode=False):
+    """
+    Describes this indexer for scripts/indexing_daemon.py. reindex_single_file is
+    looked up at call time so patched module globals are honoured.
+    """
+    return IndexSource(
+        name="knowledge_base",
+        collection_name=collection_name_for(test_mode),
+        root_dirs=KNOWLEDGEBASE_DIRS,
+        skip_dirs=SKIP_DIRS,
+        accept=accept_file,
+        reindex_fn=lambda *args, **kwargs: reindex_single_file(*args, **kwargs),
+        movable=False   # ids and "source" derive from doc_key_for(), not the filepath
+    )
+
+def watch_for_changes(test_mode=False):
+    """
+    Watches only this indexer's roots. To watch every indexer with one model,
+    client and observer, run scripts/indexing_daemon.py instead.
+    """
+    run_daemon(
+        [index_source(test_mode=test_mode)],
+        chroma_path=CHROMA_DB_PATH,
+        initial_sync=False,
+        debounce_seconds=DEBOUNCE_SECONDS,
+        max_workers=WATCH_MAX_WORKERS,
+        storm_threshold=STORM_THRESHOLD
+    )
+
+##############################################################################
+# One-shot indexing
+##############################################################################
+
+def index_knowledgebase(test_mode=False, batch_size=EMBED_BATCH_SIZE, max_workers=HASH_WORKERS):
+    start_time = time.perf_counter()
+    chroma_client = get_chroma_client(CHROMA_DB_PATH)
 
     # Clean up knowledge_base_test_test if it exists before starting
     try:
@@ -146,25 +372,30 @@ if __name__ == "__main__":
     except Exception as e:
         logger.warning(f"⚠️ Could not remove knowledge_base_test_test: {e}")
 
-    # Index existing markdown files, checking for duplicates
-    total_indexed = 0
-    for directory in knowledgebase_dirs:
-        if "agent_knowledge_bases" in directory:
-            # Index README.md files from each agent subfolder
-            for agent_dir in os.listdir(directory):
-                agent_path = os.path.join(directory, agent_dir)
-                if os.path.isdir(agent_path):
-                    readme_path = os.path.join(agent_path, "README.md")
-                    if os.path.exists(readme_path):
-                        if index_markdown_file(readme_path):
-                            total_indexed += 1
-        else:
-            # Index all .md files in knowledge_base
-            for filename in os.listdir(directory):
-                if filename.endswith(".md"):
-                    markdown_path = os.path.join(directory, filename)
-                    if index_markdown_file(markdown_path):
-                        total_indexed += 1
+    collection = chroma_client.get_or_create_collection(name=collection_name_for(test_mode))
+    embed_model = get_embed_model(bulk=True)
+    summary = index_markdown_files(list_markdown_files(), collection, embed_model,
+                                   batch_size=batch_size, max_workers=max_workers)
+
+    # Log totals explicitly, point to inspect_collections.py, no console output
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"✅ Completed indexing with {summary['files'] - summary['errors']} files "
+                f"({summary['indexed']} reindexed with {summary['chunks']} chunks, {summary['skipped']} unchanged) "
+                f"in {elapsed:.2f}s, chunk totals in 'inspect_collections.py'")
+    cache_summary = describe_cache_stats(embed_model)
+    if cache_summary:
+        logger.info(f"📦 {cache_summary}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index knowledge base markdown (parallel hashing, batched embeddings, bulk upserts).")
+    parser.add_argument("--watch", action="store_true", help="Watch for file changes in real time.")
+    parser.add_argument("--test", action="store_true", help="Use knowledge_base_test for testing.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding call / Chroma write.")
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS, help="Threads hashing and chunking files.")
+    args = parser.parse_args()
 
-    # Modified: Log totals explicitly, point to inspect_collections.py, no console output
-    logger.info(f"✅ Completed indexing with {total_indexed} files, chunk totals in 'inspect_collections.py'")
\ No newline at end of file
+    if args.watch:
+        watch_for_changes(test_mode=args.test)
+    else:
+        index_knowledgebase(test_mode=args.test, batch_size=args.batch_size, max_workers=args.workers)
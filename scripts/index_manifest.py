@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+index_manifest.py
+
+Persistent filepath -> chunk-id manifest shared by the line-chunking indexers
+(index_codebase.py, index_debug_logs.py, index_project_structure.py).
+
+Reindexing or deleting one file used to pull the whole collection with
+collection.get(limit=9999) and prefix-match doc ids in Python, which is
+O(collection size) and silently misses chunks past 9,999 docs.
+The manifest answers "which chunk ids belong to this file?" with one indexed
+SQLite lookup, so the cost is O(chunks in that file).
+
+It also records a (size, mtime_ns, content hash) stat signature per file, so a
+one-shot run can skip files that have not changed since they were last indexed,
+and a byte-offset checkpoint per append-only log (see tail_indexer.py), so
+appends only embed the new tail.
+
+For progressive cold indexing (scripts/index_priority.py) it also keeps an
+index_progress row per collection (how much of the tree is indexed, for readiness
+checks) and per-file retrieval hit counts recorded by aggregator_search.
+
+The indexers, the recall daemon and the scripts that write to Chroma directly (through
+bump_collection_generation()) bump a collection's generation counter after every write,
+so the search result cache (scripts/query_cache.py) can tell when a cached result went
+stale, even across processes.
+
+The manifest lives next to Chroma's own sqlite file:
+    <chroma_db>/index_manifest.sqlite3
+
+Usage:
+    python index_manifest.py [collection_name]
+        (print tracked file / chunk counts)
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+DEFAULT_CHROMA_DB_PATH = "/mnt/f/projects/ai-recall-system/chroma_db"
+MANIFEST_FILENAME = "index_manifest.sqlite3"
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    collection   TEXT NOT NULL,
+    filepath     TEXT NOT NULL,
+    size         INTEGER,
+    mtime_ns     INTEGER,
+    content_hash TEXT,
+    PRIMARY KEY (collection, filepath)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    collection TEXT NOT NULL,
+    doc_id     TEXT NOT NULL,
+    filepath   TEXT NOT NULL,
+    hash       TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (collection, doc_id)
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks (collection, filepath);
+CREATE TABLE IF NOT EXISTS tail_checkpoints (
+    collection       TEXT NOT NULL,
+    filepath         TEXT NOT NULL,
+    inode            INTEGER NOT NULL,
+    open_offset      INTEGER NOT NULL,
+    open_line        INTEGER NOT NULL,
+    open_chunk_index INTEGER NOT NULL,
+    open_doc_ids     TEXT NOT NULL,
+    end_offset       INTEGER NOT NULL,
+    head_hash        TEXT NOT NULL,
+    end_hash         TEXT NOT NULL,
+    PRIMARY KEY (collection, filepath)
+);
+CREATE TABLE IF NOT EXISTS index_progress (
+    collection     TEXT PRIMARY KEY,
+    total          INTEGER NOT NULL,
+    done           INTEGER NOT NULL,
+    priority_total INTEGER NOT NULL,
+    priority_done  INTEGER NOT NULL,
+    started_at     REAL NOT NULL,
+    updated_at     REAL NOT NULL,
+    finished_at    REAL
+);
+CREATE TABLE IF NOT EXISTS retrievals (
+    collection TEXT NOT NULL,
+    filepath   TEXT NOT NULL,
+    hits       INTEGER NOT NULL,
+    last_hit   REAL NOT NULL,
+    PRIMARY KEY (collection, filepath)
+);
+CREATE TABLE IF NOT EXISTS collection_generations (
+    collection TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+PROGRESS_FIELDS = (
+    "total", "done", "priority_total", "priority_done", "started_at", "updated_at", "finished_at"
+)
+
+TAIL_CHECKPOINT_FIELDS = (
+    "inode", "open_offset", "open_line", "open_chunk_index", "open_doc_ids",
+    "end_offset", "head_hash", "end_hash"
+)
+
+class IndexManifest:
+    """
+    Thread-safe SQLite manifest of which chunk ids each indexed file owns.
+    A file is "tracked" once it has been indexed through the manifest; for
+    untracked files callers fall back to a metadata-filtered Chroma query.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._ensure_columns("files", {"size": "INTEGER", "mtime_ns": "INTEGER", "content_hash": "TEXT"})
+        self._conn.commit()
+
+    def _ensure_columns(self, table, columns):
+        """Adds columns missing from manifests created by older versions of this script."""
+        present = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        for name, col_type in columns.items():
+            if name not in present:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+
+    # ------------------------------------------------------------------ reads
+
+    def is_tracked(self, collection_name, filepath):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM files WHERE collection = ? AND filepath = ?",
+                (collection_name, filepath)
+            ).fetchone()
+        return row is not None
+
+    def chunk_ids(self, collection_name, filepath):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM chunks WHERE collection = ? AND filepath = ?",
+                (collection_name, filepath)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def chunk_hashes(self, collection_name, filepath):
+        """Returns {doc_id: hash} for every chunk the file owns."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id, hash FROM chunks WHERE collection = ? AND filepath = ?",
+                (collection_name, filepath)
+            ).fetchall()
+        return {doc_id: h for doc_id, h in rows}
+
+    def tracked_files(self, collection_name):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filepath FROM files WHERE collection = ?",
+                (collection_name,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def tracked_files_under(self, collection_name, dirpath):
+        """Tracked files anywhere below `dirpath` (e.g. the old path of a moved directory)."""
+        prefix = dirpath.rstrip(os.sep) + os.sep
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filepath FROM files WHERE collection = ? AND substr(filepath, 1, ?) = ?",
+                (collection_name, len(prefix), prefix)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def file_state(self, collection_name, filepath):
+        """The file's (size, mtime_ns, content_hash), or None if it has no stat signature."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, content_hash FROM files "
+                "WHERE collection = ? AND filepath = ? AND mtime_ns IS NOT NULL",
+                (collection_name, filepath)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def file_states(self, collection_name):
+        """
+        Returns {filepath: (size, mtime_ns, content_hash)} for every tracked file
+        that has a recorded stat signature.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filepath, size, mtime_ns, content_hash FROM files "
+                "WHERE collection = ? AND mtime_ns IS NOT NULL",
+                (collection_name,)
+            ).fetchall()
+        return {fp: (size, mtime_ns, h) for fp, size, mtime_ns, h in rows}
+
+    def stats(self, collection_name):
+        with self._lock:
+            n_files = self._conn.execute(
+                "SELECT COUNT(*) FROM files WHERE collection = ?", (collection_name,)
+            ).fetchone()[0]
+            n_chunks = self._conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE collection = ?", (collection_name,)
+            ).fetchone()[0]
+        return {"files": n_files, "chunks": n_chunks}
+
+    def tail_checkpoint(self, collection_name, filepath):
+        """Returns the file's tail checkpoint as a dict (TAIL_CHECKPOINT_FIELDS), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(TAIL_CHECKPOINT_FIELDS)} FROM tail_checkpoints "
+                "WHERE collection = ? AND filepath = ?",
+                (collection_name, filepath)
+            ).fetchone()
+        return dict(zip(TAIL_CHECKPOINT_FIELDS, row)) if row else None
+
+    def progress(self, collection_name):
+        """The collection's index_progress row as a dict (PROGRESS_FIELDS), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(PROGRESS_FIELDS)} FROM index_progress WHERE collection = ?",
+                (collection_name,)
+            ).fetchone()
+        return dict(zip(PROGRESS_FIELDS, row)) if row else None
+
+    def retrieval_counts(self, collection_name):
+        """Returns {filepath: hits} for files that search results have come from."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filepath, hits FROM retrievals WHERE collection = ?",
+                (collection_name,)
+            ).fetchall()
+        return dict(rows)
+
+    def generations(self, collection_names):
+        """Returns {collection: generation} (0 for a collection never written through the indexers)."""
+        names = list(collection_names)
+        if not names:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT collection, generation FROM collection_generations "
+                f"WHERE collection IN ({', '.join('?' * len(names))})",
+                names
+            ).fetchall()
+        return dict({name: 0 for name in names}, **dict(rows))
+
+    # ----------------------------------------------------------------- writes
+
+    def set_file_chunks(self, collection_name, filepath, chunks):
+        """
+        Replaces the file's chunk list. `chunks` is an iterable of (doc_id, hash).
+        Marks the file as tracked.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ? AND filepath = ?",
+                (collection_name, filepath)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (collection, doc_id, filepath, hash) VALUES (?, ?, ?, ?)",
+                [(collection_name, doc_id, filepath, h or "") for doc_id, h in chunks]
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO files (collection, filepath) VALUES (?, ?)",
+                (collection_name, filepath)
+            )
+
+    def add_file_chunks(self, collection_name, filepath, chunks, remove_ids=()):
+        """
+        Appends (doc_id, hash) chunks to the file's list, dropping `remove_ids` first.
+        Used by tail indexing, where earlier chunks stay untouched.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE collection = ? AND doc_id = ?",
+                [(collection_name, doc_id) for doc_id in remove_ids]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (collection, doc_id, filepath, hash) VALUES (?, ?, ?, ?)",
+                [(collection_name, doc_id, filepath, h or "") for doc_id, h in chunks]
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO files (collection, filepath) VALUES (?, ?)",
+                (collection_name, filepath)
+            )
+
+    def set_tail_checkpoint(self, collection_name, filepath, checkpoint):
+        """Stores a tail checkpoint dict with the TAIL_CHECKPOINT_FIELDS keys."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO tail_checkpoints (collection, filepath, {', '.join(TAIL_CHECKPOINT_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(TAIL_CHECKPOINT_FIELDS))})",
+                [collection_name, filepath] + [checkpoint[k] for k in TAIL_CHECKPOINT_FIELDS]
+            )
+
+    def set_file_state(self, collection_name, filepath, size, mtime_ns, content_hash):
+        """Records the stat signature of a file as of its last successful index."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO files (collection, filepath, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (collection, filepath) DO UPDATE SET "
+                "size = excluded.size, mtime_ns = excluded.mtime_ns, content_hash = excluded.content_hash",
+                (collection_name, filepath, size, mtime_ns, content_hash)
+            )
+
+    def move_file(self, collection_name, src, dest, id_map):
+        """
+        Re-keys a file from `src` to `dest`: its stat signature, tail checkpoint and chunk
+        list follow it, with chunk ids renamed through `id_map` ({old_id: new_id}).
+        Anything previously recorded for `dest` is replaced.
+        """
+        with self._lock, self._conn:
+            for table in ("tail_checkpoints", "chunks", "files"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE collection = ? AND filepath = ?",
+                    (collection_name, dest)
+                )
+            rows = self._conn.execute(
+                "SELECT doc_id, hash FROM chunks WHERE collection = ? AND filepath = ?",
+                (collection_name, src)
+            ).fetchall()
+            self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ? AND filepath = ?",
+                (collection_name, src)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (collection, doc_id, filepath, hash) VALUES (?, ?, ?, ?)",
+                [(collection_name, id_map.get(doc_id, doc_id), dest, h) for doc_id, h in rows]
+            )
+            self._conn.execute(
+                "UPDATE files SET filepath = ? WHERE collection = ? AND filepath = ?",
+                (dest, collection_name, src)
+            )
+            row = self._conn.execute(
+                "SELECT open_doc_ids FROM tail_checkpoints WHERE collection = ? AND filepath = ?",
+                (collection_name, src)
+            ).fetchone()
+            if row:
+                open_ids = [id_map.get(doc_id, doc_id) for doc_id in json.loads(row[0])]
+                self._conn.execute(
+                    "UPDATE tail_checkpoints SET filepath = ?, open_doc_ids = ? WHERE collection = ? AND filepath = ?",
+                    (dest, json.dumps(open_ids), collection_name, src)
+                )
+
+    def set_progress(self, collection_name, total, done, priority_total, priority_done, finished=False):
+        """Updates the collection's progress row (started_at is kept from start_progress)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO index_progress (collection, total, done, priority_total, priority_done, "
+                "started_at, updated_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (collection) DO UPDATE SET total = excluded.total, done = excluded.done, "
+                "priority_total = excluded.priority_total, priority_done = excluded.priority_done, "
+                "updated_at = excluded.updated_at, finished_at = excluded.finished_at",
+                (collection_name, total, done, priority_total, priority_done, now, now, now if finished else None)
+            )
+
+    def start_progress(self, collection_name, total, done, priority_total):
+        """Begins a new indexing run: `done` of `total` files are already indexed."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM index_progress WHERE collection = ?", (collection_name,))
+        self.set_progress(collection_name, total, done, priority_total, 0)
+
+    def record_retrievals(self, collection_name, filepaths):
+        """Counts one retrieval hit for each of `filepaths`."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO retrievals (collection, filepath, hits, last_hit) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (collection, filepath) DO UPDATE SET hits = hits + 1, last_hit = excluded.last_hit",
+                [(collection_name, fp, now) for fp in filepaths]
+            )
+
+    def bump_generation(self, collection_name):
+        """Marks the collection as changed; returns its new generation."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO collection_generations (collection, generation, updated_at) VALUES (?, 1, ?) "
+                "ON CONFLICT (collection) DO UPDATE SET generation = generation + 1, updated_at = excluded.updated_at",
+                (collection_name, time.time())
+            )
+            return self._conn.execute(
+                "SELECT generation FROM collection_generations WHERE collection = ?", (collection_name,)
+            ).fetchone()[0]
+
+    def forget_file(self, collection_name, filepath):
+        """Drops a file, all its chunk ids and its tail checkpoint from the manifest."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM tail_checkpoints WHERE collection = ? AND filepath = ?",
+                (collection_name, filepath)
+            )
+            self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ? AND filepath = ?",
+                (collection_name, filepath)
+            )
+            self._conn.execute(
+                "DELETE FROM files WHERE collection = ? AND filepath = ?",
+                (collection_name, filepath)
+            )
+
+    def clear_collection(self, collection_name):
+        """
+        Forget everything recorded for a collection (e.g. after it was wiped).
+        Its generation is bumped, never reset, so cached results cannot match again.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE collection = ?", (collection_name,))
+            self._conn.execute("DELETE FROM files WHERE collection = ?", (collection_name,))
+            self._conn.execute("DELETE FROM tail_checkpoints WHERE collection = ?", (collection_name,))
+            self._conn.execute("DELETE FROM index_progress WHERE collection = ?", (collection_name,))
+        self.bump_generation(collection_name)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+##############################################################################
+# Shared instances
+##############################################################################
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+def manifest_path_for(chroma_db_path):
+    return os.path.join(chroma_db_path, MANIFEST_FILENAME)
+
+def get_manifest(chroma_db_path=DEFAULT_CHROMA_DB_PATH):
+    """
+    Returns the process-wide IndexManifest stored inside `chroma_db_path`.
+    """
+    path = manifest_path_for(chroma_db_path)
+    with _manifests_lock:
+        manifest = _manifests.get(path)
+        if manifest is None:
+            manifest = IndexManifest(path)
+            _manifests[path] = manifest
+        return manifest
+
+def bump_collection_generation(collection_name, chroma_db_path=DEFAULT_CHROMA_DB_PATH):
+    """
+    Call after writing to a collection outside the indexers: drops cached searches over it.
+    Returns the new generation, or None if there is no chroma_db directory or the manifest
+    could not be written (logged; the write itself already happened).
+    """
+    if not os.path.isdir(chroma_db_path):
+        return None
+    try:
+        return get_manifest(chroma_db_path).bump_generation(collection_name)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not bump the generation of '{collection_name}': {e}")
+        return None
+
+if __name__ == "__main__":
+    manifest = get_manifest()
+    names = sys.argv[1:] or ["project_codebase", "debugging_logs", "project_structure"]
+    for name in names:
+        s = manifest.stats(name)
+        print(f"📒 {name}: {s['files']} tracked file(s), {s['chunks']} chunk id(s)")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+index_priority.py
+
+Priority-ordered, progressive cold indexing.
+
+A cold index_codebase() run used to walk ROOT_DIRS in fixed order, and nothing said
+how far it had got, so the BuildAgent could only wait for all of it. Here:
+ - prioritize() orders a plan's candidates so that files referenced by unresolved
+   entries in DEBUG_LOGS_TEST.JSON come first, then recently modified files, then
+   files search results keep coming from (retrieval hits recorded by aggregator_search)
+ - apply_index_plan() flushes the writer once the priority files are queued, so they
+   are searchable before the rest of the tree is embedded
+ - ProgressTracker keeps the manifest's index_progress row current; readiness() turns it
+   into a fraction, and files_ready() / wait_until_ready() tell a caller when specific
+   files are indexed at their current content
+
+Usage:
+    python index_priority.py [collection_name]
+        (print indexing readiness and the top priority files)
+"""
+
+import os
+import re
+import math
+import sys
+import time
+import logging
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.json_records import JSONRecordError, iter_json_records
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+DEBUG_LOG_FILE = "/mnt/f/projects/ai-recall-system/logs/DEBUG_LOGS_TEST.JSON"
+DEBUG_LOG_WEIGHT = 100.0        # referenced by an unresolved debug log entry
+RECENT_WEIGHT = 10.0            # modified just now, decaying to 0 at RECENT_SECONDS
+RECENT_SECONDS = 24 * 3600
+RETRIEVAL_WEIGHT = 5.0          # times log(1 + retrieval hits)
+PROGRESS_EVERY_SECONDS = 1.0    # min interval between index_progress writes
+STALE_PROGRESS_SECONDS = 300    # a run with no progress update for this long is treated as dead
+FILE_REF_PATTERN = re.compile(r"[\w./\\-]+\.(?:py|js|tsx|md|json)\b")
+
+logger = logging.getLogger(__name__)
+
+##############################################################################
+# Priorities
+##############################################################################
+
+def debug_log_references(debug_log_file=DEBUG_LOG_FILE):
+    """File names / relative paths mentioned by unresolved debug log entries."""
+    references = set()
+    try:
+        for _, entry in iter_json_records(debug_log_file):
+            if not isinstance(entry, dict) or entry.get("resolved", False):
+                continue
+            for field in ("stack_trace", "error", "script", "file", "filepath"):
+                value = entry.get(field)
+                if isinstance(value, str):
+                    references.update(ref.replace("\\", "/") for ref in FILE_REF_PATTERN.findall(value))
+    except (OSError, UnicodeDecodeError, JSONRecordError) as e:
+        logger.info(f"No debug log references from {debug_log_file}: {e}")
+    return references
+
+def is_referenced(filepath, references):
+    """True if a reference names this file (by base name or as a path suffix)."""
+    path = filepath.replace(os.sep, "/")
+    name = os.path.basename(path)
+    for ref in references:
+        ref = ref.lstrip("./")
+        if ref == name or path == ref or path.endswith("/" + ref):
+            return True
+    return False
+
+def priority_score(filepath, mtime_ns, now=None, references=(), retrievals=None):
+    now = time.time() if now is None else now
+    score = 0.0
+    if references and is_referenced(filepath, references):
+        score += DEBUG_LOG_WEIGHT
+    age = now - mtime_ns / 1e9
+    if age < RECENT_SECONDS:
+        score += RECENT_WEIGHT * (1 - max(0.0, age) / RECENT_SECONDS)
+    hits = (retrievals or {}).get(filepath, 0)
+    if hits:
+        score += RETRIEVAL_WEIGHT * math.log1p(hits)
+    return score
+
+def prioritize(candidates, references=(), retrievals=None, now=None):
+    """
+    Orders plan candidates ((filepath, size, mtime_ns) tuples) by descending priority.
+    Returns (ordered candidates, number of candidates with a non-zero priority).
+    """
+    scored = [(priority_score(fp, mtime_ns, now, references, retrievals), (fp, size, mtime_ns))
+              for fp, size, mtime_ns in candidates]
+    scored.sort(key=lambda item: -item[0])   # stable: ties keep walk order
+    return [c for _, c in scored], sum(1 for score, _ in scored if score > 0)
+
+def prioritize_plan(plan, manifest, collection_name, debug_log_file=DEBUG_LOG_FILE):
+    """Reorders plan["candidates"] in place and sets plan["priority_count"]."""
+    plan["candidates"], plan["priority_count"] = prioritize(
+        plan["candidates"],
+        references=debug_log_references(debug_log_file),
+        retrievals=manifest.retrieval_counts(collection_name) if manifest is not None else None
+    )
+    return plan
+
+##############################################################################
+# Progress / readiness
+##############################################################################
+
+class ProgressTracker:
+    """
+    progress callback for apply_index_plan(): counts processed files into the manifest's
+    index_progress row (throttled to one write per PROGRESS_EVERY_SECONDS).
+    """
+
+    def __init__(self, manifest, collection_name, plan):
+        self.manifest = manifest
+        self.collection_name = collection_name
+        self.total = plan["unchanged"] + len(plan["candidates"])
+        self.done = plan["unchanged"]
+        self.priority_total = plan.get("priority_count", 0)
+        self.priority_done = 0
+        self._last_write = 0.0
+        manifest.start_progress(collection_name, self.total, self.done, self.priority_total)
+
+    def __call__(self, filepath):
+        self.done += 1
+        if self.priority_done < self.priority_total:
+            self.priority_done += 1
+        now = time.time()
+        if now - self._last_write >= PROGRESS_EVERY_SECONDS or self.priority_done == self.priority_total:
+            self._write()
+            self._last_write = now
+
+    def _write(self, finished=False):
+        self.manifest.set_progress(self.collection_name, self.total, self.done,
+                                   self.priority_total, self.priority_done, finished=finished)
+
+    def finish(self):
+        self.done = self.total
+        self.priority_done = self.priority_total
+        self._write(finished=True)
+
+def readiness(manifest, collection_name, now=None):
+    """
+    {"fraction", "running", "priority_ready", ...progress fields} for the collection.
+    Without a recorded run the index counts as complete (fraction 1.0, not running).
+    """
+    now = time.time() if now is None else now
+    row = manifest.progress(collection_name)
+    if row is None:
+        return {"fraction": 1.0, "running": False, "priority_ready": True}
+    running = row["finished_at"] is None and now - row["updated_at"] < STALE_PROGRESS_SECONDS
+    fraction = row["done"] / row["total"] if row["total"] else 1.0
+    return dict(row, fraction=min(1.0, fraction), running=running,
+                priority_ready=row["priority_done"] >= row["priority_total"])
+
+def file_ready(filepath, collection, manifest):
+    """True if the file's current content is indexed: manifest signature matches and chunks exist."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return False
+    known = manifest.file_state(collection.name, filepath)
+    if known is None or known[:2] != (st.st_size, st.st_mtime_ns):
+        return False
+    try:
+        return bool(collection.get(where={"filepath": filepath}, limit=1, include=[]).get("ids"))
+    except Exception as e:
+        logger.warning(f"Readiness lookup failed for {filepath}: {e}")
+        return False
+
+def files_ready(filepaths, collection, manifest):
+    """The subset of `filepaths` not yet indexed at their current content."""
+    return [fp for fp in filepaths if not file_ready(fp, collection, manifest)]
+
+def wait_until_ready(filepaths, collection, manifest, timeout, poll_seconds=0.5, on_wait=None):
+    """
+    Waits while an indexing run is in progress for `filepaths` to be indexed.
+    Returns the paths still pending when the run ends, stalls or `timeout` passes
+    ([] means everything is ready). on_wait(status, pending) is called on each poll.
+    """
+    deadline = time.time() + timeout
+    while True:
+        pending = files_ready(filepaths, collection, manifest)
+        status = readiness(manifest, collection.name)
+        if not pending or not status["running"] or time.time() >= deadline:
+            return pending
+        if on_wait is not None:
+            on_wait(status, pending)
+        time.sleep(poll_seconds)
+
+if __name__ == "__main__":
+    from scripts.index_manifest import get_manifest
+    collection_name = sys.argv[1] if len(sys.argv) > 1 else "project_codebase"
+    manifest = get_manifest()
+    status = readiness(manifest, collection_name)
+    print(f"📊 {collection_name}: {status['fraction']:.0%} indexed"
+          f"{' (indexing in progress)' if status['running'] else ''}")
+    references = debug_log_references()
+    retrievals = manifest.retrieval_counts(collection_name)
+    states = manifest.file_states(collection_name)
+    ordered, n_priority = prioritize([(fp, s[0], s[1]) for fp, s in states.items()], references, retrievals)
+    print(f"🔝 {n_priority} priority file(s); top 10:")
+    for fp, _, _ in ordered[:10]:
+        print(f"   {fp}")
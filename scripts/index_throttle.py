@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+index_throttle.py
+
+Load-aware throttling for background indexing.
+
+The indexers and LM Studio share one workstation; an embedding burst during a
+reindex competes for CPU with the model AgentManager.send_task() is waiting on.
+ - lower_priority() renices the indexing process (and the embedding pool workers it
+   starts afterwards) and puts its IO in the idle class (ionice)
+ - AgentManager.send_task() wraps each LLM request in llm_request(), which leaves a
+   marker file in LLM_INFLIGHT_DIR; any process can see llm_requests_inflight()
+ - IndexThrottle.work() wraps each unit of indexing (an embedding batch, a daemon
+   reindex): it waits while an LLM request is in flight or other processes keep the
+   CPUs busier than max_cpu, then charges the time spent against a CPU budget
+   (cpu_budget=0.5 sleeps as long as it worked)
+ - the time spent throttled is reported per reason (describe())
+
+Config comes from the environment:
+    RECALL_INDEX_THROTTLE=0       disable throttling
+    RECALL_INDEX_NICE=10          niceness increment for indexing processes
+    RECALL_INDEX_MAX_CPU=0.6      pause while other processes use more than this share of all CPUs
+    RECALL_INDEX_CPU_BUDGET=1.0   share of wall time indexing may spend working
+    RECALL_LLM_INFLIGHT_DIR       where LLM request markers live
+
+Usage:
+    python index_throttle.py
+        (print in-flight LLM requests and the current foreign CPU load)
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+THROTTLE_ENABLED = os.environ.get("RECALL_INDEX_THROTTLE", "1") not in ("0", "false", "no")
+NICE_INCREMENT = int(os.environ.get("RECALL_INDEX_NICE", "10"))
+IONICE_CLASS = 3                 # idle: disk time only when nobody else wants it
+MAX_FOREIGN_CPU = float(os.environ.get("RECALL_INDEX_MAX_CPU", "0.6"))
+CPU_BUDGET = float(os.environ.get("RECALL_INDEX_CPU_BUDGET", "1.0"))
+CHECK_INTERVAL = 0.5             # seconds between checks while paused
+MAX_LOAD_PAUSE = 60.0            # busy CPUs alone never hold indexing longer than this per unit
+LLM_MARKER_GRACE = 30.0          # a marker outlives its request timeout by this much before it is ignored
+LLM_INFLIGHT_DIR = os.environ.get(
+    "RECALL_LLM_INFLIGHT_DIR", os.path.join(tempfile.gettempdir(), "ai_recall_llm_inflight")
+)
+
+logger = logging.getLogger(__name__)
+
+##############################################################################
+# Process priority
+##############################################################################
+
+def lower_priority(nice=NICE_INCREMENT, ionice_class=IONICE_CLASS):
+    """
+    Renices this process and sets its IO scheduling class. Child processes started
+    afterwards (the embedding pool) inherit both. Returns what was applied.
+    """
+    applied = {}
+    if nice and hasattr(os, "nice"):
+        try:
+            applied["nice"] = os.nice(nice)
+        except OSError as e:
+            logger.warning(f"Could not renice indexing process: {e}")
+    if ionice_class is not None and shutil.which("ionice"):
+        result = subprocess.run(["ionice", "-c", str(ionice_class), "-p", str(os.getpid())],
+                                capture_output=True, text=True)
+        if result.returncode == 0:
+            applied["ionice_class"] = ionice_class
+        else:
+            logger.warning(f"Could not set IO priority: {result.stderr.strip()}")
+    return applied
+
+##############################################################################
+# LLM request markers
+##############################################################################
+
+_marker_seq = 0
+_marker_lock = threading.Lock()
+
+@contextmanager
+def llm_request(timeout, inflight_dir=None):
+    """Marks an LLM request as in flight (for indexers in any process) while the block runs."""
+    global _marker_seq
+    inflight_dir = inflight_dir or LLM_INFLIGHT_DIR
+    with _marker_lock:
+        _marker_seq += 1
+        name = f"{os.getpid()}-{threading.get_ident()}-{_marker_seq}.json"
+    path = os.path.join(inflight_dir, name)
+    try:
+        os.makedirs(inflight_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "started": time.time(), "timeout": timeout}, f)
+    except OSError as e:
+        logger.warning(f"Could not write LLM request marker: {e}")
+        path = None
+    try:
+        yield
+    finally:
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def llm_requests_inflight(inflight_dir=None, now=None):
+    """Number of LLM requests in flight; markers of dead processes or past their timeout are removed."""
+    inflight_dir = inflight_dir or LLM_INFLIGHT_DIR
+    now = time.time() if now is None else now
+    try:
+        names = os.listdir(inflight_dir)
+    except OSError:
+        return 0
+    count = 0
+    for name in names:
+        path = os.path.join(inflight_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                marker = json.load(f)
+            live = (_pid_alive(int(marker["pid"]))
+                    and now - marker["started"] < float(marker["timeout"]) + LLM_MARKER_GRACE)
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError, KeyError, TypeError):
+            live = False
+        if live:
+            count += 1
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return count
+
+##############################################################################
+# CPU load
+##############################################################################
+
+def _read_stat_fields(path):
+    with open(path, "r") as f:
+        data = f.read()
+    # the command name may contain spaces; fields resume after its closing paren
+    return data[data.rindex(")") + 2:].split()
+
+def _own_cpu_ticks():
+    """CPU ticks used by this process, its reaped children and its live child processes."""
+    fields = _read_stat_fields("/proc/self/stat")
+    ticks = sum(int(v) for v in fields[11:15])   # utime, stime, cutime, cstime
+    try:
+        tids = os.listdir("/proc/self/task")
+    except OSError:
+        tids = []
+    for tid in tids:
+        try:
+            with open(f"/proc/self/task/{tid}/children", "r") as f:
+                children = f.read().split()
+        except OSError:
+            continue
+        for pid in children:
+            try:
+                child = _read_stat_fields(f"/proc/{pid}/stat")
+            except (OSError, ValueError):
+                continue
+            ticks += int(child[11]) + int(child[12])
+    return ticks
+
+def _system_cpu_ticks():
+    """(busy, total) ticks across all CPUs from /proc/stat."""
+    with open("/proc/stat", "r") as f:
+        values = [int(v) for v in f.readline().split()[1:9]]
+    idle = values[3] + values[4]                  # idle + iowait
+    return sum(values) - idle, sum(values)
+
+class CpuSampler:
+    """
+    Share of all CPUs used by *other* processes since the previous sample, so the
+    indexer's own embedding work never counts as load. None where /proc is unavailable.
+    """
+
+    def __init__(self):
+        self._last = self._read()
+
+    def _read(self):
+        try:
+            busy, total = _system_cpu_ticks()
+            return busy, total, _own_cpu_ticks()
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def sample(self):
+        current = self._read()
+        last, self._last = self._last, current
+        if current is None or last is None or current[1] <= last[1]:
+            return None
+        busy = (current[0] - last[0]) - (current[2] - last[2])
+        return max(0.0, min(1.0, busy / (current[1] - last[1])))
+
+##############################################################################
+# Throttle
+##############################################################################
+
+class IndexThrottle:
+    """
+    Gate for background indexing work; one instance is shared by all indexing threads.
+    stats: throttled_seconds (total) split into llm_seconds / load_seconds / budget_seconds.
+    """
+
+    def __init__(self, max_cpu=MAX_FOREIGN_CPU, cpu_budget=CPU_BUDGET, check_interval=CHECK_INTERVAL,
+                 max_load_pause=MAX_LOAD_PAUSE, inflight_fn=llm_requests_inflight, load_fn=None):
+        self.max_cpu = max_cpu
+        self.cpu_budget = max(0.05, min(1.0, cpu_budget))
+        self.check_interval = check_interval
+        self.max_load_pause = max_load_pause
+        self.inflight_fn = inflight_fn
+        self.load_fn = load_fn if load_fn is not None else CpuSampler().sample
+        self._lock = threading.Lock()
+        self.stats = {"throttled_seconds": 0.0, "llm_seconds": 0.0, "load_seconds": 0.0,
+                      "budget_seconds": 0.0, "pauses": 0}
+
+    def _reason(self, load_paused_for):
+        if self.inflight_fn():
+            return "llm"
+        if self.max_cpu is not None and load_paused_for < self.max_load_pause:
+            load = self.load_fn()
+            if load is not None and load > self.max_cpu:
+                return "load"
+        return None
+
+    def _account(self, reason, seconds):
+        with self._lock:
+            self.stats[f"{reason}_seconds"] += seconds
+            self.stats["throttled_seconds"] += seconds
+
+    def wait(self):
+        """Blocks while an LLM request is in flight or the CPUs are busy. Returns seconds waited."""
+        waited = 0.0
+        load_paused_for = 0.0
+        reason = self._reason(load_paused_for)
+        if reason is None:
+            return waited
+        with self._lock:
+            self.stats["pauses"] += 1
+        logger.info(f"Indexing paused ({'LLM request in flight' if reason == 'llm' else 'system busy'})")
+        while reason is not None:
+            start = time.monotonic()
+            time.sleep(self.check_interval)
+            elapsed = time.monotonic() - start
+            self._account(reason, elapsed)
+            waited += elapsed
+            if reason == "load":
+                load_paused_for += elapsed
+            reason = self._reason(load_paused_for)
+        logger.info(f"Indexing resumed after {waited:.1f}s")
+        return waited
+
+    def charge(self, work_seconds):
+        """Sleeps off work beyond the CPU budget (cpu_budget=0.5: as long as the work took)."""
+        if self.cpu_budget >= 1.0 or work_seconds <= 0:
+            return
+        rest = work_seconds * (1.0 / self.cpu_budget - 1.0)
+        time.sleep(rest)
+        self._account("budget", rest)
+
+    @contextmanager
+    def work(self):
+        """Wraps one unit of indexing: waits for a quiet machine, then charges the budget."""
+        self.wait()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.charge(time.monotonic() - start)
+
+    def throttled_seconds(self):
+        with self._lock:
+            return self.stats["throttled_seconds"]
+
+    def describe(self):
+        with self._lock:
+            s = dict(self.stats)
+        if not s["throttled_seconds"]:
+            return "Indexing was never throttled."
+        return (f"Indexing throttled {s['throttled_seconds']:.1f}s over {s['pauses']} pause(s): "
+                f"{s['llm_seconds']:.1f}s for LLM requests, {s['load_seconds']:.1f}s for system load, "
+                f"{s['budget_seconds']:.1f}s for the CPU budget.")
+
+##############################################################################
+# Shared instance
+##############################################################################
+
+_throttle = None
+_throttle_lock = threading.Lock()
+
+def get_throttle(enabled=None):
+    """The process-wide IndexThrottle, or None when throttling is disabled."""
+    global _throttle
+    if not (THROTTLE_ENABLED if enabled is None else enabled):
+        return None
+    with _throttle_lock:
+        if _throttle is None:
+            _throttle = IndexThrottle()
+        return _throttle
+
+if __name__ == "__main__":
+    sampler = CpuSampler()
+    time.sleep(1.0)
+    load = sampler.sample()
+    print(f"🤖 LLM requests in flight: {llm_requests_inflight()}")
+    print(f"📈 Foreign CPU load: {'n/a' if load is None else f'{load:.0%}'} (pause above {MAX_FOREIGN_CPU:.0%})")
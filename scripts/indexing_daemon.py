@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+indexing_daemon.py
+
+One watcher process for every indexer. Replaces running
+index_codebase.py --watch, index_debug_logs.py --watch, index_project_structure.py --watch
+and index_knowledgebase.py --watch side by side, which loaded one copy of the embedding
+model, one Chroma client and one watchdog observer per indexer (two of them on /logs).
+
+ - Each indexer describes itself as an IndexSource (root dirs, accepted files,
+   skip dirs, target collection, and a reindex function that owns its chunking
+   and metadata fields). See index_source() in each indexer module.
+ - The daemon shares ONE embedding model, ONE PersistentClient and ONE Observer.
+   Overlapping roots are scheduled once and each event is routed to every source
+   that accepts the path.
+ - All events go through one coalescing ReindexScheduler; a burst of events switches
+   it to a single reconcile pass over every source.
+ - Renames of files and directories carry the stored chunks and vectors to the new
+   paths (move_file_chunks); only destination files whose content is not already
+   indexed are re-embedded. Reconcile passes pair deleted and new files by content hash.
+ - On mounts where inotify misses events (WSL drvfs / 9p under /mnt/<drive>) the watchdog
+   observer is replaced by scripts/poll_observer.py, which feeds the same scheduler from
+   stat snapshots (RECALL_WATCH_MODE / --watch-mode: auto, inotify or poll).
+ - Indexing runs reniced / ionice-idle and pauses while AgentManager has an LLM request
+   in flight or other processes keep the CPUs busy (scripts/index_throttle.py); the
+   time spent throttled is reported per reconcile pass and on shutdown.
+
+Usage:
+    python indexing_daemon.py
+        (watch codebase, debug logs, project structure and knowledge base)
+    python indexing_daemon.py --sources codebase debug_logs
+        (watch a subset)
+    python indexing_daemon.py --no-initial-sync
+        (skip the startup reconcile pass against the manifest)
+    python indexing_daemon.py --test
+        (use the *_test collections for the log and knowledge-base indexers)
+    python indexing_daemon.py --watch-mode poll
+        (poll stat snapshots instead of inotify; 'auto' does this on drvfs / 9p mounts)
+    python indexing_daemon.py --no-throttle
+        (index at full priority, ignoring LLM requests and system load)
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import contextlib
+
+import watchdog.observers
+from watchdog.events import FileSystemEventHandler
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.indexing_utils import (
+    EMBED_BATCH_SIZE, apply_index_plan, format_plan_summary, iter_files, move_file_chunks,
+    moved_path, path_in_skip_dirs, plan_incremental_index, remove_file_chunks
+)
+from scripts.reindex_scheduler import ReindexScheduler
+from scripts.poll_observer import PollingObserver, watch_mode
+from scripts.index_manifest import get_manifest
+from scripts.index_priority import ProgressTracker, prioritize_plan
+from scripts.index_throttle import get_throttle, lower_priority
+from scripts.embeddings import describe_cache_stats
+from scripts.recall_daemon import get_chroma_client, get_embed_model
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+CHROMA_DB_PATH = "/mnt/f/projects/ai-recall-system/chroma_db"
+DEBOUNCE_SECONDS = 2.0
+WATCH_MAX_WORKERS = 4       # concurrent reindex jobs across all sources
+STORM_THRESHOLD = 256       # pending paths before switching to one reconcile pass
+
+logger = logging.getLogger(__name__)
+
+##############################################################################
+# Sources
+##############################################################################
+
+class IndexSource:
+    """
+    What one indexer watches and how it indexes a file.
+
+    reindex_fn(filepath, collection, embed_model, writer=None, manifest=None) chunks the
+    file, sets its metadata fields and syncs it into the collection; it returns the
+    number of newly embedded chunks (the indexers' reindex_single_file).
+    content_hash_fn(filepath) optionally replaces the full-file hash in the stat manifest.
+    movable: chunk ids and metadata are derived from the filepath alone, so a renamed file's
+    chunks can be carried over by move_file_chunks (False: delete and reindex instead).
+    """
+
+    def __init__(self, name, collection_name, root_dirs, skip_dirs, accept, reindex_fn,
+                 content_hash_fn=None, movable=True):
+        self.name = name
+        self.collection_name = collection_name
+        self.root_dirs = [os.path.abspath(d) for d in root_dirs]
+        self.skip_dirs = set(skip_dirs)
+        self.accept = accept
+        self.reindex_fn = reindex_fn
+        self.content_hash_fn = content_hash_fn
+        self.movable = movable
+
+    def owns(self, filepath):
+        """True if the path is under one of this source's roots and accepted by it."""
+        if not any(filepath == root or filepath.startswith(root.rstrip(os.sep) + os.sep)
+                   for root in self.root_dirs):
+            return False
+        return self.accept(filepath) and not path_in_skip_dirs(filepath, self.skip_dirs)
+
+    def __repr__(self):
+        return f"IndexSource({self.name!r} -> {self.collection_name!r})"
+
+SOURCE_NAMES = ("codebase", "debug_logs", "project_structure", "knowledge_base")
+
+def default_sources(names=SOURCE_NAMES, test_mode=False):
+    """Builds the IndexSource of each named indexer (imported lazily, they import this module)."""
+    sources = []
+    for name in names:
+        if name == "codebase":
+            from scripts.index_codebase import index_source
+            sources.append(index_source())
+        elif name == "debug_logs":
+            from scripts.index_debug_logs import index_source
+            sources.append(index_source(test_mode=test_mode))
+        elif name == "project_structure":
+            from scripts.index_project_structure import index_source
+            sources.append(index_source(test_mode=test_mode))
+        elif name == "knowledge_base":
+            from scripts.index_knowledgebase import index_source
+            sources.append(index_source(test_mode=test_mode))
+        else:
+            raise ValueError(f"Unknown index source: {name}")
+    return sources
+
+def collapse_roots(root_dirs):
+    """Drops duplicate roots and roots nested inside another root, so each tree is watched once."""
+    collapsed = []
+    for root in sorted({os.path.abspath(d).rstrip(os.sep) or os.sep for d in root_dirs}, key=lambda r: (len(r), r)):
+        if not any(root == kept or root.startswith(kept.rstrip(os.sep) + os.sep) for kept in collapsed):
+            collapsed.append(root)
+    return collapsed
+
+##############################################################################
+# Daemon
+##############################################################################
+
+class IndexingDaemon:
+    """
+    Shared model, client, manifest and scheduler for a list of IndexSources.
+    The client and model can be passed in (tests, BuildAgent); otherwise they are created once here.
+    """
+
+    def __init__(self, sources, chroma_path=CHROMA_DB_PATH, client=None, embed_model=None,
+                 debounce_seconds=DEBOUNCE_SECONDS, max_workers=WATCH_MAX_WORKERS,
+                 storm_threshold=STORM_THRESHOLD, batch_size=EMBED_BATCH_SIZE, watch_mode=None,
+                 throttle=None):
+        if not sources:
+            raise ValueError("IndexingDaemon needs at least one IndexSource")
+        self.sources = list(sources)
+        self.chroma_path = chroma_path
+        self.batch_size = batch_size
+        self.watch_mode = watch_mode
+        self.throttle = throttle
+        self.client = client or get_chroma_client(chroma_path)
+        self.embed_model = embed_model or get_embed_model(bulk=True)
+        self.manifest = get_manifest(chroma_path)
+        self.collections = {
+            s.name: self.client.get_or_create_collection(name=s.collection_name)
+            for s in self.sources
+        }
+        self.scheduler = ReindexScheduler(
+            index_fn=self.index_path,
+            delete_fn=self.delete_path,
+            reconcile_fn=self.reconcile,
+            move_fn=self.move_path,
+            debounce_seconds=debounce_seconds,
+            max_workers=max_workers,
+            storm_threshold=storm_threshold,
+            name="indexing_daemon"
+        )
+        self.observer = None
+        self._move_lock = threading.Lock()
+
+    def sources_for(self, filepath):
+        return [s for s in self.sources if s.owns(filepath)]
+
+    def watched_roots(self):
+        return collapse_roots(root for s in self.sources for root in s.root_dirs)
+
+    # ------------------------------------------------------------- dispatch
+
+    def submit(self, filepath, action="index"):
+        """Queues the path once, however many sources own it."""
+        if self.sources_for(filepath):
+            self.scheduler.submit(filepath, action)
+
+    def submit_move(self, src, dest, is_directory=False):
+        """Queues a rename if either side matters to a source (any directory under a watched root)."""
+        if is_directory:
+            relevant = any(p == root or p.startswith(root.rstrip(os.sep) + os.sep)
+                           for p in (src, dest) for root in self.watched_roots())
+        else:
+            relevant = bool(self.sources_for(src) or self.sources_for(dest))
+        if relevant:
+            self.scheduler.submit_move(src, dest)
+
+    def _work(self):
+        return self.throttle.work() if self.throttle is not None else contextlib.nullcontext()
+
+    def index_path(self, filepath):
+        for source in self.sources_for(filepath):
+            logger.info(f"[{source.name}] Debounced re-index for file: {filepath}")
+            print(f"\n🔄 [{source.name}] Debounced re-index for file: {filepath}")
+            with self._work():
+                source.reindex_fn(filepath, self.collections[source.name], self.embed_model)
+
+    def delete_path(self, filepath):
+        for source in self.sources_for(filepath):
+            removed = remove_file_chunks(self.collections[source.name], filepath, self.manifest)
+            if removed:
+                logger.info(f"[{source.name}] Removed {removed} old chunk(s) for deleted/renamed file: {filepath}")
+                print(f"   🔸 [{source.name}] Removed {removed} old chunk(s) for deleted/renamed file: {filepath}")
+
+    def _is_current(self, collection, filepath):
+        """True if the manifest's stat signature still matches the file (or the file is gone)."""
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return True
+        known = self.manifest.file_state(collection.name, filepath)
+        return known is not None and known[:2] == (st.st_size, st.st_mtime_ns)
+
+    def move_path(self, src, dest):
+        """
+        Handles a rename of a file or directory: every tracked file under `src` has its chunks
+        and vectors carried over to the matching path under `dest` (or is removed if no longer
+        owned), then only destination files whose content is not already indexed are reindexed.
+        A source path that exists again (an editor's backup-style save: a.py -> a.py~, then a
+        new a.py) keeps its chunks; the index event queued for it brings them up to date.
+        """
+        is_dir = os.path.isdir(dest)
+        with self._move_lock:
+            for source in self.sources:
+                collection = self.collections[source.name]
+                old_paths = self.manifest.tracked_files_under(collection.name, src) if is_dir else [src]
+                for old in old_paths:
+                    new = moved_path(old, src, dest)
+                    if not source.owns(old) or os.path.exists(old):
+                        continue
+                    if source.movable and source.owns(new):
+                        moved = move_file_chunks(collection, old, new, self.manifest, batch_size=self.batch_size)
+                        if moved:
+                            logger.info(f"[{source.name}] Moved {moved} chunk(s) from {old} -> {new}")
+                            print(f"   🔀 [{source.name}] Moved {moved} chunk(s) from {old} -> {new}")
+                        continue
+                    removed = remove_file_chunks(collection, old, self.manifest)
+                    if removed:
+                        logger.info(f"[{source.name}] Removed {removed} old chunk(s) for renamed file: {old}")
+                        print(f"   🔸 [{source.name}] Removed {removed} old chunk(s) for renamed file: {old}")
+
+                if is_dir:
+                    new_paths = (fp for fp, _ in iter_files([dest], source.skip_dirs, source.owns))
+                else:
+                    new_paths = [dest] if source.owns(dest) else []
+                for new in new_paths:
+                    if not self._is_current(collection, new):
+                        logger.info(f"[{source.name}] Re-index after rename: {new}")
+                        print(f"\n🔄 [{source.name}] Re-index after rename: {new}")
+                        with self._work():
+                            source.reindex_fn(new, collection, self.embed_model)
+
+    def reconcile_source(self, source):
+        """Stat-compares one source's roots against the manifest and indexes only the differences."""
+        start_time = time.perf_counter()
+        collection = self.collections[source.name]
+        known_states = self.manifest.file_states(collection.name)
+        plan = plan_incremental_index(source.root_dirs, source.skip_dirs, source.accept, known_states)
+        prioritize_plan(plan, self.manifest, collection.name)
+        progress = ProgressTracker(self.manifest, collection.name, plan)
+        summary = apply_index_plan(plan, collection, self.embed_model, self.manifest, known_states,
+                                   source.reindex_fn, batch_size=self.batch_size,
+                                   content_hash_fn=source.content_hash_fn, movable=source.movable,
+                                   progress=progress, priority_count=plan["priority_count"],
+                                   throttle=self.throttle)
+        progress.finish()
+        plan_summary = format_plan_summary(summary, time.perf_counter() - start_time)
+        logger.info(f"[{source.name}] Reconcile pass: {plan_summary}")
+        print(f"\n🧮 [{source.name}] Reconcile pass: {plan_summary}")
+        return summary
+
+    def reconcile(self):
+        return {source.name: self.reconcile_source(source) for source in self.sources}
+
+    # ------------------------------------------------------------- lifecycle
+
+    def polling_observer(self):
+        """
+        PollingObserver over the watched roots, seeded with the manifest's stat signatures
+        (taken after the initial reconcile, so only later changes are reported).
+        """
+        known_states = {}
+        for source in self.sources:
+            known_states.update(self.manifest.file_states(self.collections[source.name].name))
+        return PollingObserver(
+            [root for root in self.watched_roots() if os.path.exists(root)],
+            set.intersection(*(s.skip_dirs for s in self.sources)),
+            accept=lambda fp: bool(self.sources_for(fp)),
+            submit=self.submit,
+            submit_move=self.submit_move,
+            known_states=known_states
+        )
+
+    def start(self, initial_sync=True):
+        if initial_sync:
+            self.reconcile()
+        self.scheduler.start()
+        if watch_mode(self.watched_roots(), self.watch_mode) == "poll":
+            self.observer = self.polling_observer()
+            for root_dir in self.watched_roots():
+                if os.path.exists(root_dir):
+                    logger.info(f"Polling {root_dir} for changes...")
+                    print(f"👀 Polling {root_dir} for changes (no inotify on this mount)...")
+                else:
+                    print(f"⚠ Root dir not found: {root_dir}. Skipping.")
+            self.observer.start()
+            print(f"🚀 Indexing daemon running for: {', '.join(s.name for s in self.sources)}")
+            return self
+        self.observer = watchdog.observers.Observer()
+        handler = DaemonEventHandler(self)
+        for root_dir in self.watched_roots():
+            if os.path.exists(root_dir):
+                self.observer.schedule(handler, path=root_dir, recursive=True)
+                logger.info(f"Watching {root_dir} for changes...")
+                print(f"👀 Watching {root_dir} for changes...")
+            else:
+                print(f"⚠ Root dir not found: {root_dir}. Skipping.")
+        self.observer.start()
+        print(f"🚀 Indexing daemon running for: {', '.join(s.name for s in self.sources)}")
+        return self
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+        self.scheduler.stop()
+        if self.throttle is not None:
+            logger.info(self.throttle.describe())
+            print(f"   🐢 {self.throttle.describe()}")
+        cache_summary = describe_cache_stats(self.embed_model)
+        if cache_summary:
+            print(f"   📦 {cache_summary}")
+
+    def run_forever(self, initial_sync=True):
+        self.start(initial_sync=initial_sync)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+class DaemonEventHandler(FileSystemEventHandler):
+    """Single watchdog handler; routing to sources happens in IndexingDaemon."""
+
+    def __init__(self, daemon):
+        super().__init__()
+        self.daemon = daemon
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.daemon.submit(event.src_path, "index")
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.daemon.submit(event.src_path, "index")
+
+    def on_moved(self, event):
+        kind = "Directory" if event.is_directory else "File"
+        logger.info(f"{kind} renamed from {event.src_path} -> {event.dest_path}")
+        print(f"\n🔄 {kind} renamed from {event.src_path} -> {event.dest_path}")
+        self.daemon.submit_move(event.src_path, event.dest_path, is_directory=event.is_directory)
+
+    def on_deleted(self, event):
+        if not event.is_directory and self.daemon.sources_for(event.src_path):
+            logger.info(f"File deleted: {event.src_path}, removing old chunks.")
+            print(f"\n❌ File deleted: {event.src_path}, removing old chunks.")
+            self.daemon.submit(event.src_path, "delete")
+
+def run_daemon(sources, chroma_path=CHROMA_DB_PATH, initial_sync=True, throttled=None, **kwargs):
+    """
+    throttled: gate indexing on LLM requests / system load (default: RECALL_INDEX_THROTTLE).
+    When throttled, the process is reniced before the embedding model (and pool) start.
+    """
+    throttle = get_throttle(throttled)
+    if throttle is not None:
+        lower_priority()
+    print(f"🔗 Connecting to Chroma at '{chroma_path}' for watchers...")
+    IndexingDaemon(sources, chroma_path=chroma_path, throttle=throttle, **kwargs).run_forever(initial_sync=initial_sync)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single watcher process for the codebase, debug-log, project-structure and knowledge-base indexers.")
+    parser.add_argument("--sources", nargs="+", choices=SOURCE_NAMES, default=list(SOURCE_NAMES), help="Indexers to run.")
+    parser.add_argument("--test", action="store_true", help="Use the *_test collections for the log and knowledge-base indexers.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding call / Chroma write.")
+    parser.add_argument("--no-initial-sync", action="store_true", help="Skip the startup reconcile pass.")
+    parser.add_argument("--watch-mode", choices=("auto", "inotify", "poll"), default=None,
+                        help="Change detection (default: RECALL_WATCH_MODE or auto, which polls on drvfs / 9p mounts).")
+    parser.add_argument("--no-throttle", action="store_true",
+                        help="Index at full priority, even while an LLM request is in flight.")
+    args = parser.parse_args()
+
+    run_daemon(default_sources(args.sources, test_mode=args.test),
+               batch_size=args.batch_size, initial_sync=not args.no_initial_sync, watch_mode=args.watch_mode,
+               throttled=False if args.no_throttle else None)
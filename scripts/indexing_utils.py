@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+indexing_utils.py
+
+Shared helpers for the line-chunking indexers (index_codebase.py, index_debug_logs.py,
+index_project_structure.py).
+
+ - Chunks are passed around as (doc_id, chunk_text, metadata) tuples.
+ - embed_and_write() embeds a whole batch with ONE embed_documents() call and writes it
+   with ONE collection.add()/upsert(), instead of one forward pass + one transaction per chunk.
+ - ChunkBatchWriter accumulates chunks across many files (e.g. a full directory walk)
+   and flushes them in batches of EMBED_BATCH_SIZE. Manifest bookkeeping for queued chunks
+   (chunk ids, stat signature, tail checkpoint) is deferred with after_flush() until those
+   chunks are written, so a file whose chunks never reached Chroma is never recorded as
+   indexed (and the stat fast path cannot skip it on the next run).
+ - existing_file_chunk_ids() / remove_file_chunks() / record_file_chunks() resolve a file's
+   chunks through the IndexManifest (scripts/index_manifest.py) instead of scanning the
+   whole collection.
+ - sync_file_chunks() diffs a file's new chunks against the stored ones by content hash:
+   unchanged chunks are kept (metadata refreshed only), vanished ones deleted, and only
+   new chunks are embedded.
+ - move_file_chunks() carries a renamed file's chunks to the new path with their stored
+   vectors (ids, "filepath" and "rel_path" rewritten), so a rename costs writes, not embeddings.
+ - every add and delete above is mirrored into the lexical index next to the manifest
+   (scripts/lexical_index.py), which answers the aggregator's substring / keyword lookups,
+   and bumps the collection's generation in the manifest (mark_collection_changed()),
+   which invalidates the aggregator's cached results for it; the lexical index records
+   that it already holds that generation, so the searcher does not re-read the collection.
+ - iter_files() / plan_incremental_index() stat-compare a tree against the manifest's
+   (size, mtime_ns, content hash) signatures, and apply_index_plan() executes the result,
+   so one-shot runs and watcher reconcile passes only touch new, changed or deleted files.
+"""
+
+import os
+import time
+import hashlib
+import logging
+from collections import defaultdict, deque
+
+from scripts.lexical_index import lexical_index_for
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+# Number of chunks embedded per model call / written per Chroma transaction.
+# Override with RECALL_EMBED_BATCH_SIZE or the indexers' --batch-size flag.
+EMBED_BATCH_SIZE = int(os.environ.get("RECALL_EMBED_BATCH_SIZE", "64"))
+
+logger = logging.getLogger(__name__)
+
+##############################################################################
+# Batching
+##############################################################################
+
+def iter_batches(items, batch_size):
+    """
+    Yields consecutive slices of `items` with at most `batch_size` elements.
+    """
+    batch_size = max(1, int(batch_size))
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
+
+def embed_and_write(collection, chunks, embed_model, batch_size=EMBED_BATCH_SIZE, upsert=False, lexical=None):
+    """
+    Embeds and stores a list of (doc_id, chunk_text, metadata) tuples.
+    Each batch is embedded with one embed_documents() call and written with
+    one add() (or upsert() if upsert=True), then mirrored into `lexical` (a LexicalIndex)
+    if given. Returns the number of chunks written.
+    """
+    written = 0
+    for batch in iter_batches(chunks, batch_size):
+        ids = [doc_id for doc_id, _, _ in batch]
+        documents = [text for _, text, _ in batch]
+        metadatas = [meta for _, _, meta in batch]
+
+        embeddings = embed_model.embed_documents(documents)
+
+        write = collection.upsert if upsert else collection.add
+        write(
+            ids=ids,
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas
+        )
+        if lexical is not None:
+            lexical.add(collection.name, zip(ids, documents))
+        written += len(batch)
+    return written
+
+class ChunkBatchWriter:
+    """
+    Buffers chunks from many files and flushes them in fixed-size batches.
+
+    Usage:
+        with ChunkBatchWriter(collection, embed_model, batch_size=128) as writer:
+            for filepath in files:
+                reindex_single_file(filepath, collection, embed_model, writer=writer)
+
+    defer(fn) runs fn once every chunk queued so far has been written. Callbacks whose
+    chunks are never written (an exception skips the final flush) are dropped.
+    """
+
+    def __init__(self, collection, embed_model, batch_size=EMBED_BATCH_SIZE, upsert=False, throttle=None,
+                 lexical=None, manifest=None):
+        self.collection = collection
+        self.embed_model = embed_model
+        self.batch_size = max(1, int(batch_size))
+        self.upsert = upsert
+        self.throttle = throttle
+        self.lexical = lexical
+        self.manifest = manifest
+        self._pending = []
+        self._queued = 0                # chunks ever queued
+        self._done = 0                  # of those, chunks written
+        self._deferred = deque()        # (chunks that must be written first, callback)
+        self.total_written = 0
+        self.total_batches = 0
+        self.embed_seconds = 0.0
+
+    def add(self, chunks):
+        """Queue chunks; flushes automatically every `batch_size` chunks."""
+        chunks = list(chunks)
+        self._pending.extend(chunks)
+        self._queued += len(chunks)
+        while len(self._pending) >= self.batch_size:
+            batch = self._pending[:self.batch_size]
+            self._pending = self._pending[self.batch_size:]
+            self._write(batch)
+
+    def flush(self):
+        """Write whatever is still buffered."""
+        if self._pending:
+            batch = self._pending
+            self._pending = []
+            self._write(batch)
+
+    def defer(self, fn):
+        """Runs fn() now if nothing is buffered, else right after the buffered chunks are written."""
+        if self._done >= self._queued:
+            fn()
+        else:
+            self._deferred.append((self._queued, fn))
+
+    def _write(self, batch):
+        if self.throttle is not None:
+            # pauses while an LLM request is in flight or the machine is busy (index_throttle.py)
+            with self.throttle.work():
+                self._embed_and_write(batch)
+        else:
+            self._embed_and_write(batch)
+
+    def _embed_and_write(self, batch):
+        start = time.perf_counter()
+        self.total_written += embed_and_write(
+            self.collection, batch, self.embed_model,
+            batch_size=self.batch_size, upsert=self.upsert, lexical=self.lexical
+        )
+        mark_collection_changed(self.manifest, self.collection, self.lexical)
+        self.embed_seconds += time.perf_counter() - start
+        self.total_batches += 1
+        self._done += len(batch)
+        while self._deferred and self._deferred[0][0] <= self._done:
+            self._deferred.popleft()[1]()
+
+    def chunks_per_second(self):
+        if self.embed_seconds <= 0:
+            return 0.0
+        return self.total_written / self.embed_seconds
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+##############################################################################
+# Per-file chunk bookkeeping
+##############################################################################
+
+def after_flush(writer, fn):
+    """Runs fn() once the chunks queued on `writer` are written (now if there is no writer)."""
+    if writer is None:
+        fn()
+    else:
+        writer.defer(fn)
+
+def mark_collection_changed(manifest, collection, lexical=None):
+    """
+    Bumps the collection's generation after a write (no-op without a manifest).
+    lexical: the LexicalIndex the write was mirrored into, which then counts as synced.
+    """
+    if manifest is not None:
+        generation = manifest.bump_generation(collection.name)
+        if lexical is not None:
+            lexical.advance_generation(collection.name, generation)
+
+def existing_file_chunk_ids(collection, filepath, manifest=None):
+    """
+    Returns the chunk ids currently stored for `filepath`.
+    Tracked files are answered from the manifest; files indexed before the manifest
+    existed fall back to a metadata-filtered get on "filepath" (never a full scan).
+    """
+    if manifest is not None and manifest.is_tracked(collection.name, filepath):
+        return manifest.chunk_ids(collection.name, filepath)
+    try:
+        results = collection.get(where={"filepath": filepath}, include=[])
+    except Exception as e:
+        logger.error(f"Metadata lookup failed for {filepath} in '{collection.name}': {e}")
+        return []
+    if results and results.get("ids"):
+        return list(results["ids"])
+    return []
+
+def remove_file_chunks(collection, filepath, manifest=None):
+    """
+    Deletes every chunk of `filepath` and forgets it in the manifest.
+    Returns the number of chunk ids removed.
+    """
+    matched_ids = existing_file_chunk_ids(collection, filepath, manifest)
+    if matched_ids:
+        collection.delete(ids=matched_ids)
+        lexical = lexical_index_for(manifest)
+        if lexical is not None:
+            lexical.remove(collection.name, matched_ids)
+        mark_collection_changed(manifest, collection, lexical)
+    if manifest is not None:
+        manifest.forget_file(collection.name, filepath)
+    return len(matched_ids)
+
+def record_file_chunks(collection, filepath, chunks, manifest=None, writer=None):
+    """
+    Records the (doc_id, chunk_text, metadata) chunks now owned by `filepath`
+    (once they are written, if they are queued on `writer`).
+    """
+    if manifest is None:
+        return
+    owned = [(doc_id, meta.get("hash", "")) for doc_id, _, meta in chunks]
+    after_flush(writer, lambda: manifest.set_file_chunks(collection.name, filepath, owned))
+
+def _load_existing_chunks(collection, filepath, manifest=None):
+    """
+    Returns {doc_id: metadata} for the chunks actually stored for `filepath`.
+    Ids listed in the manifest but missing from Chroma (e.g. after a wipe) are dropped.
+    """
+    try:
+        if manifest is not None and manifest.is_tracked(collection.name, filepath):
+            ids = manifest.chunk_ids(collection.name, filepath)
+            if not ids:
+                return {}
+            results = collection.get(ids=ids, include=["metadatas"])
+        else:
+            results = collection.get(where={"filepath": filepath}, include=["metadatas"])
+    except Exception as e:
+        logger.error(f"Could not load existing chunks for {filepath} in '{collection.name}': {e}")
+        return {}
+
+    if not results or not results.get("ids"):
+        return {}
+    metas = results.get("metadatas") or [{}] * len(results["ids"])
+    return {doc_id: (meta or {}) for doc_id, meta in zip(results["ids"], metas)}
+
+def _chunk_hash(doc_id, meta):
+    if meta.get("hash"):
+        return meta["hash"]
+    if "::hash_" in doc_id:
+        return doc_id.rsplit("::hash_", 1)[1]
+    return ""
+
+def sync_file_chunks(collection, filepath, chunks, embed_model, manifest=None, writer=None):
+    """
+    Brings the stored chunks of `filepath` in line with `chunks` ((doc_id, text, metadata)
+    tuples whose metadata carries a content "hash"), re-embedding only what changed:
+      - a new chunk whose hash is already stored keeps the stored id and vector;
+        only its metadata (chunk_index, start/end line, mod_time) is refreshed
+      - stored chunks whose hash vanished are deleted
+      - a stable id (e.g. a JSON entry id) whose stored hash differs is deleted and re-added
+      - only chunks with unseen hashes are embedded (queued on `writer` if given)
+    Returns {"added": n, "kept": n, "removed": n}.
+    """
+    existing = _load_existing_chunks(collection, filepath, manifest)
+    new_ids = {doc_id for doc_id, _, _ in chunks}
+
+    # Exact id matches with the same content first, then any stored chunk with the same
+    # hash (e.g. a function that only moved down after an insert above it).
+    by_hash = defaultdict(list)
+    replaced_ids = []
+    new_hashes = {doc_id: meta.get("hash", "") for doc_id, _, meta in chunks}
+    for doc_id, stored_meta in existing.items():
+        if doc_id in new_ids:
+            stored_hash = _chunk_hash(doc_id, stored_meta)
+            if stored_hash and stored_hash != new_hashes[doc_id]:
+                replaced_ids.append(doc_id)
+            continue
+        by_hash[_chunk_hash(doc_id, stored_meta)].append(doc_id)
+    replaced = set(replaced_ids)
+
+    kept = []       # (stored_id, new_meta)
+    to_add = []     # (doc_id, text, meta)
+    for doc_id, text, meta in chunks:
+        if doc_id in existing and doc_id not in replaced:
+            kept.append((doc_id, meta))
+            continue
+        if doc_id in replaced:
+            to_add.append((doc_id, text, meta))
+            continue
+        candidates = by_hash.get(meta.get("hash", ""))
+        if candidates:
+            kept.append((candidates.pop(), meta))
+        else:
+            to_add.append((doc_id, text, meta))
+
+    lexical = lexical_index_for(manifest)
+    stale_ids = replaced_ids + [doc_id for ids in by_hash.values() for doc_id in ids]
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+        if lexical is not None:
+            lexical.remove(collection.name, stale_ids)
+
+    changed_meta = [(doc_id, meta) for doc_id, meta in kept if existing.get(doc_id) != meta]
+    if changed_meta:
+        collection.update(
+            ids=[doc_id for doc_id, _ in changed_meta],
+            metadatas=[meta for _, meta in changed_meta]
+        )
+
+    if to_add:
+        if writer is not None:
+            writer.add(to_add)
+        else:
+            embed_and_write(collection, to_add, embed_model, lexical=lexical)
+
+    if manifest is not None:
+        owned = ([(doc_id, meta.get("hash", "")) for doc_id, meta in kept] +
+                 [(doc_id, meta.get("hash", "")) for doc_id, _, meta in to_add])
+        after_flush(writer if to_add else None,
+                    lambda: manifest.set_file_chunks(collection.name, filepath, owned))
+    if stale_ids or changed_meta or (to_add and writer is None):
+        mark_collection_changed(manifest, collection, lexical)
+
+    return {"added": len(to_add), "kept": len(kept), "removed": len(stale_ids)}
+
+def moved_path(path, src, dest):
+    """`path` with the `src` prefix (a file or a directory) replaced by `dest`."""
+    src = src.rstrip(os.sep)
+    if path == src:
+        return dest
+    if path.startswith(src + os.sep):
+        return dest.rstrip(os.sep) + path[len(src):]
+    return path
+
+def _moved_chunk_id(doc_id, src, dest):
+    # Ids are "{filepath}::..."; ids that do not embed the path (e.g. knowledge-base keys) stay
+    if doc_id.startswith(src + "::"):
+        return dest + doc_id[len(src):]
+    return doc_id
+
+def move_file_chunks(collection, src, dest, manifest=None, batch_size=EMBED_BATCH_SIZE):
+    """
+    Moves every chunk of `src` to `dest` without re-embedding: each batch is read back
+    with its embeddings, written under the rewritten id / "filepath" / "rel_path", and the
+    old ids are deleted. The manifest entry (stat signature, chunk ids, tail checkpoint)
+    follows the file; chunks already stored for `dest` (a rename over a tracked file) are
+    removed first. Returns the number of chunks moved (0 if `src` had none).
+    """
+    ids = existing_file_chunk_ids(collection, src, manifest)
+    if not ids:
+        return 0
+    remove_file_chunks(collection, dest, manifest)
+
+    id_map = {}
+    hashes = []
+    lexical = lexical_index_for(manifest)
+    for batch in iter_batches(ids, batch_size):
+        results = collection.get(ids=batch, include=["embeddings", "documents", "metadatas"])
+        if not results or not results.get("ids"):
+            continue
+        new_ids, metas = [], []
+        for doc_id, meta in zip(results["ids"], results["metadatas"]):
+            meta = dict(meta or {})
+            for field in ("filepath", "rel_path"):
+                if meta.get(field) == src:
+                    meta[field] = dest
+            new_id = _moved_chunk_id(doc_id, src, dest)
+            id_map[doc_id] = new_id
+            new_ids.append(new_id)
+            metas.append(meta)
+            hashes.append((new_id, _chunk_hash(new_id, meta)))
+        collection.upsert(
+            ids=new_ids,
+            documents=results["documents"],
+            embeddings=results["embeddings"],
+            metadatas=metas
+        )
+        old_ids = [doc_id for doc_id in results["ids"] if id_map[doc_id] != doc_id]
+        if old_ids:
+            collection.delete(ids=old_ids)
+        if lexical is not None:
+            lexical.remove(collection.name, old_ids)
+            lexical.add(collection.name, zip(new_ids, results["documents"]))
+
+    if manifest is not None:
+        tracked = manifest.is_tracked(collection.name, src)
+        manifest.move_file(collection.name, src, dest, id_map)
+        if not tracked:
+            manifest.set_file_chunks(collection.name, dest, hashes)
+    mark_collection_changed(manifest, collection, lexical)
+    return len(id_map)
+
+##############################################################################
+# Stat-manifest fast path
+##############################################################################
+
+HASH_BLOCK_SIZE = 1024 * 1024   # bytes read per step when hashing / scanning a file
+
+def file_content_hash(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+def hash_file(filepath, block_size=HASH_BLOCK_SIZE):
+    """file_content_hash() of the file's bytes, read in blocks so large logs never sit in memory."""
+    digest = hashlib.md5()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_blank_file(filepath, block_size=HASH_BLOCK_SIZE):
+    """True if the file holds nothing but whitespace (stops at the first non-blank block)."""
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            if block.strip():
+                return False
+    return True
+
+def iter_files(root_dirs, skip_dirs, accept):
+    """
+    Walks `root_dirs` with os.scandir, pruning `skip_dirs`, and yields
+    (filepath, os.stat_result) for every file where accept(filepath) is true.
+    """
+    stack = [d for d in root_dirs if os.path.isdir(d)]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError as e:
+            logger.warning(f"Cannot scan {current}: {e}")
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in skip_dirs:
+                        stack.append(entry.path)
+                elif entry.is_file() and accept(entry.path):
+                    yield entry.path, entry.stat()
+            except OSError:
+                continue
+
+def path_in_skip_dirs(filepath, skip_dirs):
+    """True if any directory component of `filepath` is in `skip_dirs`."""
+    parts = os.path.normpath(os.path.dirname(filepath)).split(os.sep)
+    return any(part in skip_dirs for part in parts)
+
+def _under_roots(filepath, root_dirs):
+    for root in root_dirs:
+        root = root.rstrip(os.sep)
+        if filepath == root or filepath.startswith(root + os.sep):
+            return True
+    return False
+
+def plan_incremental_index(root_dirs, skip_dirs, accept, known_states):
+    """
+    Compares the tree against `known_states` ({filepath: (size, mtime_ns, content_hash)},
+    see IndexManifest.file_states) using stat only.
+    Returns a dict with:
+      "candidates": [(filepath, size, mtime_ns)] new files or files whose stat changed
+      "unchanged":  number of files skipped on stat alone
+      "deleted":    tracked files under root_dirs that no longer exist (or are no longer accepted)
+    """
+    candidates = []
+    unchanged = 0
+    seen = set()
+    for filepath, st in iter_files(root_dirs, skip_dirs, accept):
+        seen.add(filepath)
+        known = known_states.get(filepath)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            unchanged += 1
+        else:
+            candidates.append((filepath, st.st_size, st.st_mtime_ns))
+    deleted = [fp for fp in known_states if fp not in seen and _under_roots(fp, root_dirs)]
+    return {"candidates": candidates, "unchanged": unchanged, "deleted": deleted}
+
+def record_file_state(manifest, collection_name, filepath, content_hash=None, writer=None):
+    """
+    Stores the file's current (size, mtime_ns, content hash) in the manifest. With a
+    writer, the signature is taken now but stored only once the queued chunks are written.
+    """
+    if manifest is None:
+        return
+    try:
+        st = os.stat(filepath)
+        if content_hash is None:
+            content_hash = hash_file(filepath)
+    except OSError:
+        return
+    after_flush(writer, lambda: manifest.set_file_state(collection_name, filepath, st.st_size,
+                                                        st.st_mtime_ns, content_hash))
+
+def _pair_moves(plan, known_states, content_hash_fn):
+    """
+    Matches deleted files to new files with the same content hash (renames / moves made
+    while nothing was watching, or during an event storm).
+    Returns ({new_path: old_path}, {filepath: content hash computed on the way}).
+    """
+    deleted_by_hash = defaultdict(list)
+    for filepath in plan["deleted"]:
+        known = known_states.get(filepath)
+        if known and known[2]:
+            deleted_by_hash[known[2]].append(filepath)
+    moves, hashes = {}, {}
+    if not deleted_by_hash:
+        return moves, hashes
+    for filepath, _, _ in plan["candidates"]:
+        if filepath in known_states:
+            continue
+        try:
+            hashes[filepath] = content_hash_fn(filepath)
+        except OSError:
+            continue
+        sources = deleted_by_hash.get(hashes[filepath])
+        if sources:
+            moves[filepath] = sources.pop()
+    return moves, hashes
+
+def apply_index_plan(plan, collection, embed_model, manifest, known_states, reindex_fn,
+                     batch_size=EMBED_BATCH_SIZE, content_hash_fn=None, movable=True,
+                     progress=None, priority_count=0, throttle=None):
+    """
+    Executes a plan from plan_incremental_index():
+      - with movable=True, a deleted file whose content reappears at a new path is moved
+        (chunks and vectors carried over by move_file_chunks) instead of deleted + re-embedded;
+        explicit plan["renamed"] pairs (e.g. from git) are moved first and then synced,
+        so an edit made along with the rename only re-embeds the changed chunks
+      - deleted files lose their chunks
+      - files whose stat changed but whose content hash did not only get their signature refreshed
+      - emptied files lose their chunks
+      - everything else goes through reindex_fn(filepath, collection, embed_model, writer=, manifest=)
+        with one ChunkBatchWriter shared across files
+    content_hash_fn(filepath) defaults to hash_file(); indexers with cheaper signatures for
+    some files (e.g. tail-indexed logs) pass their own.
+    progress(filepath) is called after each candidate; the writer is flushed after the
+    first `priority_count` candidates (see index_priority.prioritize_plan).
+    throttle (an index_throttle.IndexThrottle) gates every embedding batch; the time it
+    held this plan back is reported as summary["throttled_seconds"].
+    Returns a summary dict.
+    """
+    if content_hash_fn is None:
+        content_hash_fn = hash_file
+    throttled_before = throttle.throttled_seconds() if throttle is not None else 0.0
+    summary = {
+        "unchanged": plan["unchanged"],
+        "touched": 0,
+        "reindexed": 0,
+        "deleted": 0,
+        "moved": 0,
+        "files_with_new_chunks": 0,
+        "new_chunks": 0,
+    }
+
+    for old_path, new_path in plan.get("renamed", []):
+        if movable:
+            moved = move_file_chunks(collection, old_path, new_path, manifest, batch_size=batch_size)
+            logger.info(f"Moved {moved} chunk(s) from {old_path} -> {new_path}")
+            print(f"   🔀 Moved {moved} chunk(s) from {old_path} -> {new_path}")
+        else:
+            remove_file_chunks(collection, old_path, manifest)
+        summary["moved"] += 1
+
+    moves, hashes = _pair_moves(plan, known_states, content_hash_fn) if movable else ({}, {})
+    for new_path, old_path in moves.items():
+        moved = move_file_chunks(collection, old_path, new_path, manifest, batch_size=batch_size)
+        record_file_state(manifest, collection.name, new_path, hashes[new_path])
+        summary["moved"] += 1
+        logger.info(f"Moved {moved} chunk(s) from {old_path} -> {new_path}")
+        print(f"   🔀 Moved {moved} chunk(s) from {old_path} -> {new_path}")
+
+    moved_from = set(moves.values())
+    for filepath in (fp for fp in plan["deleted"] if fp not in moved_from):
+        removed = remove_file_chunks(collection, filepath, manifest)
+        summary["deleted"] += 1
+        logger.info(f"Removed {removed} chunk(s) for deleted file: {filepath}")
+        print(f"   ❌ Removed {removed} chunk(s) for deleted file: {filepath}")
+
+    with ChunkBatchWriter(collection, embed_model, batch_size=batch_size, throttle=throttle,
+                          lexical=lexical_index_for(manifest), manifest=manifest) as writer:
+        for position, (filepath, _, _) in enumerate(plan["candidates"], 1):
+            try:
+                if filepath in moves:
+                    continue
+                try:
+                    content_hash = hashes.get(filepath) or content_hash_fn(filepath)
+                    blank = is_blank_file(filepath)
+                except OSError as e:
+                    logger.error(f"Error reading {filepath}: {e}")
+                    print(f"⚠ Error reading {filepath}: {e}")
+                    continue
+
+                known = known_states.get(filepath)
+                if known and known[2] == content_hash:
+                    # mtime changed but content did not (touch, checkout, copy)
+                    record_file_state(manifest, collection.name, filepath, content_hash)
+                    summary["touched"] += 1
+                    continue
+
+                summary["reindexed"] += 1
+                if blank:
+                    removed = remove_file_chunks(collection, filepath, manifest)
+                    if removed:
+                        print(f"   🔸 Removed {removed} chunk(s) for emptied file: {filepath}")
+                    record_file_state(manifest, collection.name, filepath, content_hash)
+                    continue
+
+                added = reindex_fn(filepath, collection, embed_model, writer=writer, manifest=manifest)
+                if added > 0:
+                    summary["files_with_new_chunks"] += 1
+                    summary["new_chunks"] += added
+            finally:
+                if position == priority_count:
+                    # priority files become searchable before the rest of the tree is embedded
+                    writer.flush()
+                if progress is not None:
+                    progress(filepath)
+
+    summary["batches"] = writer.total_batches
+    summary["chunks_per_second"] = writer.chunks_per_second()
+    if throttle is not None:
+        summary["throttled_seconds"] = throttle.throttled_seconds() - throttled_before
+    return summary
+
+def format_plan_summary(summary, elapsed):
+    return (f"Skipped {summary['unchanged'] + summary['touched']} unchanged file(s) "
+            f"({summary['touched']} touched without content change), reindexed {summary['reindexed']}, "
+            f"moved {summary.get('moved', 0)}, removed {summary['deleted']} deleted file(s) in {elapsed:.2f}s"
+            + (f" ({summary['throttled_seconds']:.1f}s throttled)." if summary.get("throttled_seconds") else "."))
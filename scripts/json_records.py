@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+json_records.py
+
+Record-aware chunking for JSON log files (debug_logs.json, debugging_strategy_log.json,
+project_structure.json), used by index_debug_logs.py and index_project_structure.py.
+
+Line windows cut JSON records in half, and flipping one entry's "resolved" flag
+shifted every window of the file. Here:
+ - the file is streamed with json.JSONDecoder.raw_decode, one entry at a time, so
+   the whole document is never parsed into memory at once
+ - each entry becomes one document with a stable id, "{filepath}::entry_{id}", keyed
+   by the entry's "id" field (array of records) or its key (object of records);
+   array entries without an id are keyed by their content hash, so inserting an entry
+   does not renumber the ones after it;
+   entries over the token budget are split into "::part_{n}" documents
+ - each document's metadata carries its content hash, so sync_file_chunks() re-embeds
+   only the entries that changed; nothing positional (record position in the file,
+   mod_time) goes into the metadata, so inserting or deleting an entry does not rewrite
+   the metadata of the unchanged ones either (chunk_index is the part within the entry)
+Files that are not valid JSON raise JSONRecordError; callers fall back to line chunks.
+"""
+
+import os
+import sys
+import json
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.token_chunker import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, chunk_lines_by_tokens
+
+READ_BLOCK_SIZE = 1024 * 1024   # characters read per refill of the decode buffer
+DEFAULT_ID_FIELD = "id"
+# Where the records live inside a file's top-level object (default: the top level itself)
+KNOWN_RECORD_PATHS = {"project_structure.json": ("structure",)}
+# Scalar entry fields copied into metadata for filtering
+ENTRY_META_FIELDS = ("timestamp", "error", "error_type", "resolved", "fix_successful")
+
+class JSONRecordError(ValueError):
+    """The file is not a JSON array/object of records (or is malformed)."""
+
+class _JSONStream:
+    """Incremental raw_decode over a text file, refilling the buffer as needed."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.f.read(READ_BLOCK_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch):
+        found = self.peek()
+        if found != ch:
+            raise JSONRecordError(f"expected {ch!r}, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def decode(self):
+        """Decodes the next JSON value, reading more of the file until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise JSONRecordError(str(e)) from e
+            # A number at the buffer's edge may continue in the next block
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+def iter_json_records(filepath, record_path=()):
+    """
+    Yields (key, value) for each entry of the JSON array or object found at `record_path`
+    (a tuple of object keys from the top level). Array entries are keyed by position.
+    Raises JSONRecordError on malformed JSON or an unexpected shape.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        for wanted in record_path:
+            stream.expect("{")
+            while True:
+                if stream.peek() == "}":
+                    raise JSONRecordError(f"key {wanted!r} not found")
+                key = stream.decode()
+                stream.expect(":")
+                if key == wanted:
+                    break
+                stream.decode()
+                if stream.peek() == ",":
+                    stream.pos += 1
+
+        opener = stream.peek()
+        if opener not in ("[", "{"):
+            raise JSONRecordError(f"expected a JSON array or object, found {opener or 'end of file'!r}")
+        closer = "]" if opener == "[" else "}"
+        stream.pos += 1
+        index = 0
+        while stream.peek() != closer:
+            if opener == "[":
+                key = index
+            else:
+                key = stream.decode()
+                stream.expect(":")
+            yield key, stream.decode()
+            index += 1
+            if stream.peek() == ",":
+                stream.pos += 1
+            elif stream.peek() != closer:
+                raise JSONRecordError(f"expected ',' or {closer!r} after entry {index}")
+
+def record_path_for(filepath):
+    return KNOWN_RECORD_PATHS.get(os.path.basename(filepath), ())
+
+def build_record_chunks(filepath, hash_fn, base_meta=None, record_path=None, id_field=DEFAULT_ID_FIELD,
+                        max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS, counter=None):
+    """
+    One (doc_id, text, metadata) per JSON entry (or per part of an oversized entry).
+    hash_fn(text) -> content hash; base_meta is copied into every document's metadata.
+    Raises JSONRecordError if the file cannot be read as records.
+    """
+    if record_path is None:
+        record_path = record_path_for(filepath)
+
+    chunks = []
+    seen_ids = {}
+    for key, value in iter_json_records(filepath, record_path):
+        if isinstance(key, int):
+            text = json.dumps(value, indent=2, ensure_ascii=False)
+            entry_hash = hash_fn(text)
+            if isinstance(value, dict) and value.get(id_field) is not None:
+                entry_id = str(value[id_field])
+            else:
+                entry_id = f"hash_{entry_hash}"
+        else:
+            text = json.dumps({key: value}, indent=2, ensure_ascii=False)
+            entry_hash = hash_fn(text)
+            entry_id = key
+
+        # Duplicate ids inside one file still need distinct doc ids
+        dupes = seen_ids.get(entry_id, 0)
+        seen_ids[entry_id] = dupes + 1
+        if dupes:
+            entry_id = f"{entry_id}#{dupes}"
+
+        entry_meta = dict(base_meta or {})
+        entry_meta.update({
+            "filepath": filepath,
+            "rel_path": filepath,
+            "entry_id": entry_id,
+            "entry_hash": entry_hash,
+        })
+        if isinstance(value, dict):
+            for field in ENTRY_META_FIELDS:
+                if isinstance(value.get(field), (str, int, float, bool)):
+                    entry_meta[field] = value[field]
+
+        parts = chunk_lines_by_tokens(text.splitlines(), 0, max_tokens=max_tokens,
+                                      overlap_tokens=overlap_tokens, counter=counter)
+        for part, (part_text, st_line, end_line, token_count) in enumerate(parts):
+            doc_id = f"{filepath}::entry_{entry_id}" if len(parts) == 1 else f"{filepath}::entry_{entry_id}::part_{part}"
+            meta = dict(entry_meta)
+            meta.update({
+                "chunk_index": part,
+                "part": part,
+                "hash": hash_fn(part_text),
+                "token_count": int(token_count),
+            })
+            chunks.append((doc_id, part_text, meta))
+    return chunks
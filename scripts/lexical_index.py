@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+lexical_index.py
+
+Persistent trigram + BM25 index over the documents stored in Chroma, for the
+aggregator's naive / both search modes.
+
+naive_substring_search used to pull up to 9,999 full documents per collection with
+collection.get(limit=9999) and lowercase every one of them on every query, which is
+O(corpus bytes) per query and silently ignored everything past 9,999 documents.
+Here each (collection, doc_id, document) is stored once in SQLite with two FTS5
+indexes over it:
+ - docs_trigram (trigram tokenizer): case-insensitive substring lookups
+   (substring_search), the same matches as `query.lower() in doc.lower()`
+ - docs_terms (unicode61 tokenizer): ranked keyword lookups with BM25 (keyword_search)
+
+The indexers and the recall daemon's write ops keep it in sync from their add, update
+and delete paths (embed_and_write, remove_file_chunks, sync_file_chunks,
+move_file_chunks, the tail and knowledge-base indexers), and record the collection
+generation their write produced (advance_generation). Collections written elsewhere
+(agent logs, blueprints) are caught up by sync_collection(), which the searcher calls
+before a lookup:
+ - when the manifest's generation moved past the last one synced, the collection's
+   documents are re-read page by page and only new or changed rows are rewritten, so
+   in-place upserts / updates are picked up as well as adds and deletes
+ - when only Chroma's count differs (a writer that did not bump the generation), the
+   id lists are diffed and only missing documents are fetched
+
+The index lives next to Chroma's own sqlite file:
+    <chroma_db>/lexical_index.sqlite3
+
+Usage:
+    python lexical_index.py <collection> "<substring>" [--keyword]
+        (print matching doc ids; --keyword ranks by BM25 instead)
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import logging
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+DEFAULT_CHROMA_DB_PATH = "/mnt/f/projects/ai-recall-system/chroma_db"
+LEXICAL_INDEX_FILENAME = "lexical_index.sqlite3"
+SYNC_PAGE_SIZE = 1000           # ids / documents read from Chroma per get() while syncing
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    rowid      INTEGER PRIMARY KEY,
+    collection TEXT NOT NULL,
+    doc_id     TEXT NOT NULL,
+    document   TEXT NOT NULL,
+    UNIQUE (collection, doc_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_trigram USING fts5(
+    document, content='docs', content_rowid='rowid', tokenize='trigram'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_terms USING fts5(
+    document, content='docs', content_rowid='rowid', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_trigram (rowid, document) VALUES (new.rowid, new.document);
+    INSERT INTO docs_terms (rowid, document) VALUES (new.rowid, new.document);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+    INSERT INTO docs_trigram (docs_trigram, rowid, document) VALUES ('delete', old.rowid, old.document);
+    INSERT INTO docs_terms (docs_terms, rowid, document) VALUES ('delete', old.rowid, old.document);
+END;
+CREATE TABLE IF NOT EXISTS synced_generations (
+    collection TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE OF document ON docs BEGIN
+    INSERT INTO docs_trigram (docs_trigram, rowid, document) VALUES ('delete', old.rowid, old.document);
+    INSERT INTO docs_terms (docs_terms, rowid, document) VALUES ('delete', old.rowid, old.document);
+    INSERT INTO docs_trigram (rowid, document) VALUES (new.rowid, new.document);
+    INSERT INTO docs_terms (rowid, document) VALUES (new.rowid, new.document);
+END;
+"""
+
+class LexicalIndex:
+    """
+    Thread-safe wrapper around the lexical index sqlite file.
+    Raises sqlite3.Error if this SQLite build lacks FTS5 / the trigram tokenizer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------ reads
+
+    def count(self, collection_name):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM docs WHERE collection = ?", (collection_name,)
+            ).fetchone()[0]
+
+    def doc_ids(self, collection_name):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM docs WHERE collection = ?", (collection_name,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def synced_generation(self, collection_name):
+        """The collection generation this index last caught up with, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generation FROM synced_generations WHERE collection = ?", (collection_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def substring_search(self, collection_name, query, limit=None):
+        """
+        Doc ids whose document contains `query` (case-insensitive), in insertion order.
+        Queries of 3+ characters are answered from the trigram index; shorter ones scan
+        this collection's rows with LIKE.
+        """
+        if not query:
+            return []
+        limit = -1 if limit is None else int(limit)
+        with self._lock:
+            if len(query) >= 3:
+                rows = self._conn.execute(
+                    "SELECT d.doc_id FROM docs_trigram t JOIN docs d ON d.rowid = t.rowid "
+                    "WHERE docs_trigram MATCH ? AND d.collection = ? ORDER BY d.rowid LIMIT ?",
+                    ('"' + query.replace('"', '""') + '"', collection_name, limit)
+                ).fetchall()
+            else:
+                pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                rows = self._conn.execute(
+                    "SELECT doc_id FROM docs WHERE collection = ? AND document LIKE ? ESCAPE '\\' "
+                    "ORDER BY rowid LIMIT ?",
+                    (collection_name, pattern, limit)
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def keyword_search(self, collection_name, query, limit=10):
+        """
+        [(doc_id, score)] for documents sharing terms with `query`, best BM25 first
+        (score is bm25(): lower is better). Any query term may match.
+        """
+        terms = TERM_PATTERN.findall(query)
+        if not terms:
+            return []
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in dict.fromkeys(terms))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.doc_id, bm25(docs_terms) AS score FROM docs_terms JOIN docs d ON d.rowid = docs_terms.rowid "
+                "WHERE docs_terms MATCH ? AND d.collection = ? ORDER BY score LIMIT ?",
+                (match, collection_name, int(limit))
+            ).fetchall()
+        return [(doc_id, score) for doc_id, score in rows]
+
+    # ----------------------------------------------------------------- writes
+
+    def add(self, collection_name, docs):
+        """Adds or replaces (doc_id, document) pairs; returns how many rows were new or changed."""
+        docs = [(collection_name, doc_id, document or "") for doc_id, document in docs]
+        if not docs:
+            return 0
+        with self._lock, self._conn:
+            return self._conn.executemany(
+                "INSERT INTO docs (collection, doc_id, document) VALUES (?, ?, ?) "
+                "ON CONFLICT (collection, doc_id) DO UPDATE SET document = excluded.document "
+                "WHERE document != excluded.document",
+                docs
+            ).rowcount
+
+    def remove(self, collection_name, doc_ids):
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM docs WHERE collection = ? AND doc_id = ?",
+                [(collection_name, doc_id) for doc_id in doc_ids]
+            )
+
+    def clear_collection(self, collection_name):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM docs WHERE collection = ?", (collection_name,))
+            self._conn.execute("DELETE FROM synced_generations WHERE collection = ?", (collection_name,))
+
+    def set_synced_generation(self, collection_name, generation):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO synced_generations (collection, generation) VALUES (?, ?) "
+                "ON CONFLICT (collection) DO UPDATE SET generation = excluded.generation",
+                (collection_name, generation)
+            )
+
+    def advance_generation(self, collection_name, generation):
+        """
+        Records that a write mirrored into this index produced `generation`. Only applies
+        when the index was current at the generation before it; otherwise some write was
+        not mirrored and the next sync_collection() re-reads the collection.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE synced_generations SET generation = ? WHERE collection = ? AND generation = ?",
+                (generation, collection_name, generation - 1)
+            )
+
+    def sync_collection(self, collection, generation=None, page_size=SYNC_PAGE_SIZE):
+        """
+        Catches the index up with `collection`. Returns (added or changed, removed).
+        generation: the collection's generation in the index manifest. If it differs from
+        the last one synced, every document is re-read (page by page) and compared, which
+        catches in-place upserts / updates; the generation is then recorded as synced.
+        Otherwise (or without one) the index is only caught up when the document counts
+        differ: ids are diffed and only missing documents are fetched.
+        """
+        name = collection.name
+        if generation is not None and generation != self.synced_generation(name):
+            changed, removed = self._resync(collection, page_size)
+        elif collection.count() == self.count(name):
+            return 0, 0
+        else:
+            changed, removed = self._fetch_missing(collection, page_size)
+        if generation is not None:
+            self.set_synced_generation(name, generation)
+        if changed or removed:
+            logger.info(f"Lexical index for '{name}' synced: +{changed} / -{removed} document(s)")
+        return changed, removed
+
+    def _resync(self, collection, page_size):
+        """Re-reads every document of the collection; only new or changed rows are written."""
+        name = collection.name
+        stored_ids = set()
+        changed = 0
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=page_size, offset=offset)
+            ids = page.get("ids") or []
+            stored_ids.update(ids)
+            changed += self.add(name, zip(ids, page.get("documents") or []))
+            if len(ids) < page_size:
+                break
+            offset += page_size
+        vanished = self.doc_ids(name).difference(stored_ids)
+        self.remove(name, vanished)
+        return changed, len(vanished)
+
+    def _fetch_missing(self, collection, page_size):
+        """Diffs the id lists (no documents read) and fetches only the missing documents."""
+        name = collection.name
+        stored_ids = []
+        offset = 0
+        while True:
+            page = collection.get(include=[], limit=page_size, offset=offset)
+            ids = page.get("ids") or []
+            stored_ids.extend(ids)
+            if len(ids) < page_size:
+                break
+            offset += page_size
+        known = self.doc_ids(name)
+        missing = [doc_id for doc_id in stored_ids if doc_id not in known]
+        vanished = known.difference(stored_ids)
+        self.remove(name, vanished)
+        for i in range(0, len(missing), page_size):
+            page = collection.get(ids=missing[i:i + page_size], include=["documents"])
+            self.add(name, zip(page.get("ids") or [], page.get("documents") or []))
+        return len(missing), len(vanished)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+##############################################################################
+# Shared instances
+##############################################################################
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_unavailable = set()
+
+def lexical_index_path_for(chroma_db_path):
+    return os.path.join(chroma_db_path, LEXICAL_INDEX_FILENAME)
+
+def get_lexical_index(chroma_db_path=DEFAULT_CHROMA_DB_PATH):
+    """
+    Returns the process-wide LexicalIndex stored inside `chroma_db_path`, or None if the
+    directory does not exist or SQLite lacks FTS5 trigram support (logged once).
+    """
+    path = lexical_index_path_for(chroma_db_path)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is not None or path in _unavailable:
+            return index
+        if not os.path.isdir(chroma_db_path):
+            return None
+        try:
+            index = _indexes[path] = LexicalIndex(path)
+        except sqlite3.Error as e:
+            _unavailable.add(path)
+            logger.warning(f"Lexical index unavailable at {path} ({e}); naive search scans documents instead")
+        return index
+
+def lexical_index_for(manifest):
+    """The LexicalIndex next to an IndexManifest (both live in the chroma_db directory), or None."""
+    if manifest is None:
+        return None
+    return get_lexical_index(os.path.dirname(manifest.path))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print('Usage: python lexical_index.py <collection> "<substring>" [--keyword]')
+        sys.exit(1)
+    index = get_lexical_index()
+    if index is None:
+        print(f"❌ No lexical index available under {DEFAULT_CHROMA_DB_PATH}")
+        sys.exit(1)
+    collection_name, query = sys.argv[1], sys.argv[2]
+    if "--keyword" in sys.argv[3:]:
+        for doc_id, score in index.keyword_search(collection_name, query, limit=20):
+            print(f"{score:8.3f}  {doc_id}")
+    else:
+        for doc_id in index.substring_search(collection_name, query, limit=20):
+            print(doc_id)
+    print(f"📚 {index.count(collection_name)} document(s) indexed in '{collection_name}'")
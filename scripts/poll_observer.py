@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+poll_observer.py
+
+Polling change detector for mounts where inotify does not deliver events
+(WSL drvfs / 9p under /mnt/<drive>, network shares). watchdog's inotify Observer
+stays silent there, so the indexing daemon would stop tracking edits.
+
+PollingObserver feeds the same callbacks as the watchdog handler (the daemon's
+submit / submit_move, i.e. the coalescing ReindexScheduler):
+ - the baseline is the persisted manifest's (size, mtime_ns) signatures, so the first
+   tick only reports what changed since the last index, not the whole tree
+ - each tick lists directories with os.scandir and diffs their entries' stat against the
+   snapshot: created/modified -> "index", vanished -> "delete", and a vanished file or
+   directory that reappears in the same tick with the same signature -> a move
+ - directories with recent activity are rescanned every tick; the rest of the tree is
+   rescanned round-robin within a slice of the tick, so no tick pays for a full rescan
+ - the interval adapts: min_interval right after activity, doubling while idle up to
+   max_interval; a CPU budget (share of wall time spent scanning) stretches it further
+   when scans are slow
+
+watch_mode() picks the observer: RECALL_WATCH_MODE=inotify|poll|auto (default auto:
+poll when any watched root sits on a filesystem type in POLL_FSTYPES).
+
+Usage:
+    python poll_observer.py /mnt/f/projects/ai-recall-system/scripts
+        (print detected changes under a directory until Ctrl+C)
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from collections import defaultdict
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.indexing_utils import moved_path
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+MIN_INTERVAL = 0.5          # seconds between ticks right after activity
+MAX_INTERVAL = 10.0         # seconds between ticks when idle
+CPU_BUDGET = 0.05           # max share of wall time spent scanning
+HOT_SECONDS = 30.0          # directories changed this recently are rescanned every tick
+# Filesystems where inotify misses events (WSL1 drvfs, WSL2 9p, network mounts)
+POLL_FSTYPES = {"9p", "v9fs", "drvfs", "fuse.drvfs", "cifs", "smb3", "smbfs", "nfs", "nfs4", "fuse.sshfs"}
+WATCH_MODES = ("auto", "inotify", "poll")
+
+logger = logging.getLogger(__name__)
+
+def mount_fstype(path, mounts_file="/proc/mounts"):
+    """Filesystem type of the mount holding `path` ('' if unknown)."""
+    path = os.path.abspath(path)
+    best, fstype = "", ""
+    try:
+        with open(mounts_file, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace("\\040", " ")
+                under = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if under and len(mount_point) >= len(best):
+                    best, fstype = mount_point, parts[2]
+    except OSError:
+        return ""
+    return fstype
+
+def watch_mode(root_dirs, mode=None):
+    """'poll' or 'inotify' for these roots (mode / RECALL_WATCH_MODE, 'auto' detects drvfs)."""
+    mode = (mode or os.environ.get("RECALL_WATCH_MODE", "auto")).lower()
+    if mode not in WATCH_MODES:
+        raise ValueError(f"Unknown watch mode {mode!r}; expected one of {', '.join(WATCH_MODES)}")
+    if mode != "auto":
+        return mode
+    return "poll" if any(mount_fstype(root) in POLL_FSTYPES for root in root_dirs) else "inotify"
+
+##############################################################################
+# Observer
+##############################################################################
+
+class PollingObserver:
+    """
+    Stat-snapshot poller over `root_dirs`.
+    accept(filepath) selects files; directories named in `skip_dirs` are not entered.
+    submit(path, action) receives "index" / "delete"; submit_move(src, dest, is_directory)
+    receives renames. known_states ({filepath: (size, mtime_ns, ...)}) seeds the snapshot.
+    """
+
+    def __init__(self, root_dirs, skip_dirs, accept, submit, submit_move=None, known_states=None,
+                 min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, cpu_budget=CPU_BUDGET,
+                 hot_seconds=HOT_SECONDS):
+        self.root_dirs = [os.path.abspath(d) for d in root_dirs]
+        self.skip_dirs = set(skip_dirs)
+        self.accept = accept
+        self.submit = submit
+        self.submit_move = submit_move
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cpu_budget = cpu_budget
+        self.hot_seconds = hot_seconds
+        self.interval = min_interval
+
+        # dirpath -> {"files": {path: (size, mtime_ns)}, "dirs": set(subdir paths), "changed": t}
+        self._dirs = {}
+        self._baseline = defaultdict(dict)     # dirpath -> {filepath: (size, mtime_ns)}, until first tick
+        for filepath, state in (known_states or {}).items():
+            self._baseline[os.path.dirname(filepath)][filepath] = (state[0], state[1])
+        self._cold = []                 # round-robin queue of directories to rescan
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"ticks": 0, "dirs_scanned": 0, "events": 0, "scan_seconds": 0.0}
+
+    # ------------------------------------------------------------- lifecycle
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="poll-observer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Polling tick failed: {e}")
+            self._stop.wait(self.interval)
+
+    # ----------------------------------------------------------------- ticks
+
+    def tick(self, now=None):
+        """
+        Rescans hot directories plus a budgeted slice of the cold ones (everything on the
+        first tick). Returns the number of change events emitted.
+        """
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        events = 0
+        if not self._dirs:
+            for root in self.root_dirs:
+                events += self._scan_tree(root, now, self._baseline)
+            # Tracked files whose directory is gone altogether
+            for files in self._baseline.values():
+                for filepath in files:
+                    self.submit(filepath, "delete")
+                    events += 1
+            self._baseline.clear()
+        else:
+            hot = {d for d, info in self._dirs.items() if now - info["changed"] < self.hot_seconds}
+            for dirpath in sorted(hot):
+                events += self._scan_dir(dirpath, now)
+            # Cold directories round-robin until the tick's slice is used (at least one per tick)
+            deadline = start + self.cpu_budget * self.interval
+            attempts, scanned = len(self._dirs), 0
+            while attempts > 0 and (scanned == 0 or time.perf_counter() < deadline):
+                attempts -= 1
+                if not self._cold:
+                    self._cold = sorted(self._dirs, reverse=True)
+                dirpath = self._cold.pop()
+                if dirpath in hot or dirpath not in self._dirs:
+                    continue
+                events += self._scan_dir(dirpath, now)
+                scanned += 1
+
+        elapsed = time.perf_counter() - start
+        self.stats["ticks"] += 1
+        self.stats["events"] += events
+        self.stats["scan_seconds"] += elapsed
+        self._adapt(events, elapsed)
+        return events
+
+    def _adapt(self, events, elapsed):
+        if events:
+            interval = self.min_interval
+        else:
+            interval = min(self.max_interval, self.interval * 2)
+        # Keep scanning under cpu_budget of wall time, whatever the activity
+        if self.cpu_budget > 0:
+            interval = max(interval, elapsed / self.cpu_budget - elapsed)
+        self.interval = interval
+
+    # -------------------------------------------------------------- scanning
+
+    def _list(self, dirpath):
+        """({filepath: (size, mtime_ns)}, {subdir paths}) for one directory, or None if it is gone."""
+        files, dirs = {}, set()
+        try:
+            entries = list(os.scandir(dirpath))
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Cannot scan {dirpath}: {e}")
+            return files, dirs
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in self.skip_dirs:
+                        dirs.add(entry.path)
+                elif entry.is_file() and self.accept(entry.path):
+                    st = entry.stat()
+                    files[entry.path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+        return files, dirs
+
+    def _scan_tree(self, root, now, baseline=None):
+        """Snapshots a whole tree, diffing each directory against `baseline` ({dirpath: files}, consumed)."""
+        events = 0
+        stack = [root]
+        while stack:
+            dirpath = stack.pop()
+            listing = self._list(dirpath)
+            if listing is None:
+                continue
+            files, dirs = listing
+            old = baseline.pop(dirpath, {}) if baseline is not None else {}
+            changed = self._emit_file_changes(old, files)
+            self._dirs[dirpath] = {"files": files, "dirs": dirs, "changed": now if changed else 0.0}
+            self.stats["dirs_scanned"] += 1
+            events += changed
+            stack.extend(dirs)
+        return events
+
+    def _scan_dir(self, dirpath, now):
+        info = self._dirs.get(dirpath)
+        if info is None:
+            return 0
+        listing = self._list(dirpath)
+        self.stats["dirs_scanned"] += 1
+        if listing is None:
+            # Gone: its parent's scan reports it (as a move or a deletion)
+            return 0
+        files, dirs = listing
+        events = self._emit_file_changes(info["files"], files)
+        info["files"] = files
+
+        vanished = info["dirs"] - dirs
+        appeared = dirs - info["dirs"]
+        info["dirs"] = dirs
+        for old_dir in sorted(vanished):
+            new_dir = self._match_moved_dir(old_dir, appeared)
+            if new_dir is not None:
+                appeared.discard(new_dir)
+                self._rekey_tree(old_dir, new_dir, now)
+                if self.submit_move is not None:
+                    self.submit_move(old_dir, new_dir, True)
+                else:
+                    self._emit_tree_deleted(new_dir, rename_from=old_dir)
+            else:
+                self._emit_tree_deleted(old_dir)
+            events += 1
+        for new_dir in sorted(appeared):
+            events += self._scan_tree(new_dir, now) + 1
+
+        if events:
+            info["changed"] = now
+        return events
+
+    def _emit_file_changes(self, old, new):
+        events = 0
+        created = {fp: sig for fp, sig in new.items() if fp not in old}
+        deleted = {fp: sig for fp, sig in old.items() if fp not in new}
+        for fp, sig in new.items():
+            if fp in old and old[fp] != sig:
+                self.submit(fp, "index")
+                events += 1
+
+        # Same signature vanishing and appearing in one tick: a rename
+        by_sig = {}
+        for fp, sig in created.items():
+            by_sig.setdefault(sig, []).append(fp)
+        for fp, sig in deleted.items():
+            matches = by_sig.get(sig)
+            if matches and self.submit_move is not None:
+                dest = matches.pop()
+                del created[dest]
+                self.submit_move(fp, dest, False)
+            else:
+                self.submit(fp, "delete")
+            events += 1
+        for fp in created:
+            self.submit(fp, "index")
+            events += 1
+        return events
+
+    def _tree_files(self, dirpath):
+        """Every (filepath, signature) recorded under `dirpath`, and the directories involved."""
+        files, dirs, stack = {}, [], [dirpath]
+        while stack:
+            d = stack.pop()
+            info = self._dirs.get(d)
+            if info is None:
+                continue
+            dirs.append(d)
+            files.update(info["files"])
+            stack.extend(info["dirs"])
+        return files, dirs
+
+    @staticmethod
+    def _dir_signature(files, dirs):
+        return ({(os.path.basename(fp), sig) for fp, sig in files.items()},
+                {os.path.basename(d) for d in dirs})
+
+    def _match_moved_dir(self, old_dir, candidates):
+        """The new sibling directory whose direct entries match `old_dir`'s by name and signature."""
+        old_info = self._dirs.get(old_dir)
+        if old_info is None:
+            return None
+        old_sig = self._dir_signature(old_info["files"], old_info["dirs"])
+        for new_dir in sorted(candidates):
+            listing = self._list(new_dir)
+            if listing is not None and self._dir_signature(*listing) == old_sig:
+                return new_dir
+        return None
+
+    def _rekey_tree(self, old_dir, new_dir, now):
+        """Moves the snapshot of `old_dir`'s subtree under `new_dir`."""
+        _, dirs = self._tree_files(old_dir)
+        for d in dirs:
+            info = self._dirs.pop(d)
+            self._dirs[moved_path(d, old_dir, new_dir)] = {
+                "files": {moved_path(fp, old_dir, new_dir): sig for fp, sig in info["files"].items()},
+                "dirs": {moved_path(sd, old_dir, new_dir) for sd in info["dirs"]},
+                "changed": now,
+            }
+
+    def _emit_tree_deleted(self, dirpath, rename_from=None):
+        files, dirs = self._tree_files(dirpath)
+        for d in dirs:
+            self._dirs.pop(d, None)
+        for fp in files:
+            if rename_from is not None:
+                self.submit(moved_path(fp, dirpath, rename_from), "delete")
+                self.submit(fp, "index")
+            else:
+                self.submit(fp, "delete")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Print changes detected by the polling observer.")
+    parser.add_argument("root", help="Directory to poll.")
+    parser.add_argument("--budget", type=float, default=CPU_BUDGET, help="Max share of wall time spent scanning.")
+    args = parser.parse_args()
+
+    print(f"🔎 Filesystem: {mount_fstype(args.root) or 'unknown'} (watch mode: {watch_mode([args.root])})")
+    observer = PollingObserver(
+        [args.root], {".git", "__pycache__", "node_modules"}, lambda fp: True,
+        submit=lambda path, action: print(f"   {action}: {path}"),
+        submit_move=lambda src, dest, is_dir: print(f"   move: {src} -> {dest}"),
+        cpu_budget=args.budget
+    )
+    observer.tick()
+    print(f"👀 Polling {args.root} (Ctrl+C to stop)...")
+    observer.start()
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   📊 interval {observer.interval:.2f}s, {observer.stats}")
+    except KeyboardInterrupt:
+        observer.stop()
+        observer.join()
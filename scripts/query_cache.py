@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+query_cache.py
+
+LRU + TTL cache for aggregator_search results, invalidated by collection generation.
+
+The BuildAgent asks the same "{error} in {script_name}" question on every retry and
+the CLI repeats queries, and each repeat paid the full embed + query path again.
+AggregatorSearcher caches each collection's hits per (collection, query, top_n, mode)
+together with the collection's generation counter at the time of the search:
+ - the indexers, the recall daemon's write ops and the scripts that write to Chroma
+   directly (BuildAgent.log_entry(), blueprint_execution, the work-session / debug-log /
+   strategy loggers, run_all_tests, store_test_data; via bump_collection_generation())
+   bump a collection's generation in the index manifest after every write, so an entry
+   is dropped once its collection changed (and only that collection is searched again)
+ - entries also expire after ttl seconds, which bounds how long a write that bypasses
+   the manifest (e.g. chromadb used by hand) can go unnoticed
+   and the least recently used ones are evicted beyond max_entries
+ - stats() reports hits / misses / invalidations / expiries, the hit rate and the
+   search time saved (the recorded cost of every entry served from the cache)
+
+Config comes from the environment:
+    RECALL_QUERY_CACHE=0              disable the cache
+    RECALL_QUERY_CACHE_SIZE=512       max cached (collection, query) entries
+    RECALL_QUERY_CACHE_TTL=600        seconds an entry may be served
+
+Usage:
+    python query_cache.py
+        (print the recall daemon's query cache stats)
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+QUERY_CACHE_ENABLED = os.environ.get("RECALL_QUERY_CACHE", "1") not in ("0", "false", "no")
+QUERY_CACHE_SIZE = int(os.environ.get("RECALL_QUERY_CACHE_SIZE", "512"))
+QUERY_CACHE_TTL_SECONDS = float(os.environ.get("RECALL_QUERY_CACHE_TTL", "600"))
+
+##############################################################################
+# Cache
+##############################################################################
+
+class QueryCache:
+    """
+    Thread-safe LRU of key -> (generation, value, cost_seconds, stored_at).
+    get() only returns a value stored under the same generation and within ttl;
+    values are returned as stored, so callers store and hand out copies.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats_counts = {"hits": 0, "misses": 0, "invalidated": 0, "expired": 0, "evicted": 0,
+                             "saved_seconds": 0.0}
+
+    def get(self, key, generation):
+        """The cached value for `key` at `generation`, or None (a stale entry is dropped)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_generation, value, cost, stored_at = entry
+                if stored_generation != generation:
+                    reason = "invalidated"
+                elif self.ttl is not None and self.clock() - stored_at > self.ttl:
+                    reason = "expired"
+                else:
+                    self._entries.move_to_end(key)
+                    self.stats_counts["hits"] += 1
+                    self.stats_counts["saved_seconds"] += cost
+                    return value
+                del self._entries[key]
+                self.stats_counts[reason] += 1
+            self.stats_counts["misses"] += 1
+            return None
+
+    def put(self, key, generation, value, cost_seconds=0.0):
+        with self._lock:
+            self._entries[key] = (generation, value, cost_seconds, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats_counts["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """Counters plus entries and hit_rate (hits / lookups)."""
+        with self._lock:
+            s = dict(self.stats_counts, entries=len(self._entries))
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = s["hits"] / lookups if lookups else 0.0
+        return s
+
+    def describe(self):
+        return describe_stats(self.stats())
+
+def describe_stats(s):
+    """One line summary of QueryCache.stats() (also as returned by the daemon's ping)."""
+    return (f"Query cache: {s['hits']} hit(s) / {s['misses']} miss(es) ({s['hit_rate']:.0%}), "
+            f"{s['invalidated']} invalidated, {s['expired']} expired, {s['entries']} entries, "
+            f"~{s['saved_seconds']:.2f}s of search time saved.")
+
+if __name__ == "__main__":
+    from scripts.recall_daemon import RecallDaemonError, daemon_client
+    client = daemon_client()
+    if client is None:
+        print("❌ No recall daemon running; the query cache only lives inside a process.")
+        sys.exit(1)
+    try:
+        stats = client.call("ping").get("query_cache")
+    except RecallDaemonError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if not stats:
+        print("ℹ️ The recall daemon has not searched yet (or its query cache is disabled).")
+    else:
+        print(f"📦 {describe_stats(stats)}")
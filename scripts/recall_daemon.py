@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+recall_daemon.py
+
+Resident process that keeps the MiniLM embedder and the Chroma PersistentClient warm.
+Without it every entry point (aggregator_search, BuildAgent, each indexer,
+retrieve_codebase) pays the model load and the chromadb import on every run.
+
+The daemon listens on a Unix domain socket and speaks one JSON object per line:
+    {"op": "embed", "texts": ["..."], "query": true}
+    -> {"ok": true, "result": [[0.01, ...]]}
+Ops: ping, embed, add, upsert, update, get, query, delete, count, delete_collection,
+search, shutdown.
+Collection ops take a "collection" name and Chroma's keyword arguments; add/upsert/query
+without embeddings are embedded with the daemon's model (never Chroma's default one).
+Writes (add, upsert, update, delete, delete_collection) are mirrored into the lexical
+index (scripts/lexical_index.py) and bump the collection's generation in the index
+manifest, which invalidates the search op's cached results for it; ping reports the
+query cache's hit rate (scripts/query_cache.py).
+
+Thin clients fall back to in-process execution when the daemon is not running:
+ - get_embed_model()          RemoteEmbeddings, else load_embed_model() (scripts/embeddings.py);
+                              bulk=True uses the multi-process EmbeddingPool when pool_enabled()
+ - get_chroma_client(path)    RemoteClient if the daemon serves `path`, else PersistentClient
+ - daemon_client()            the raw RecallClient (None if no daemon)
+If the daemon goes away mid-run the client is dropped (and only re-checked after
+RECHECK_SECONDS), and Remote* objects carry on with the in-process model / client.
+RECALL_DAEMON=0 disables the lookup; RECALL_DAEMON_SOCKET moves the socket.
+
+Usage:
+    python recall_daemon.py
+        (serve on the default socket)
+    python recall_daemon.py --socket /tmp/recall.sock
+        (serve on another socket)
+    python recall_daemon.py --ping
+        (check a running daemon)
+    python recall_daemon.py --stop
+        (shut a running daemon down)
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import socketserver
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.embeddings import load_embed_model
+from scripts.embedding_pool import pool_enabled
+from scripts.index_manifest import bump_collection_generation
+from scripts.lexical_index import get_lexical_index
+from scripts.query_cache import describe_stats
+
+##############################################################################
+# CONFIG
+##############################################################################
+
+CHROMA_DB_PATH = "/mnt/f/projects/ai-recall-system/chroma_db"
+# Unix sockets cannot live on the /mnt/f (drvfs) share, so the default is the temp dir
+DEFAULT_SOCKET_PATH = os.environ.get(
+    "RECALL_DAEMON_SOCKET",
+    os.path.join(tempfile.gettempdir(), "ai_recall_daemon.sock")
+)
+CLIENT_TIMEOUT = 60.0       # seconds a client waits for one reply (embedding big batches)
+CONNECT_TIMEOUT = 0.5       # seconds to connect / ping before falling back in-process
+RECHECK_SECONDS = 30.0      # a failed ping is retried after this long
+
+logger = logging.getLogger(__name__)
+
+class RecallDaemonError(RuntimeError):
+    """The daemon is unreachable or answered with an error."""
+
+class RecallDaemonUnavailable(RecallDaemonError):
+    """The daemon could not be reached (or dropped the connection)."""
+
+def _to_json(value):
+    """json.dumps default=: numpy arrays / scalars from Chroma results."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def daemon_enabled():
+    return os.environ.get("RECALL_DAEMON", "1").lower() not in ("0", "false", "no")
+
+def _same_path(a, b):
+    return os.path.realpath(a.rstrip(os.sep) or os.sep) == os.path.realpath(b.rstrip(os.sep) or os.sep)
+
+def _bump_generation(chroma_path, collection_name, lexical=None):
+    """
+    Invalidates cached searches of the collection (see scripts/query_cache.py).
+    lexical: the LexicalIndex the write was mirrored into, which then counts as synced.
+    """
+    generation = bump_collection_generation(collection_name, chroma_path)
+    if generation is not None and lexical is not None:
+        lexical.advance_generation(collection_name, generation)
+
+def local_chroma_client(path=CHROMA_DB_PATH):
+    """In-process PersistentClient; chromadb is only imported on this path."""
+    import chromadb
+    return chromadb.PersistentClient(path=path)
+
+##############################################################################
+# Server
+##############################################################################
+
+WRITE_OPS = ("add", "upsert", "update", "delete")
+
+COLLECTION_KWARGS = {
+    "add": ("ids", "documents", "metadatas", "embeddings"),
+    "upsert": ("ids", "documents", "metadatas", "embeddings"),
+    "update": ("ids", "documents", "metadatas", "embeddings"),
+    "get": ("ids", "where", "where_document", "limit", "offset", "include"),
+    "query": ("query_embeddings", "n_results", "where", "where_document", "include"),
+    "delete": ("ids", "where", "where_document"),
+    "count": (),
+    "modify": ("metadata",),
+}
+
+class RecallDaemon:
+    """
+    Owns the warm embedder and Chroma client and answers socket requests.
+    client / embed_model can be injected (tests); otherwise they are created here once.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, chroma_path=CHROMA_DB_PATH,
+                 client=None, embed_model=None):
+        self.socket_path = socket_path
+        self.chroma_path = chroma_path
+        self.client = client or local_chroma_client(chroma_path)
+        self.embed_model = embed_model or load_embed_model(use_pool=pool_enabled())
+        self._collections = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0}
+        self.started = time.time()
+        self.server = None
+        self._thread = None
+        self._searcher = None
+
+    def searcher(self):
+        """AggregatorSearcher over the daemon's client and model, kept between searches."""
+        from scripts.aggregator_search import AggregatorSearcher
+        with self._lock:
+            if self._searcher is None:
+                self._searcher = AggregatorSearcher(client=self.client, emb_model=self.embed_model,
+                                                    chroma_path=self.chroma_path)
+            return self._searcher
+
+    def collection(self, name):
+        with self._lock:
+            coll = self._collections.get(name)
+            if coll is None:
+                coll = self._collections[name] = self.client.get_or_create_collection(name=name)
+            return coll
+
+    # ------------------------------------------------------------- ops
+
+    def handle(self, request):
+        """Runs one request dict and returns its result (raises on bad requests)."""
+        op = request.get("op")
+        self.stats["requests"] += 1
+        if op == "ping":
+            info = {"pid": os.getpid(), "chroma_path": self.chroma_path,
+                    "uptime": time.time() - self.started, **self.stats}
+            if self._searcher is not None and self._searcher.cache is not None:
+                info["query_cache"] = self._searcher.cache.stats()
+            return info
+        if op == "embed":
+            texts = list(request.get("texts") or [])
+            if request.get("query"):
+                return [self.embed_model.embed_query(t) for t in texts]
+            return self.embed_model.embed_documents(texts)
+        if op == "search":
+            results = self.searcher().search(
+                request["query"], top_n=request.get("top_n", 3), mode=request.get("mode", "embedding"),
+                collections=request.get("collections")
+            )
+            return {"results": list(results), "skipped": results.skipped}
+        if op == "delete_collection":
+            with self._lock:
+                self._collections.pop(request["name"], None)
+                if self._searcher is not None:
+                    self._searcher.forget(request["name"])
+            self.client.delete_collection(request["name"])
+            lexical = get_lexical_index(self.chroma_path)
+            if lexical is not None:
+                lexical.clear_collection(request["name"])
+            self._bump_generation(request["name"])
+            return True
+        if op == "shutdown":
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return True
+        if op == "metadata":
+            return self.collection(request["collection"]).metadata
+        if op not in COLLECTION_KWARGS:
+            raise ValueError(f"Unknown op: {op!r}")
+
+        coll = self.collection(request["collection"])
+        kwargs = {k: request[k] for k in COLLECTION_KWARGS[op] if request.get(k) is not None}
+        if op in ("add", "upsert") and "embeddings" not in kwargs and kwargs.get("documents"):
+            kwargs["embeddings"] = self.embed_model.embed_documents(kwargs["documents"])
+        if op == "query" and "query_embeddings" not in kwargs:
+            kwargs["query_embeddings"] = [self.embed_model.embed_query(t) for t in request.get("query_texts") or []]
+        result = getattr(coll, op)(**kwargs)
+        if op in WRITE_OPS:
+            self._bump_generation(request["collection"], self._mirror_lexical(op, coll, kwargs))
+        return dict(result) if isinstance(result, dict) else result
+
+    def _mirror_lexical(self, op, coll, kwargs):
+        """
+        Applies a write op to the lexical index. Returns the index, or None if there is none
+        or the write cannot be mirrored exactly (deletes by filter, documents left out of an
+        add), which leaves it to the searcher's next sync_collection().
+        """
+        lexical = get_lexical_index(self.chroma_path)
+        if lexical is None:
+            return None
+        ids = kwargs.get("ids")
+        if op == "delete":
+            if not ids or "where" in kwargs or "where_document" in kwargs:
+                return None
+            lexical.remove(coll.name, ids)
+        elif op == "update":
+            if "documents" in kwargs:
+                stored = coll.get(ids=ids, include=["documents"])
+                lexical.add(coll.name, zip(stored["ids"], stored["documents"]))
+        elif "documents" in kwargs:
+            lexical.add(coll.name, zip(ids, kwargs["documents"]))
+        else:
+            return None
+        return lexical
+
+    def _bump_generation(self, collection_name, lexical=None):
+        _bump_generation(self.chroma_path, collection_name, lexical)
+
+    # ------------------------------------------------------------- lifecycle
+
+    def start(self):
+        """Binds the socket and serves on a background thread. Returns self."""
+        if os.path.exists(self.socket_path):
+            try:
+                RecallClient(self.socket_path, timeout=CONNECT_TIMEOUT).call("ping")
+            except RecallDaemonError:
+                os.unlink(self.socket_path)  # stale socket from a crashed daemon
+            else:
+                raise RecallDaemonError(f"A recall daemon is already serving {self.socket_path}")
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        reply = {"ok": True, "result": daemon.handle(json.loads(line))}
+                    except Exception as e:
+                        daemon.stats["errors"] += 1
+                        logger.error(f"Recall daemon request failed: {e}")
+                        reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                    self.wfile.write((json.dumps(reply, default=_to_json) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        self._thread = threading.Thread(target=self.server.serve_forever, name="recall-daemon", daemon=True)
+        self._thread.start()
+        logger.info(f"Recall daemon serving {self.chroma_path} on {self.socket_path}")
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def run_forever(self):
+        self.start()
+        print(f"🚀 Recall daemon ready on {self.socket_path} (Chroma: {self.chroma_path})")
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+##############################################################################
+# Clients
+##############################################################################
+
+class RecallClient:
+    """
+    Persistent socket connections to the daemon, one per calling thread, so concurrent
+    callers (the aggregator's fan-out, the indexing daemon) are served in parallel.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conns = set()
+        self._lock = threading.Lock()
+        self.chroma_path = None
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(min(self.timeout, CONNECT_TIMEOUT))
+                sock.connect(self.socket_path)
+                sock.settimeout(self.timeout)
+            except OSError:
+                sock.close()
+                raise
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+            with self._lock:
+                self._conns.add(conn)
+        return conn
+
+    def _drop(self, conn):
+        self._local.conn = None
+        with self._lock:
+            self._conns.discard(conn)
+        _close_connection(conn)
+
+    def close(self):
+        """Closes every thread's connection."""
+        with self._lock:
+            conns, self._conns = self._conns, set()
+            self._local = threading.local()
+        for conn in conns:
+            _close_connection(conn)
+
+    def _unavailable(self, message, cause=None):
+        _forget_daemon(self)
+        error = RecallDaemonUnavailable(message)
+        error.__cause__ = cause
+        return error
+
+    def call(self, op, **kwargs):
+        payload = (json.dumps({"op": op, **kwargs}, default=_to_json) + "\n").encode("utf-8")
+        conn = None
+        try:
+            conn = self._connection()
+            conn[0].sendall(payload)
+            line = conn[1].readline()
+        except OSError as e:
+            if conn is not None:
+                self._drop(conn)
+            raise self._unavailable(f"Recall daemon unreachable at {self.socket_path}: {e}", e)
+        if not line:
+            self._drop(conn)
+            raise self._unavailable(f"Recall daemon at {self.socket_path} closed the connection")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise RecallDaemonError(reply.get("error", "unknown error"))
+        return reply["result"]
+
+    def serves(self, chroma_path):
+        """True if the daemon's Chroma store is `chroma_path`."""
+        if self.chroma_path is None:
+            self.chroma_path = self.call("ping")["chroma_path"]
+        return _same_path(self.chroma_path, chroma_path)
+
+class RemoteEmbeddings:
+    """embed_documents / embed_query through the daemon; loads the model locally if it goes away."""
+
+    def __init__(self, client):
+        self.client = client
+        self._local = None
+
+    def _fallback(self, e):
+        if self._local is None:
+            logger.warning(f"{e}; embedding in-process instead")
+            self._local = _local_embed_model()
+        return self._local
+
+    def embed_documents(self, texts):
+        if self._local is None:
+            try:
+                return self.client.call("embed", texts=list(texts))
+            except RecallDaemonError as e:
+                return self._fallback(e).embed_documents(texts)
+        return self._local.embed_documents(texts)
+
+    def embed_query(self, text):
+        if self._local is None:
+            try:
+                return self.client.call("embed", texts=[text], query=True)[0]
+            except RecallDaemonError as e:
+                return self._fallback(e).embed_query(text)
+        return self._local.embed_query(text)
+
+class RemoteCollection:
+    """
+    The Chroma collection methods the recall scripts use, executed in the daemon.
+    If the daemon becomes unreachable, this and later calls run on an in-process
+    collection over the same store (embedded with the in-process model, as the daemon would).
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._local = None
+
+    def _call(self, op, **kwargs):
+        if self._local is None:
+            try:
+                return self.client.call(op, collection=self.name, **kwargs)
+            except RecallDaemonUnavailable as e:
+                logger.warning(f"{e}; using an in-process Chroma client for {self.name!r}")
+                self._local = _local_chroma_client(self.client.chroma_path).get_or_create_collection(name=self.name)
+        return self._local_call(op, {k: v for k, v in kwargs.items() if v is not None})
+
+    def _local_call(self, op, kwargs):
+        if op == "metadata":
+            return self._local.metadata
+        if op in ("add", "upsert") and "embeddings" not in kwargs and kwargs.get("documents"):
+            kwargs["embeddings"] = _local_embed_model().embed_documents(kwargs["documents"])
+        if op == "query" and "query_embeddings" not in kwargs:
+            model = _local_embed_model()
+            kwargs["query_embeddings"] = [model.embed_query(t) for t in kwargs.pop("query_texts", None) or []]
+        result = getattr(self._local, op)(**kwargs)
+        if op in WRITE_OPS:
+            _bump_generation(self.client.chroma_path, self.name)
+        return result
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        return self._call("add", ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        return self._call("upsert", ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        return self._call("update", ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def get(self, ids=None, where=None, where_document=None, limit=None, offset=None, include=None):
+        return self._call("get", ids=ids, where=where, where_document=where_document,
+                          limit=limit, offset=offset, include=include)
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None,
+              where_document=None, include=None):
+        return self._call("query", query_embeddings=query_embeddings, query_texts=query_texts,
+                          n_results=n_results, where=where, where_document=where_document, include=include)
+
+    def delete(self, ids=None, where=None, where_document=None):
+        return self._call("delete", ids=ids, where=where, where_document=where_document)
+
+    def count(self):
+        return self._call("count")
+
+    @property
+    def metadata(self):
+        return self._call("metadata")
+
+    def modify(self, metadata=None):
+        return self._call("modify", metadata=metadata)
+
+class RemoteClient:
+    """Stands in for chromadb.PersistentClient when the daemon is up."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_or_create_collection(self, name, **kwargs):
+        return RemoteCollection(self.client, name)
+
+    get_collection = get_or_create_collection
+
+    def delete_collection(self, name):
+        try:
+            return self.client.call("delete_collection", name=name)
+        except RecallDaemonUnavailable as e:
+            logger.warning(f"{e}; deleting {name!r} in-process")
+        _local_chroma_client(self.client.chroma_path).delete_collection(name)
+        _bump_generation(self.client.chroma_path, name)
+        return True
+
+def _close_connection(conn):
+    sock, reader = conn
+    reader.close()
+    sock.close()
+
+_daemon = None
+_daemon_failed_at = 0.0
+_daemon_lock = threading.Lock()
+_local_models = {}
+_local_clients = {}
+
+def _forget_daemon(client):
+    """Drops `client` as the process-wide daemon after it became unreachable."""
+    global _daemon, _daemon_failed_at
+    with _daemon_lock:
+        if _daemon is client:
+            _daemon = None
+        _daemon_failed_at = time.time()
+    client.close()
+
+def daemon_client(socket_path=None):
+    """
+    The process-wide RecallClient, or None if the daemon is disabled, has no socket
+    or does not answer a ping (re-checked after RECHECK_SECONDS).
+    """
+    global _daemon, _daemon_failed_at
+    if not daemon_enabled():
+        return None
+    socket_path = socket_path or DEFAULT_SOCKET_PATH
+    with _daemon_lock:
+        if _daemon is not None and _daemon.socket_path == socket_path:
+            return _daemon
+        if not os.path.exists(socket_path) or time.time() - _daemon_failed_at < RECHECK_SECONDS:
+            return None
+        client = RecallClient(socket_path)
+        try:
+            client.chroma_path = client.call("ping")["chroma_path"]
+        except RecallDaemonError as e:
+            logger.info(f"{e}; running in-process")
+            _daemon_failed_at = time.time()
+            return None
+        _daemon = client
+        return client
+
+def _local_embed_model(use_pool=False):
+    with _daemon_lock:
+        model = _local_models.get(use_pool)
+        if model is None:
+            model = _local_models[use_pool] = load_embed_model(use_pool=use_pool)
+        return model
+
+def _local_chroma_client(path):
+    """In-process PersistentClient for `path`, opened once per process."""
+    key = os.path.realpath(path)
+    with _daemon_lock:
+        client = _local_clients.get(key)
+        if client is None:
+            client = _local_clients[key] = local_chroma_client(path)
+        return client
+
+def get_embed_model(bulk=False):
+    """
+    The daemon's embedder if it is running, else the in-process model (loaded once per process).
+    bulk=True (indexers) embeds in-process through the EmbeddingPool when pool_enabled().
+    """
+    client = daemon_client()
+    if client is not None:
+        return RemoteEmbeddings(client)
+    return _local_embed_model(use_pool=bulk and pool_enabled())
+
+def get_chroma_client(path=CHROMA_DB_PATH):
+    """A RemoteClient if the daemon serves `path`, else an in-process PersistentClient."""
+    client = daemon_client()
+    if client is not None:
+        try:
+            if client.serves(path):
+                return RemoteClient(client)
+        except RecallDaemonError as e:
+            logger.info(f"{e}; running in-process")
+    return local_chroma_client(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident embedder + Chroma client for the recall scripts.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unix socket path.")
+    parser.add_argument("--chroma-path", default=CHROMA_DB_PATH, help="Chroma store to serve.")
+    parser.add_argument("--ping", action="store_true", help="Check a running daemon and exit.")
+    parser.add_argument("--stop", action="store_true", help="Stop a running daemon and exit.")
+    args = parser.parse_args()
+
+    if args.ping or args.stop:
+        try:
+            client = RecallClient(args.socket, timeout=CONNECT_TIMEOUT)
+            info = client.call("ping")
+            if args.stop:
+                client.call("shutdown")
+                print(f"🛑 Stopped recall daemon (pid {info['pid']})")
+            else:
+                print(f"✅ Recall daemon pid {info['pid']} serving {info['chroma_path']}, "
+                      f"up {info['uptime']:.0f}s, {info['requests']} request(s), {info['errors']} error(s)")
+                if info.get("query_cache"):
+                    print(f"📦 {describe_stats(info['query_cache'])}")
+        except RecallDaemonError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    else:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+        RecallDaemon(args.socket, chroma_path=args.chroma_path).run_forever()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+reindex_scheduler.py
+
+Single coalescing scheduler behind the file watchers (scripts/indexing_daemon.py).
+
+The old handlers spawned one sleeping thread per filesystem event, so a
+`git checkout` or a formatter run created thousands of threads. Instead:
+ - every event only updates a per-path entry {path: (due_time, action)} — repeated
+   events for the same path coalesce and push its due time back by the debounce window
+ - ONE scheduler thread dispatches due paths to a bounded worker pool; a path is
+   never processed by two workers at once
+ - renames are queued as one "move" entry keyed by the new path (submit_move), so the
+   old path's pending work is folded into it and move_fn can carry chunks over; while a
+   move runs its old path counts as busy too, so work queued for a path that reappeared
+   (a.py -> a.py~, then a new a.py) waits for the move to finish
+ - when the pending set crosses `storm_threshold`, the scheduler switches to "storm"
+   mode: it drops the per-path queue, waits for the burst to go quiet, and runs a
+   single reconcile pass (stat-compare of the whole tree against the manifest).
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_STORM_THRESHOLD = 256
+
+logger = logging.getLogger(__name__)
+
+class ReindexScheduler:
+    """
+    index_fn(path)       -> called for created/modified paths
+    delete_fn(path)      -> called for deleted paths
+    reconcile_fn()       -> optional; called once per storm instead of the per-path work
+    move_fn(src, dest)   -> optional; called for renamed paths (default: delete src, index dest)
+    """
+
+    def __init__(self, index_fn, delete_fn, reconcile_fn=None, move_fn=None,
+                 debounce_seconds=DEFAULT_DEBOUNCE_SECONDS,
+                 max_workers=DEFAULT_MAX_WORKERS,
+                 storm_threshold=DEFAULT_STORM_THRESHOLD,
+                 name="reindex"):
+        self.index_fn = index_fn
+        self.delete_fn = delete_fn
+        self.reconcile_fn = reconcile_fn
+        self.move_fn = move_fn
+        self.debounce_seconds = debounce_seconds
+        self.max_workers = max(1, int(max_workers))
+        self.storm_threshold = storm_threshold
+        self.name = name
+
+        self._pending = {}          # path -> (due_time, action)
+        self._move_sources = {}     # dest path -> src path, for pending "move" entries
+        self._running = set()       # paths currently being processed
+        self._cond = threading.Condition()
+        self._storm = False
+        self._reconciling = False
+        self._last_event = 0.0
+        self._stopped = False
+        self._thread = None
+        self._executor = None
+
+        self.stats = {"events": 0, "processed": 0, "coalesced": 0, "storms": 0, "errors": 0}
+
+    # ------------------------------------------------------------- lifecycle
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}-worker")
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None and wait:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    # ---------------------------------------------------------------- events
+
+    def submit(self, path, action="index"):
+        """
+        Queue `path` for `action` ("index" or "delete"); the latest action for a path wins,
+        except that "index" on a pending move keeps the move.
+        """
+        now = time.time()
+        with self._cond:
+            self.stats["events"] += 1
+            self._last_event = now
+            if self._storm:
+                self._cond.notify_all()
+                return
+            if path in self._pending:
+                self.stats["coalesced"] += 1
+                if self._pending[path][1] == "move":
+                    if action == "index":
+                        # move_fn reindexes the destination itself if its content changed
+                        action = "move"
+                    else:
+                        self._pending[self._move_sources.pop(path)] = (now + self.debounce_seconds, "delete")
+            self._pending[path] = (now + self.debounce_seconds, action)
+            self._check_storm()
+            self._cond.notify_all()
+
+    def submit_move(self, src, dest):
+        """Queue a rename of `src` (a file or directory) to `dest`; `src`'s own pending work is dropped."""
+        now = time.time()
+        with self._cond:
+            self.stats["events"] += 1
+            self._last_event = now
+            if self._storm:
+                self._cond.notify_all()
+                return
+            if src in self._pending:
+                self.stats["coalesced"] += 1
+                _, src_action = self._pending.pop(src)
+                if src_action == "move":
+                    # a -> src -> dest is one move a -> dest
+                    src = self._move_sources.pop(src)
+            if dest in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[dest] = (now + self.debounce_seconds, "move")
+            self._move_sources[dest] = src
+            self._check_storm()
+            self._cond.notify_all()
+
+    def _check_storm(self):
+        """Switches to storm mode once too many paths are pending (caller holds the lock)."""
+        if self.reconcile_fn is not None and len(self._pending) >= self.storm_threshold:
+            logger.info(f"[{self.name}] {len(self._pending)} pending paths: switching to storm reconcile")
+            print(f"\n🌪️ [{self.name}] {len(self._pending)} pending changes — switching to one batched reconcile pass")
+            self._storm = True
+            self.stats["storms"] += 1
+            self._pending.clear()
+            self._move_sources.clear()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def wait_idle(self, timeout=None):
+        """Blocks until nothing is pending, running or reconciling. Returns True if idle."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._pending or self._running or self._storm or self._reconciling:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining if remaining is not None else 0.5)
+        return True
+
+    # ------------------------------------------------------------- scheduler
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.time()
+
+                if self._reconciling:
+                    self._cond.wait()
+                    continue
+
+                if self._storm:
+                    quiet_for = now - self._last_event
+                    if quiet_for >= self.debounce_seconds and not self._running:
+                        self._storm = False
+                        self._reconciling = True
+                        self._executor.submit(self._reconcile)
+                        continue
+                    self._cond.wait(timeout=max(0.05, self.debounce_seconds - quiet_for))
+                    continue
+
+                due = []
+                next_due = None
+                free_slots = self.max_workers - len(self._running)
+                for path, (due_time, action) in self._pending.items():
+                    if path in self._running or (action == "move" and self._move_sources[path] in self._running):
+                        continue
+                    if due_time <= now:
+                        # past due but no free worker: _process notifies when one frees up
+                        if len(due) < free_slots:
+                            due.append((path, action))
+                    elif next_due is None or due_time < next_due:
+                        next_due = due_time
+
+                for path, action in due:
+                    del self._pending[path]
+                    self._running.add(path)
+                    src = self._move_sources.pop(path, None) if action == "move" else None
+                    if src is not None:
+                        self._running.add(src)
+                    self._executor.submit(self._process, path, action, src)
+
+                if not due:
+                    timeout = None if next_due is None else max(0.05, next_due - now)
+                    self._cond.wait(timeout=timeout)
+
+    def _process(self, path, action, src=None):
+        try:
+            if action == "move" and self.move_fn is not None:
+                self.move_fn(src, path)
+            elif action == "move":
+                self.delete_fn(src)
+                self.index_fn(path)
+            elif action == "delete":
+                self.delete_fn(path)
+            else:
+                self.index_fn(path)
+            with self._cond:
+                self.stats["processed"] += 1
+        except Exception as e:
+            with self._cond:
+                self.stats["errors"] += 1
+            logger.error(f"[{self.name}] {action} failed for {path}: {e}")
+            print(f"⚠ [{self.name}] {action} failed for {path}: {e}")
+        finally:
+            with self._cond:
+                self._running.discard(path)
+                self._running.discard(src)
+                self._cond.notify_all()
+
+    def _reconcile(self):
+        try:
+            self.reconcile_fn()
+        except Exception as e:
+            with self._cond:
+                self.stats["errors"] += 1
+            logger.error(f"[{self.name}] reconcile failed: {e}")
+            print(f"⚠ [{self.name}] reconcile failed: {e}")
+        finally:
+            with self._cond:
+                self._reconciling = False
+                self._cond.notify_all()
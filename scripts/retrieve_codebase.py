@@ -14,11 +14,18 @@ Examples:
    python3 retrieve_codebase.py "magic_substring" 10 --naive
 
 One script to unify both approaches, retiring the old query_codebase_chunks.py.
+The embedder and Chroma client come from scripts/recall_daemon.py: the running daemon's
+warm ones if available, else in-process ones (the model is loaded once per process).
 """
 
+import os
 import sys
-import chromadb
-from langchain_huggingface import HuggingFaceEmbeddings
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.recall_daemon import get_chroma_client, get_embed_model
 
 CHROMA_DB_PATH = "/mnt/f/projects/ai-recall-system/chroma_db"
 COLLECTION_NAME = "project_codebase"  # Collection name in ChromaDB
@@ -37,7 +44,7 @@ def naive_substring_search(docs, query):
     return results
 
 def embedding_search(collection, query, n_results=3):
-    emb = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    emb = get_embed_model()
     query_embedding = emb.embed_query(query)
     results = collection.query(
         query_embeddings=[query_embedding],
@@ -76,7 +83,7 @@ def main():
         naive_mode = True
 
     # Connect to Chroma
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    client = get_chroma_client(CHROMA_DB_PATH)
     collection = client.get_or_create_collection(name=COLLECTION_NAME)
 
     if naive_mode:
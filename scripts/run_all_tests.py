@@ -11,9 +11,16 @@ A small script that:
 import os
 import subprocess
 import datetime
+import sys
 import xml.etree.ElementTree as ET
 import chromadb
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.index_manifest import bump_collection_generation
+
 def run_pytest_and_store_results():
     # 1) Ensure "results" dir for the xml, or store it in /logs/test_results
     results_dir = os.path.join("results")
@@ -94,6 +101,7 @@ def run_pytest_and_store_results():
             documents=[str(test_run_data)],  # store JSON as string
             metadatas=[test_run_data]        # partial duplication, or pick a subset
         )
+        bump_collection_generation("test_runs")
         print(f"Stored test run results in Chroma under doc_id={doc_id}")
     except Exception as e:
         print("Failed to store test results in Chroma:", e)
@@ -1,6 +1,14 @@
+import os
+import sys
 import chromadb
 import json
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.index_manifest import bump_collection_generation
+
 # Initialize ChromaDB
 chroma_client = chromadb.PersistentClient(path="/mnt/f/projects/ai-recall-system/chroma_db/")
 
@@ -50,5 +58,6 @@ for collection_name in test_data.keys():
     
     print(f"📌 Storing in {collection_name}: {json_document}")  # Verify correct format
     collection.add(ids=[test_data[collection_name]["id"]], documents=[json_document])
+    bump_collection_generation(collection_name)
 
 print("✅ Test data stored successfully in ChromaDB with proper JSON formatting!")
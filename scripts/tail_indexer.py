@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+tail_indexer.py
+
+Append-aware indexing for growing log files (agent_debug.log, blueprint_debug.log,
+LMStudio_DevLogs/*.txt), used by index_debug_logs.py.
+
+Re-reading, re-chunking and re-embedding a whole log for every appended line is
+O(file size) per write. Instead each file gets a checkpoint in the IndexManifest
+(tail_checkpoints table):
+ - chunks before the last one are "sealed" and never touched again
+ - the last chunk stays "open": the next pass re-reads the file from the open chunk's
+   first byte, so the open chunk grows with the appends and only it plus any new
+   chunks are embedded
+ - inode changes (rotation), a size below the checkpoint (truncation) or different
+   bytes at the head / just before the checkpoint (rewrite) trigger a full rebuild
+ - files are read line by line from the checkpoint and chunked in batches of
+   TAIL_BATCH_LINES, so a multi-hundred-MB log is never held in memory
+
+tail_signature() gives the stat manifest a cheap content signature for these files
+(size + head + last bytes) instead of hashing the whole log.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.indexing_utils import after_flush, embed_and_write, mark_collection_changed, remove_file_chunks
+from scripts.lexical_index import lexical_index_for
+from scripts.token_chunker import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, chunk_lines_by_tokens
+
+HEAD_BYTES = 4096           # bytes hashed at the head and before the checkpoint
+TAIL_BATCH_LINES = 5000     # lines chunked (and flushed) per step
+
+logger = logging.getLogger(__name__)
+
+def _hash_range(f, start, end):
+    f.seek(start)
+    return hashlib.md5(f.read(max(0, end - start))).hexdigest()
+
+def tail_signature(filepath):
+    """Cheap content signature for append-only files: size, first and last HEAD_BYTES."""
+    with open(filepath, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        head = _hash_range(f, 0, min(HEAD_BYTES, size))
+        tail = _hash_range(f, max(0, size - HEAD_BYTES), size)
+    return f"tail:{size}:{head}:{tail}"
+
+def _rebuild_reason(checkpoint, f):
+    """Why the checkpoint can no longer be extended, or None if the file only grew."""
+    st = os.fstat(f.fileno())
+    end = checkpoint["end_offset"]
+    if st.st_ino != checkpoint["inode"]:
+        return "rotated"
+    if st.st_size < end:
+        return "truncated"
+    if _hash_range(f, 0, min(HEAD_BYTES, end)) != checkpoint["head_hash"]:
+        return "rewritten"
+    if _hash_range(f, max(0, end - HEAD_BYTES), end) != checkpoint["end_hash"]:
+        return "rewritten"
+    return None
+
+def _iter_lines(f, offset):
+    """Yields (text, byte_start, byte_end) from `offset`; the last line may lack a newline."""
+    f.seek(offset)
+    pos = offset
+    for raw in f:
+        start = pos
+        pos += len(raw)
+        yield raw.rstrip(b"\r\n").decode("utf-8", errors="replace"), start, pos
+
+def index_file_tail(collection, filepath, embed_model, manifest, make_meta, hash_fn,
+                    writer=None, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS,
+                    batch_lines=TAIL_BATCH_LINES, counter=None):
+    """
+    Embeds only what was appended to `filepath` since its checkpoint.
+    make_meta(filepath, chunk_index, chunk_hash, start_line, end_line, token_count, mod_time) -> dict
+    hash_fn(text) -> chunk content hash (doc ids are "{filepath}::chunk_{idx}::hash_{hash}")
+    counter: token counter for chunk_lines_by_tokens (defaults to the model tokenizer)
+    Returns {"added": n, "removed": n, "rebuilt": reason or None, "bytes": bytes read}.
+    """
+    coll_name = collection.name
+    stats = {"added": 0, "removed": 0, "rebuilt": None, "bytes": 0}
+
+    with open(filepath, "rb") as f:
+        st = os.fstat(f.fileno())
+        checkpoint = manifest.tail_checkpoint(coll_name, filepath)
+        if checkpoint is not None:
+            stats["rebuilt"] = _rebuild_reason(checkpoint, f)
+            if stats["rebuilt"] is None and st.st_size == checkpoint["end_offset"]:
+                return stats
+        if checkpoint is None or stats["rebuilt"]:
+            # First tail pass (possibly over chunks from a whole-file index) or a rebuild
+            stats["removed"] = remove_file_chunks(collection, filepath, manifest)
+            checkpoint = None
+
+        offset = checkpoint["open_offset"] if checkpoint else 0
+        line_base = checkpoint["open_line"] if checkpoint else 0
+        chunk_index = checkpoint["open_chunk_index"] if checkpoint else 0
+        old_open_ids = set(json.loads(checkpoint["open_doc_ids"])) if checkpoint else set()
+        mod_time = st.st_mtime
+
+        buf_lines = []
+        buf_offsets = []
+        end_offset = offset
+        open_ids = []
+        seen_open_ids = set()   # old open chunk ids reproduced unchanged by this pass
+
+        def emit(windows):
+            """Turns token windows over buf_lines into stored chunks; returns their ids."""
+            nonlocal chunk_index
+            ids = []
+            to_add = []
+            for text, st_line, end_line, token_count in windows:
+                if not text.strip():
+                    continue
+                chunk_hash = hash_fn(text)
+                doc_id = f"{filepath}::chunk_{chunk_index}::hash_{chunk_hash}"
+                meta = make_meta(filepath, chunk_index, chunk_hash, line_base + st_line,
+                                 line_base + end_line, token_count, mod_time)
+                chunk_index += 1
+                ids.append((doc_id, chunk_hash))
+                if doc_id in old_open_ids:
+                    seen_open_ids.add(doc_id)  # the open chunk did not change
+                    continue
+                to_add.append((doc_id, text, meta))
+            if to_add:
+                if writer is not None:
+                    writer.add(to_add)
+                else:
+                    lexical = lexical_index_for(manifest)
+                    embed_and_write(collection, to_add, embed_model, lexical=lexical)
+                    mark_collection_changed(manifest, collection, lexical)
+                stats["added"] += len(to_add)
+            after_flush(writer if to_add else None, lambda: manifest.add_file_chunks(coll_name, filepath, ids))
+            return [doc_id for doc_id, _ in ids]
+
+        def drop_stale_open():
+            """Deletes old open chunks that the re-read did not reproduce."""
+            stale = [doc_id for doc_id in old_open_ids if doc_id not in seen_open_ids]
+            if stale:
+                collection.delete(ids=stale)
+                lexical = lexical_index_for(manifest)
+                if lexical is not None:
+                    lexical.remove(coll_name, stale)
+                mark_collection_changed(manifest, collection, lexical)
+                manifest.add_file_chunks(coll_name, filepath, [], remove_ids=stale)
+                stats["removed"] += len(stale)
+
+        for text, start, end in _iter_lines(f, offset):
+            buf_lines.append(text)
+            buf_offsets.append(start)
+            end_offset = end
+            if len(buf_lines) < batch_lines:
+                continue
+            windows = chunk_lines_by_tokens(buf_lines, 0, max_tokens=max_tokens,
+                                            overlap_tokens=overlap_tokens, counter=counter)
+            carry = windows[-1][1]
+            if carry == 0:
+                continue
+            emit([w for w in windows if w[1] < carry])
+            buf_lines = buf_lines[carry:]
+            buf_offsets = buf_offsets[carry:]
+            line_base += carry
+
+        open_line = 0
+        if buf_lines:
+            windows = chunk_lines_by_tokens(buf_lines, 0, max_tokens=max_tokens,
+                                            overlap_tokens=overlap_tokens, counter=counter)
+            open_line = windows[-1][1]
+            emit([w for w in windows if w[1] < open_line])
+            open_index = chunk_index
+            open_ids = emit([w for w in windows if w[1] >= open_line])
+        else:
+            open_index = chunk_index
+        drop_stale_open()
+
+        stats["bytes"] = end_offset - offset
+        # only advanced once the queued chunks are written; a lost batch is re-read next pass
+        new_checkpoint = {
+            "inode": st.st_ino,
+            "open_offset": buf_offsets[open_line] if buf_lines else end_offset,
+            "open_line": line_base + open_line,
+            "open_chunk_index": open_index,
+            "open_doc_ids": json.dumps(open_ids),
+            "end_offset": end_offset,
+            "head_hash": _hash_range(f, 0, min(HEAD_BYTES, end_offset)),
+            "end_hash": _hash_range(f, max(0, end_offset - HEAD_BYTES), end_offset),
+        }
+        after_flush(writer, lambda: manifest.set_tail_checkpoint(coll_name, filepath, new_checkpoint))
+
+    if stats["rebuilt"]:
+        logger.info(f"Rebuilt tail index for {filepath} ({stats['rebuilt']})")
+    return stats
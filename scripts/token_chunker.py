@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+token_chunker.py
+
+Token-budget chunking for the line-based indexers (index_codebase, index_debug_logs,
+index_project_structure).
+
+all-MiniLM-L6-v2 truncates its input at 256 word pieces ([CLS] and [SEP] included), so a
+300-line window only has its first ~20 lines reflected in the vector. Here chunks are
+measured with the model's own tokenizer instead:
+ - lines are packed until the next one would exceed max_tokens
+ - consecutive chunks share up to overlap_tokens worth of trailing lines
+ - a single line longer than the budget (minified JSON, long log lines) is split on
+   token boundaries
+ - every chunk reports its token count, stored as `token_count` metadata
+
+The HuggingFace tokenizer is loaded lazily through transformers (installed with
+sentence-transformers). If it cannot be loaded, or RECALL_TOKENIZER=regex is set,
+a regex approximation of word-piece counts is used.
+"""
+
+import os
+import re
+import sys
+import logging
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.append(PARENT_DIR)
+
+from scripts.embeddings import MODEL_NAME
+
+MODEL_MAX_TOKENS = 256      # all-MiniLM-L6-v2 max_seq_length
+SPECIAL_TOKENS = 2          # [CLS] + [SEP]
+DEFAULT_MAX_TOKENS = MODEL_MAX_TOKENS - SPECIAL_TOKENS
+DEFAULT_OVERLAP_TOKENS = 32
+
+logger = logging.getLogger(__name__)
+
+##############################################################################
+# Token counters
+##############################################################################
+
+# Letters runs, single digits and single punctuation marks: close to how BERT's
+# word-piece tokenizer splits code and logs (numbers and symbols become separate pieces).
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
+
+class RegexTokenCounter:
+    """Approximate word-piece counts without loading a tokenizer."""
+
+    name = "regex"
+
+    def count_many(self, texts):
+        return [len(_TOKEN_RE.findall(t)) for t in texts]
+
+    def spans(self, text):
+        return [(m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+
+class HFTokenCounter:
+    """Counts with the embedding model's own tokenizer (no special tokens)."""
+
+    def __init__(self, tokenizer, name):
+        self.tokenizer = tokenizer
+        self.name = name
+        self._fallback = RegexTokenCounter()
+
+    def count_many(self, texts):
+        if not texts:
+            return []
+        encoded = self.tokenizer(list(texts), add_special_tokens=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def spans(self, text):
+        if not getattr(self.tokenizer, "is_fast", False):
+            return self._fallback.spans(text)
+        encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return [tuple(span) for span in encoded["offset_mapping"]]
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+def get_token_counter(model_name=MODEL_NAME):
+    """Returns the process-wide token counter for `model_name` (HF tokenizer, else regex)."""
+    with _counters_lock:
+        counter = _counters.get(model_name)
+        if counter is not None:
+            return counter
+        counter = RegexTokenCounter()
+        if os.environ.get("RECALL_TOKENIZER", "").lower() != "regex":
+            try:
+                from transformers import AutoTokenizer
+                counter = HFTokenCounter(AutoTokenizer.from_pretrained(model_name), model_name)
+            except Exception as e:
+                logger.warning(f"Tokenizer for {model_name} unavailable ({e}); using regex token estimates")
+                print(f"⚠ Tokenizer for {model_name} unavailable ({e}); using regex token estimates")
+        _counters[model_name] = counter
+        return counter
+
+##############################################################################
+# Chunking
+##############################################################################
+
+def _split_long_line(line, line_idx, max_tokens, overlap_tokens, counter):
+    """Splits one over-budget line into token windows; all pieces keep its line number."""
+    spans = counter.spans(line)
+    step = max(1, max_tokens - overlap_tokens)
+    pieces = []
+    for s in range(0, len(spans), step):
+        window = spans[s:s + max_tokens]
+        pieces.append((line[window[0][0]:window[-1][1]], line_idx, line_idx, len(window)))
+        if s + max_tokens >= len(spans):
+            break
+    return pieces
+
+def chunk_lines_by_tokens(lines, start_idx=0, max_tokens=DEFAULT_MAX_TOKENS,
+                          overlap_tokens=DEFAULT_OVERLAP_TOKENS, counter=None, line_counts=None):
+    """
+    Packs `lines` into chunks of at most max_tokens tokens.
+    Returns a list of (chunk_text, start_line, end_line, token_count) with 0-based line
+    numbers offset by start_idx, like chunk_lines_with_range().
+    `line_counts` (tokens per line) can be passed when the caller already counted them.
+    """
+    if counter is None:
+        counter = get_token_counter()
+    if line_counts is None:
+        line_counts = counter.count_many(lines)
+
+    results = []
+    n = len(lines)
+    i = 0
+    while i < n:
+        if line_counts[i] > max_tokens:
+            results.extend(_split_long_line(lines[i], start_idx + i, max_tokens, overlap_tokens, counter))
+            i += 1
+            continue
+
+        j = i
+        total = 0
+        while j < n and line_counts[j] <= max_tokens and total + line_counts[j] <= max_tokens:
+            total += line_counts[j]
+            j += 1
+        results.append(("\n".join(lines[i:j]), start_idx + i, start_idx + j - 1, total))
+        if j >= n or line_counts[j] > max_tokens:
+            i = j
+            continue
+
+        # Step back over trailing lines worth at most overlap_tokens, always advancing
+        k = j
+        overlap = 0
+        while k - 1 > i and overlap + line_counts[k - 1] <= overlap_tokens:
+            overlap += line_counts[k - 1]
+            k -= 1
+        i = k
+    return results
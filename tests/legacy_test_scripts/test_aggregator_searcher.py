@@ -0,0 +1,155 @@
+"""
+test_aggregator_searcher.py
+
+Checks that AggregatorSearcher keeps its client, embedder and collection handles
+between searches, reads COLLECTIONS_TO_QUERY per call, and re-opens a handle that
+went stale, that slow or broken collections are skipped with partial results,
+that aggregator_search() reuses the process-wide searcher, and that hybrid mode
+fuses vector and BM25 rankings.
+"""
+
+import time
+
+import pytest
+
+import scripts.aggregator_search as aggscript
+
+class FakeCollection:
+    def __init__(self, name, docs):
+        self.name = name
+        self.docs = docs
+        self.stale = False
+        self.delay = 0.0
+
+    def query(self, query_embeddings, n_results):
+        if self.stale:
+            raise RuntimeError("collection does not exist")
+        time.sleep(self.delay)
+        ids = list(self.docs)[:n_results]
+        return {"ids": [ids], "documents": [[self.docs[i] for i in ids]],
+                "metadatas": [[{"file": f"{i}.py"} for i in ids]],
+                "distances": [[0.1 * (n + 1) for n in range(len(ids))]]}
+
+    def count(self):
+        return len(self.docs)
+
+    def get(self, ids=None, include=None, limit=None, offset=0):
+        ids = [i for i in self.docs if ids is None or i in ids][offset:][:limit]
+        return {"ids": ids, "documents": [self.docs[i] for i in ids], "metadatas": [{} for _ in ids]}
+
+class FakeClient:
+    def __init__(self, data):
+        self.data = data
+        self.opened = []
+
+    def get_or_create_collection(self, name):
+        self.opened.append(name)
+        return FakeCollection(name, self.data.get(name, {}))
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.queries = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return [1.0, 0.0]
+
+@pytest.fixture
+def searcher(tmp_path):
+    client = FakeClient({"coll_a": {"a1": "division error in a"}, "coll_b": {"b1": "nothing here"}})
+    return aggscript.AggregatorSearcher(client=client, emb_model=FakeEmbeddings(),
+                                        chroma_path=str(tmp_path / "missing"))
+
+def test_handles_are_opened_once(searcher, monkeypatch):
+    monkeypatch.setattr(aggscript, "COLLECTIONS_TO_QUERY", ["coll_a", "coll_b"])
+    for _ in range(3):
+        results = searcher.search("division error", top_n=2)
+    assert [r["doc_id"] for r in results] == ["a1", "b1"]
+    assert searcher.client.opened == ["coll_a", "coll_b"]
+    assert searcher.emb_model.queries == 3
+
+def test_collections_are_read_per_call(searcher, monkeypatch):
+    monkeypatch.setattr(aggscript, "COLLECTIONS_TO_QUERY", ["coll_a"])
+    assert {r["collection"] for r in searcher.search("division error", top_n=5)} == {"coll_a"}
+    monkeypatch.setattr(aggscript, "COLLECTIONS_TO_QUERY", ["coll_b"])
+    assert {r["collection"] for r in searcher.search("division error", top_n=5)} == {"coll_b"}
+
+def test_stale_handle_is_reopened(searcher):
+    searcher.search("division error", collections=["coll_a"])
+    searcher.collection("coll_a").stale = True
+    results = searcher.search("division error", collections=["coll_a"])
+    assert [r["doc_id"] for r in results] == ["a1"]
+    assert searcher.client.opened == ["coll_a", "coll_a"]
+
+def test_naive_mode_skips_the_embedder(searcher):
+    results = searcher.search("division error", top_n=5, mode="naive", collections=["coll_a", "coll_b"])
+    assert [r["doc_id"] for r in results] == ["a1"]
+    assert searcher.emb_model.queries == 0
+
+def test_aggregator_search_reuses_process_searcher(tmp_path, monkeypatch):
+    client = FakeClient({"coll_a": {"a1": "division error in a"}})
+    monkeypatch.setattr(aggscript, "daemon_client", lambda: None)
+    monkeypatch.setattr(aggscript, "CHROMA_PATH", str(tmp_path / "chroma"))
+    monkeypatch.setattr(aggscript, "local_chroma_client", lambda path: client)
+    monkeypatch.setattr(aggscript, "get_embed_model", FakeEmbeddings)
+    monkeypatch.setattr(aggscript, "_searchers", {})
+    aggscript.aggregator_search("division error", collections=["coll_a"])
+    aggscript.aggregator_search("division error", collections=["coll_a"])
+    assert client.opened == ["coll_a"]
+
+def test_slow_and_broken_collections_are_skipped(searcher):
+    searcher.collection_timeout = 0.2
+    searcher.collection("coll_a")
+    searcher.collection("coll_b").delay = 2.0
+    searcher.client.data["coll_c"] = {"c1": "division error in c"}
+    searcher.collection("coll_c").stale = True
+    searcher.client.get_or_create_collection = lambda name: (_ for _ in ()).throw(RuntimeError("gone"))
+    start = time.monotonic()
+    results = searcher.search("division error", top_n=5, collections=["coll_a", "coll_b", "coll_c"])
+    assert time.monotonic() - start < 1.5
+    assert [r["doc_id"] for r in results] == ["a1"]
+    assert results.partial
+    assert set(results.skipped) == {"coll_b", "coll_c"}
+    assert "timed out" in results.skipped["coll_b"] and "error" in results.skipped["coll_c"]
+    searcher.close()
+
+def test_global_deadline_bounds_the_search(searcher):
+    searcher.deadline = 0.2
+    searcher.max_workers = 1
+    searcher.collection("coll_a").delay = 2.0
+    start = time.monotonic()
+    results = searcher.search("division error", top_n=5, collections=["coll_a", "coll_b"])
+    assert time.monotonic() - start < 1.5
+    assert list(results) == []
+    assert set(results.skipped) == {"coll_a", "coll_b"}
+    assert "deadline" in results.skipped["coll_b"]
+    searcher.close()
+
+def test_reciprocal_rank_fusion_weights_both_rankings():
+    pytest.importorskip("numpy")
+    results = [
+        {"doc_id": "vector_only", "vector_distance": 0.1},
+        {"doc_id": "both", "vector_distance": 0.3, "bm25": -2.0},
+        {"doc_id": "keyword_only", "bm25": -5.0},
+        {"doc_id": "neither"},
+    ]
+    fused = aggscript.reciprocal_rank_fusion(list(results), {"vector": 1.0, "keyword": 1.0}, k=1)
+    assert [r["doc_id"] for r in fused] == ["both", "vector_only", "keyword_only", "neither"]
+    assert fused[-1]["fusion_score"] == 0.0
+    fused = aggscript.reciprocal_rank_fusion(list(results), {"vector": 1.0, "keyword": 0.0}, k=1)
+    assert [r["doc_id"] for r in fused][:2] == ["vector_only", "both"]
+
+def test_hybrid_mode_fuses_keyword_hits(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    chroma_path = tmp_path / "chroma_db"
+    chroma_path.mkdir()
+    client = FakeClient({"coll_a": {"v1": "unrelated neighbour", "v2": "another neighbour",
+                                    "k1": "ZeroDivisionError raised by divide", "k2": "divide helper"}})
+    searcher = aggscript.AggregatorSearcher(client=client, emb_model=FakeEmbeddings(), chroma_path=str(chroma_path))
+    top = searcher.search("ZeroDivisionError divide", top_n=1, mode="hybrid", collections=["coll_a"])
+    assert [r["doc_id"] for r in top] == ["k1"]
+    assert top[0]["vector_distance"] == pytest.approx(0.3) and top[0]["bm25"] < 0
+    monkeypatch.setitem(aggscript.FUSION_WEIGHTS, "hybrid", {"vector": 1.0, "keyword": 0.0})
+    top = searcher.search("ZeroDivisionError divide", top_n=1, mode="hybrid", collections=["coll_a"])
+    assert [r["doc_id"] for r in top] == ["v1"]
+    searcher.close()
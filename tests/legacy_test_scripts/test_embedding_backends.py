@@ -0,0 +1,51 @@
+"""
+test_embedding_backends.py
+
+Checks the pluggable embedding backends:
+ - RECALL_EMBED_BACKEND selection and validation
+ - parity_check() reports cosine agreement and flags drifting vectors
+ - non-torch backends get their own embedding cache namespace
+"""
+
+import pytest
+
+from scripts.embedding_backends import backend_name, load_backend, parity_check
+from scripts.embeddings import MODEL_NAME, cache_model_key, load_embed_model
+
+class FakeModel:
+    def __init__(self, drift=0.0):
+        self.drift = drift
+
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0 + self.drift * len(t)] for t in texts]
+
+def test_backend_name_defaults_to_torch(monkeypatch):
+    monkeypatch.delenv("RECALL_EMBED_BACKEND", raising=False)
+    assert backend_name() == "torch"
+    monkeypatch.setenv("RECALL_EMBED_BACKEND", "ONNX-int8")
+    assert backend_name() == "onnx-int8"
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv("RECALL_EMBED_BACKEND", "tensorrt")
+    with pytest.raises(ValueError):
+        backend_name()
+    with pytest.raises(ValueError):
+        load_backend("tensorrt")
+
+def test_parity_check_identical_models_pass():
+    result = parity_check(FakeModel(), FakeModel(), ["a", "bb", "ccc"])
+    assert result["passed"] and result["n"] == 3
+    assert result["min"] == pytest.approx(1.0)
+
+def test_parity_check_reports_worst_text():
+    result = parity_check(FakeModel(drift=0.5), FakeModel(), ["a", "a much longer chunk"])
+    assert not result["passed"]
+    assert result["worst_text"] == "a much longer chunk"
+    assert result["min"] < result["mean"] < 1.0
+
+def test_cache_namespace_per_backend(monkeypatch, tmp_path):
+    assert cache_model_key(MODEL_NAME, "torch") == MODEL_NAME
+    assert cache_model_key(MODEL_NAME, "onnx-int8") == f"{MODEL_NAME}#onnx-int8"
+    monkeypatch.setenv("RECALL_EMBED_BACKEND", "onnx")
+    model = load_embed_model(use_cache=True, cache_path=str(tmp_path / "cache.db"))
+    assert model.model_name == f"{MODEL_NAME}#onnx"
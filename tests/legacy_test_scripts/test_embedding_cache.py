@@ -0,0 +1,80 @@
+"""
+test_embedding_cache.py
+
+Checks the persistent embedding cache:
+ - misses go to the model once, hits never do (and never load it)
+ - keys are content-addressed on normalized text and scoped by model name
+ - LRU eviction keeps the cache under max_entries
+"""
+
+import pytest
+
+from scripts.embedding_cache import CachedEmbeddings, EmbeddingCache, text_key
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 0.5, -1.0] for t in texts]
+
+@pytest.fixture
+def cache(tmp_path):
+    c = EmbeddingCache(str(tmp_path / "embedding_cache.sqlite3"), max_entries=100)
+    yield c
+    c.close()
+
+def make_cached(cache, model, model_name="minilm"):
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return model
+
+    return CachedEmbeddings(model_name, loader=loader, cache=cache), loads
+
+def test_misses_embedded_once_and_hits_skip_model(cache):
+    model = CountingModel()
+    emb, loads = make_cached(cache, model)
+
+    first = emb.embed_documents(["alpha", "beta", "alpha"])
+    assert model.calls == [["alpha", "beta"]]  # duplicate text embedded once
+    assert first[0] == first[2] == [5.0, 0.5, -1.0]
+
+    second = emb.embed_documents(["beta", "alpha"])
+    assert model.calls == [["alpha", "beta"]]
+    assert second == [first[1], first[0]]
+    assert emb.stats()["hits"] == 2
+
+def test_fully_cached_run_never_loads_model(cache):
+    warm, _ = make_cached(cache, CountingModel())
+    warm.embed_documents(["def f():\n    return 1"])
+
+    cold_model = CountingModel()
+    cold, loads = make_cached(cache, cold_model)
+    # CRLF / surrounding whitespace normalize to the same key
+    cold.embed_documents(["def f():\r\n    return 1  \n"])
+    assert loads == []
+    assert cold_model.calls == []
+
+def test_keys_are_scoped_by_model(cache):
+    model_a = CountingModel()
+    model_b = CountingModel()
+    emb_a, _ = make_cached(cache, model_a, "model-a")
+    emb_b, _ = make_cached(cache, model_b, "model-b")
+    emb_a.embed_query("same text")
+    emb_b.embed_query("same text")
+    assert model_a.calls == [["same text"]]
+    assert model_b.calls == [["same text"]]
+
+def test_lru_eviction(cache):
+    cache.max_entries = 3
+    cache.put_many("m", [(text_key("a"), [1.0]), (text_key("b"), [2.0])])
+    cache.put_many("m", [(text_key("c"), [3.0])])
+    cache.get_many("m", [text_key("a")])  # refresh "a"
+    cache.put_many("m", [(text_key("d"), [4.0])])
+    assert cache.evict() == 1
+    remaining = cache.get_many("m", [text_key(t) for t in "abcd"])
+    assert text_key("b") not in remaining
+    assert len(remaining) == 3
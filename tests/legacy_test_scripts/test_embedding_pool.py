@@ -0,0 +1,94 @@
+"""
+test_embedding_pool.py
+
+Checks the multi-process embedding pool:
+ - the batch autotuner climbs to the best-throughput size and settles there
+ - vectors come back in input order, whether embedded in-process or across workers
+ - small calls are split evenly across the workers
+ - the pool is opt-in (RECALL_EMBED_POOL)
+ - a broken pool is dropped and rebuilt, its batches embedded in-process, and an
+   in-process failure fails the call instead of hanging it
+"""
+
+import os
+import multiprocessing
+
+import pytest
+
+from scripts.embedding_pool import BatchAutotuner, EmbeddingPool, default_workers, pool_enabled
+
+class FakeModel:
+    def embed_documents(self, texts):
+        return [[float(len(t)), float(os.getpid())] for t in texts]
+
+def fake_loader(model_name):
+    return FakeModel()
+
+def dying_worker_loader(model_name):
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return FakeModel()
+
+def dying_everywhere_loader(model_name):
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    raise RuntimeError("no model here either")
+
+def throughput_at(size):
+    """Synthetic texts/sec curve peaking at batch size 128."""
+    return 1000.0 - abs(size - 128) * 3
+
+def test_autotuner_settles_on_best_size():
+    tuner = BatchAutotuner(initial=32, min_size=8, max_size=512, samples_per_step=2)
+    for _ in range(50):
+        size = tuner.size
+        tuner.observe(size, size, size / throughput_at(size))
+        if tuner.converged:
+            break
+    assert tuner.converged and tuner.size == 128
+    assert [s for s, _ in tuner.history][:4] == [32, 64, 128, 256]
+
+def test_autotuner_ignores_other_sizes():
+    tuner = BatchAutotuner(initial=32, samples_per_step=1)
+    tuner.observe(16, 16, 0.1)
+    assert tuner.history == [] and tuner.size == 32
+
+def test_in_process_pool_keeps_order():
+    with EmbeddingPool(workers=0, loader=fake_loader, autotuner=BatchAutotuner(initial=8, min_size=8)) as pool:
+        texts = ["x" * i for i in range(1, 30)]
+        vectors = pool.embed_documents(texts)
+        assert [v[0] for v in vectors] == [float(i) for i in range(1, 30)]
+        assert pool.embed_query("abc")[0] == 3.0
+        assert pool.submit([]).result() == []
+        assert pool.stats()["texts"] == 30
+
+def test_worker_pool_spreads_batches():
+    with EmbeddingPool(workers=2, threads_per_worker=1, loader=fake_loader,
+                       autotuner=BatchAutotuner(initial=64, min_size=8)) as pool:
+        texts = ["y" * (i % 50 + 1) for i in range(40)]
+        vectors = pool.embed_documents(texts)
+        assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+        pids = {v[1] for v in vectors}
+        assert os.getpid() not in pids   # embedded in the workers
+        assert pool.autotuner.size == 64 and pool.stats()["texts"] == 40
+
+def test_pool_is_opt_in(monkeypatch):
+    monkeypatch.delenv("RECALL_EMBED_POOL", raising=False)
+    monkeypatch.delenv("RECALL_EMBED_WORKERS", raising=False)
+    assert not pool_enabled() and default_workers() == 0
+    monkeypatch.setenv("RECALL_EMBED_POOL", "1")
+    assert pool_enabled() and default_workers() >= 1
+
+def test_broken_pool_is_rebuilt_then_abandoned():
+    with EmbeddingPool(workers=1, threads_per_worker=1, loader=dying_worker_loader) as pool:
+        for restarts in range(1, 4):
+            vectors = pool.embed_documents(["ab", "c"])
+            assert vectors == [[2.0, float(os.getpid())], [1.0, float(os.getpid())]]
+            assert pool._executor is None and pool.restarts == restarts
+        assert pool.workers == 0
+        assert pool.embed_query("abc")[0] == 3.0
+
+def test_failed_fallback_fails_the_call():
+    with EmbeddingPool(workers=1, threads_per_worker=1, loader=dying_everywhere_loader) as pool:
+        with pytest.raises(RuntimeError, match="no model here either"):
+            pool.submit(["ab"]).result(timeout=60)
@@ -0,0 +1,96 @@
+"""
+test_git_index.py
+
+Checks the git-driven incremental mode:
+ - changed, renamed, deleted and untracked paths since a revision
+ - the plan keeps only in-scope files whose stat differs from the manifest
+ - the indexed commit round-trips through collection metadata
+ - hooks are installed once and appended to existing hooks
+"""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from scripts.git_index import (
+    GitError, get_indexed_commit, git_changed_paths, git_head, install_hooks, plan_git_index, set_indexed_commit
+)
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "test@example.com")
+    git(tmp_path, "config", "user.name", "test")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "keep.py").write_text("print('keep')\n")
+    (tmp_path / "src" / "edit.py").write_text("print('edit')\n")
+    (tmp_path / "src" / "move.py").write_text("def moved():\n    return 'a fairly long body so git detects the rename'\n")
+    (tmp_path / "src" / "drop.py").write_text("print('drop')\n")
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "base")
+    return tmp_path
+
+def test_changed_paths_since_revision(repo):
+    base = git_head(str(repo))
+    (repo / "src" / "edit.py").write_text("print('edited')\n")
+    git(repo, "mv", "src/move.py", "src/renamed.py")
+    git(repo, "rm", "-q", "src/drop.py")
+    git(repo, "commit", "-q", "-m", "change")
+    (repo / "src" / "new.py").write_text("print('untracked')\n")
+
+    changes = git_changed_paths(str(repo), base)
+    src = repo / "src"
+    assert sorted(changes["modified"]) == [str(src / "edit.py"), str(src / "new.py")]
+    assert changes["deleted"] == [str(src / "drop.py")]
+    assert changes["renamed"] == [(str(src / "move.py"), str(src / "renamed.py"))]
+
+    with pytest.raises(GitError):
+        git_changed_paths(str(repo), "no-such-rev")
+
+def test_plan_filters_scope_and_stat(repo):
+    src = repo / "src"
+    st = os.stat(src / "keep.py")
+    known = {str(src / "keep.py"): (st.st_size, st.st_mtime_ns, "h"), str(src / "drop.py"): (1, 1, "h")}
+    changes = {
+        "modified": [str(src / "keep.py"), str(src / "edit.py"), str(repo / "README.md")],
+        "deleted": [str(src / "drop.py")],
+        "renamed": [(str(src / "move.py"), str(src / "edit.py")), (str(src / "gone.py"), str(repo / "notes.md"))],
+    }
+    plan = plan_git_index(changes, [str(src)], set(), lambda fp: fp.endswith(".py"), known)
+    assert plan["unchanged"] == 1
+    assert [fp for fp, _, _ in plan["candidates"]] == [str(src / "edit.py")]
+    assert plan["renamed"] == [(str(src / "move.py"), str(src / "edit.py"))]
+    assert plan["deleted"] == [str(src / "drop.py"), str(src / "gone.py")]
+
+class MetaCollection:
+    def __init__(self):
+        self.metadata = {"hnsw:space": "l2", "owner": "indexer"}
+
+    def modify(self, metadata=None):
+        assert not any(k.startswith("hnsw:") for k in metadata)
+        self.metadata = dict(metadata)
+
+def test_indexed_commit_in_collection_metadata():
+    coll = MetaCollection()
+    assert get_indexed_commit(coll) is None
+    set_indexed_commit(coll, "abc123")
+    assert get_indexed_commit(coll) == "abc123"
+    assert coll.metadata["owner"] == "indexer"
+
+def test_install_hooks_appends_once(repo):
+    hooks = repo / ".git" / "hooks"
+    hooks.mkdir(exist_ok=True)
+    (hooks / "post-commit").write_text("#!/bin/sh\necho existing\n")
+    written = install_hooks(str(repo), "python index_codebase.py --git-hook")
+    assert sorted(os.path.basename(p) for p in written) == ["post-checkout", "post-commit", "post-merge"]
+    content = (hooks / "post-commit").read_text()
+    assert content.startswith("#!/bin/sh\necho existing\n") and "--git-hook" in content
+    assert os.access(hooks / "post-merge", os.X_OK)
+    assert install_hooks(str(repo), "python index_codebase.py --git-hook") == []
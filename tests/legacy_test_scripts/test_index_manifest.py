@@ -0,0 +1,81 @@
+"""
+test_index_manifest.py
+
+Checks the filepath -> chunk-id manifest used by the line-chunking indexers,
+and that remove_file_chunks() resolves chunks through it (or through a
+metadata-filtered get for untracked files) instead of a full collection scan.
+"""
+
+import pytest
+
+from scripts.index_manifest import IndexManifest, get_manifest
+from scripts.indexing_utils import existing_file_chunk_ids, record_file_chunks, remove_file_chunks
+
+class FilterOnlyCollection:
+    """Minimal collection that refuses unfiltered get() calls."""
+
+    def __init__(self, name="project_codebase_test"):
+        self.name = name
+        self.docs = {}
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        assert where is not None or ids is not None, "full-collection scan attempted"
+        if ids is not None:
+            matched = [i for i in ids if i in self.docs]
+        else:
+            key, value = next(iter(where.items()))
+            matched = [i for i, meta in self.docs.items() if meta.get(key) == value]
+        return {"ids": matched}
+
+    def delete(self, ids):
+        for i in ids:
+            self.docs.pop(i, None)
+
+@pytest.fixture
+def manifest(tmp_path):
+    m = IndexManifest(str(tmp_path / "index_manifest.sqlite3"))
+    yield m
+    m.close()
+
+def test_set_and_forget_file(manifest):
+    manifest.set_file_chunks("coll", "/a.py", [("/a.py::chunk_0::hash_x", "x"), ("/a.py::chunk_1::hash_y", "y")])
+    manifest.set_file_chunks("coll", "/b.py", [("/b.py::chunk_0::hash_z", "z")])
+    assert manifest.is_tracked("coll", "/a.py")
+    assert sorted(manifest.chunk_ids("coll", "/a.py")) == ["/a.py::chunk_0::hash_x", "/a.py::chunk_1::hash_y"]
+    assert manifest.chunk_hashes("coll", "/b.py") == {"/b.py::chunk_0::hash_z": "z"}
+    assert manifest.stats("coll") == {"files": 2, "chunks": 3}
+
+    manifest.forget_file("coll", "/a.py")
+    assert not manifest.is_tracked("coll", "/a.py")
+    assert manifest.chunk_ids("coll", "/a.py") == []
+    assert manifest.stats("coll") == {"files": 1, "chunks": 1}
+
+def test_collections_are_isolated(manifest):
+    manifest.set_file_chunks("one", "/a.py", [("id1", "h")])
+    assert manifest.chunk_ids("two", "/a.py") == []
+    manifest.clear_collection("one")
+    assert manifest.tracked_files("one") == []
+
+def test_get_manifest_is_shared(tmp_path):
+    assert get_manifest(str(tmp_path)) is get_manifest(str(tmp_path))
+
+def test_remove_file_chunks_uses_manifest(manifest):
+    coll = FilterOnlyCollection()
+    chunks = [("/a.py::chunk_0::hash_x", "text", {"filepath": "/a.py", "hash": "x"})]
+    coll.docs["/a.py::chunk_0::hash_x"] = {"filepath": "/a.py"}
+    coll.docs["/b.py::chunk_0::hash_y"] = {"filepath": "/b.py"}
+    record_file_chunks(coll, "/a.py", chunks, manifest)
+
+    assert remove_file_chunks(coll, "/a.py", manifest) == 1
+    assert list(coll.docs) == ["/b.py::chunk_0::hash_y"]
+    assert not manifest.is_tracked(coll.name, "/a.py")
+
+def test_untracked_file_falls_back_to_metadata_filter(manifest):
+    coll = FilterOnlyCollection()
+    coll.docs["/old.py::chunk_0::hash_x"] = {"filepath": "/old.py"}
+    coll.docs["/old.py::chunk_1::hash_y"] = {"filepath": "/old.py"}
+    assert sorted(existing_file_chunk_ids(coll, "/old.py", manifest)) == [
+        "/old.py::chunk_0::hash_x", "/old.py::chunk_1::hash_y"
+    ]
+    assert remove_file_chunks(coll, "/old.py", manifest) == 2
+    assert coll.docs == {}
@@ -0,0 +1,124 @@
+"""
+test_index_priority.py
+
+Checks priority ordering for cold indexing (debug log references, recency, retrieval
+hits), the progress/readiness signal kept in the manifest, and that apply_index_plan()
+flushes the priority files before the rest.
+"""
+
+import json
+import os
+import time
+
+import pytest
+
+from scripts.index_manifest import IndexManifest
+from scripts.index_priority import (
+    ProgressTracker, debug_log_references, file_ready, prioritize, readiness
+)
+from scripts.indexing_utils import apply_index_plan, record_file_state
+
+class ChunkCollection:
+    def __init__(self, name="project_codebase_test"):
+        self.name = name
+        self.filepaths = {}
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        matched = [i for i, fp in self.filepaths.items() if fp == where["filepath"]]
+        return {"ids": matched[:limit]}
+
+@pytest.fixture
+def manifest(tmp_path):
+    m = IndexManifest(str(tmp_path / "index_manifest.sqlite3"))
+    yield m
+    m.close()
+
+def test_prioritize_orders_debug_refs_then_recent_then_retrieved():
+    now = time.time()
+    old = int((now - 30 * 24 * 3600) * 1e9)
+    candidates = [
+        ("/p/scripts/a.py", 1, old),
+        ("/p/scripts/retrieved.py", 1, old),
+        ("/p/scripts/recent.py", 1, int(now * 1e9)),
+        ("/p/code_base/test_scripts/broken.py", 1, old),
+    ]
+    ordered, n_priority = prioritize(candidates, references={"broken.py"},
+                                     retrievals={"/p/scripts/retrieved.py": 3}, now=now)
+    assert [c[0] for c in ordered] == [
+        "/p/code_base/test_scripts/broken.py", "/p/scripts/recent.py",
+        "/p/scripts/retrieved.py", "/p/scripts/a.py",
+    ]
+    assert n_priority == 3
+
+def test_debug_log_references_only_unresolved(tmp_path):
+    log_file = tmp_path / "DEBUG_LOGS_TEST.JSON"
+    log_file.write_text(json.dumps([
+        {"id": "t1", "stack_trace": "File 'math_utils.py', line 4", "resolved": False},
+        {"id": "t2", "stack_trace": "File 'done.py', line 1", "resolved": True},
+    ]))
+    assert debug_log_references(str(log_file)) == {"math_utils.py"}
+    assert debug_log_references(str(tmp_path / "missing.json")) == set()
+
+def test_progress_tracker_and_readiness(manifest):
+    assert readiness(manifest, "c")["fraction"] == 1.0
+    plan = {"unchanged": 6, "candidates": [("a", 1, 1), ("b", 1, 1), ("c", 1, 1), ("d", 1, 1)],
+            "priority_count": 1}
+    tracker = ProgressTracker(manifest, "c", plan)
+    tracker("a")
+    status = readiness(manifest, "c")
+    assert status["running"] and status["priority_ready"]
+    assert status["fraction"] == pytest.approx(0.7)
+    tracker.finish()
+    status = readiness(manifest, "c")
+    assert not status["running"] and status["fraction"] == 1.0
+
+def test_record_retrievals_counts_hits(manifest):
+    manifest.record_retrievals("c", ["/p/a.py", "/p/b.py"])
+    manifest.record_retrievals("c", ["/p/a.py"])
+    assert manifest.retrieval_counts("c") == {"/p/a.py": 2, "/p/b.py": 1}
+
+def test_file_ready_needs_current_signature_and_chunks(tmp_path, manifest):
+    path = tmp_path / "broken.py"
+    path.write_text("x = 1\n")
+    collection = ChunkCollection()
+    assert not file_ready(str(path), collection, manifest)
+    record_file_state(manifest, collection.name, str(path))
+    assert not file_ready(str(path), collection, manifest)
+    collection.filepaths["id1"] = str(path)
+    assert file_ready(str(path), collection, manifest)
+    path.write_text("x = 2  # edited\n")
+    assert not file_ready(str(path), collection, manifest)
+
+def test_apply_index_plan_flushes_after_priority_files(tmp_path, manifest, monkeypatch):
+    import scripts.indexing_utils as indexing_utils
+    events = []
+
+    class Writer:
+        total_batches = 0
+        def __init__(self, *args, **kwargs):
+            pass
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            events.append("close")
+        def flush(self):
+            events.append("flush")
+        def chunks_per_second(self):
+            return 0.0
+
+    monkeypatch.setattr(indexing_utils, "ChunkBatchWriter", Writer)
+    paths = []
+    for name in ("first.py", "second.py", "third.py"):
+        path = tmp_path / name
+        path.write_text(f"# {name}\n")
+        st = os.stat(path)
+        paths.append((str(path), st.st_size, st.st_mtime_ns))
+
+    def reindex(filepath, collection, embed_model, writer=None, manifest=None):
+        events.append(os.path.basename(filepath))
+        return 1
+
+    plan = {"unchanged": 0, "candidates": paths, "deleted": []}
+    apply_index_plan(plan, ChunkCollection(), None, manifest, {}, reindex,
+                     progress=lambda fp: events.append("progress"), priority_count=2, movable=False)
+    assert events == ["first.py", "progress", "second.py", "flush", "progress", "third.py", "progress", "close"]
@@ -0,0 +1,73 @@
+"""
+test_index_throttle.py
+
+Checks the LLM-in-flight markers, that IndexThrottle pauses for LLM requests and
+system load (and reports the time), and that a writer with a throttle gates its batches.
+"""
+
+import json
+import os
+import time
+
+from scripts.index_throttle import IndexThrottle, llm_request, llm_requests_inflight
+from scripts.indexing_utils import ChunkBatchWriter
+
+def test_llm_request_marker_lifecycle(tmp_path):
+    inflight_dir = str(tmp_path / "inflight")
+    assert llm_requests_inflight(inflight_dir) == 0
+    with llm_request(timeout=60, inflight_dir=inflight_dir):
+        assert llm_requests_inflight(inflight_dir) == 1
+    assert llm_requests_inflight(inflight_dir) == 0
+
+def test_stale_and_dead_markers_are_ignored(tmp_path):
+    inflight_dir = tmp_path / "inflight"
+    inflight_dir.mkdir()
+    (inflight_dir / "expired.json").write_text(json.dumps({"pid": os.getpid(), "started": time.time() - 1000, "timeout": 10}))
+    (inflight_dir / "garbage.json").write_text("{not json")
+    assert llm_requests_inflight(str(inflight_dir)) == 0
+    assert os.listdir(inflight_dir) == []
+
+def test_throttle_waits_for_llm_then_load():
+    llm = [True, True, False, False, False]
+    load = [0.9, 0.1]
+    throttle = IndexThrottle(max_cpu=0.5, cpu_budget=1.0, check_interval=0.01,
+                             inflight_fn=lambda: llm.pop(0) if llm else False,
+                             load_fn=lambda: load.pop(0) if load else 0.0)
+    waited = throttle.wait()
+    assert waited > 0
+    assert throttle.stats["pauses"] == 1
+    assert throttle.stats["llm_seconds"] > 0 and throttle.stats["load_seconds"] > 0
+    assert throttle.throttled_seconds() == waited
+    assert "throttled" in throttle.describe()
+    assert throttle.wait() == 0.0
+
+def test_load_pause_is_capped():
+    throttle = IndexThrottle(max_cpu=0.5, check_interval=0.01, max_load_pause=0.05,
+                             inflight_fn=lambda: 0, load_fn=lambda: 1.0)
+    start = time.monotonic()
+    throttle.wait()
+    assert time.monotonic() - start < 1.0
+    assert throttle.stats["load_seconds"] >= 0.05
+
+def test_cpu_budget_sleeps_off_work():
+    throttle = IndexThrottle(max_cpu=None, cpu_budget=0.5, inflight_fn=lambda: 0)
+    with throttle.work():
+        time.sleep(0.05)
+    assert throttle.stats["budget_seconds"] >= 0.05
+
+def test_writer_gates_each_batch_on_the_throttle(monkeypatch):
+    import scripts.indexing_utils as indexing_utils
+    events = []
+
+    class RecordingThrottle(IndexThrottle):
+        def wait(self):
+            events.append("wait")
+            return 0.0
+
+    monkeypatch.setattr(indexing_utils, "embed_and_write",
+                        lambda collection, batch, embed_model, **kwargs: events.append(len(batch)) or len(batch))
+    throttle = RecordingThrottle(max_cpu=None, inflight_fn=lambda: 0)
+    with ChunkBatchWriter(None, None, batch_size=2, throttle=throttle) as writer:
+        writer.add([{"id": i} for i in range(3)])
+    assert events == ["wait", 2, "wait", 1]
+    assert writer.total_written == 3
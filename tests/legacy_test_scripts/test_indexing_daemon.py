@@ -0,0 +1,182 @@
+"""
+test_indexing_daemon.py
+
+Checks the shared indexing daemon without starting an observer:
+ - overlapping / nested roots are watched once
+ - one collection per source from a single client, one shared embed model
+ - events are routed to every source that owns the path, and only those
+ - a directory rename moves every tracked file's chunks without re-embedding
+ - reindexing after a rename goes through the throttle like any other reindex
+ - a rename whose old path exists again (backup-style save) keeps that file's chunks
+"""
+
+import os
+import contextlib
+
+from scripts.indexing_daemon import IndexingDaemon, IndexSource, collapse_roots
+from scripts.indexing_utils import record_file_state
+
+class FakeClient:
+    def __init__(self):
+        self.created = []
+
+    def get_or_create_collection(self, name):
+        self.created.append(name)
+        return type("Coll", (), {"name": name})()
+
+def make_source(name, root, ext, calls):
+    def reindex(filepath, collection, embed_model, writer=None, manifest=None):
+        calls.append((name, collection.name, filepath))
+        return 1
+
+    return IndexSource(
+        name=name,
+        collection_name=f"{name}_coll",
+        root_dirs=[root],
+        skip_dirs={"archive"},
+        accept=lambda fp: fp.endswith(ext),
+        reindex_fn=reindex
+    )
+
+def test_collapse_roots():
+    assert collapse_roots(["/p/logs", "/p/logs/", "/p", "/q"]) == ["/p", "/q"]
+    assert collapse_roots(["/p/logs", "/p/logs"]) == ["/p/logs"]
+
+def test_routes_events_to_owning_sources(tmp_path):
+    calls = []
+    logs = str(tmp_path / "logs")
+    code = str(tmp_path / "code")
+    sources = [
+        make_source("debug_logs", logs, ".json", calls),
+        make_source("project_structure", logs, ".json", calls),
+        make_source("codebase", code, ".py", calls),
+    ]
+    client = FakeClient()
+    embed_model = object()
+    daemon = IndexingDaemon(sources, chroma_path=str(tmp_path / "chroma"), client=client, embed_model=embed_model)
+
+    assert client.created == ["debug_logs_coll", "project_structure_coll", "codebase_coll"]
+    assert sorted(daemon.watched_roots()) == sorted([code, logs])
+
+    daemon.index_path(os.path.join(logs, "project_structure.json"))
+    daemon.index_path(os.path.join(code, "agent.py"))
+    daemon.index_path(os.path.join(code, "archive", "old.py"))
+    daemon.index_path(os.path.join(logs, "notes.md"))
+
+    assert calls == [
+        ("debug_logs", "debug_logs_coll", os.path.join(logs, "project_structure.json")),
+        ("project_structure", "project_structure_coll", os.path.join(logs, "project_structure.json")),
+        ("codebase", "codebase_coll", os.path.join(code, "agent.py")),
+    ]
+
+class StoreCollection:
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+
+    def get(self, ids=None, where=None, include=None):
+        if ids is None:
+            ids = [i for i, (_, _, meta) in self.docs.items() if meta.get("filepath") == where["filepath"]]
+        ids = [i for i in ids if i in self.docs]
+        return {
+            "ids": ids,
+            "documents": [self.docs[i][0] for i in ids],
+            "embeddings": [self.docs[i][1] for i in ids],
+            "metadatas": [dict(self.docs[i][2]) for i in ids],
+        }
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        for doc_id, doc, emb, meta in zip(ids, documents, embeddings, metadatas):
+            self.docs[doc_id] = (doc, emb, meta)
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+
+class StoreClient:
+    def get_or_create_collection(self, name):
+        return StoreCollection(name)
+
+def test_directory_move_carries_chunks(tmp_path):
+    code = tmp_path / "code"
+    (code / "pkg").mkdir(parents=True)
+    reindexed = []
+
+    def reindex(filepath, collection, embed_model, writer=None, manifest=None):
+        reindexed.append(filepath)
+        doc_id = f"{filepath}::chunk_0::hash_h"
+        collection.upsert([doc_id], ["text"], [[1.0, 2.0]], [{"filepath": filepath, "rel_path": filepath, "hash": "h"}])
+        manifest = manifest or daemon.manifest
+        manifest.set_file_chunks(collection.name, filepath, [(doc_id, "h")])
+        record_file_state(manifest, collection.name, filepath)
+        return 1
+
+    source = IndexSource("codebase", "codebase_coll", [str(code)], set(), lambda fp: fp.endswith(".py"), reindex)
+    daemon = IndexingDaemon([source], chroma_path=str(tmp_path / "chroma"), client=StoreClient(), embed_model=object())
+    collection = daemon.collections["codebase"]
+    for name in ("a.py", "b.py"):
+        (code / "pkg" / name).write_text(f"# {name}\n")
+        reindex(str(code / "pkg" / name), collection, None, manifest=daemon.manifest)
+    reindexed.clear()
+
+    os.rename(code / "pkg", code / "lib")
+    (code / "lib" / "c.py").write_text("# new file\n")
+    daemon.move_path(str(code / "pkg"), str(code / "lib"))
+
+    assert reindexed == [str(code / "lib" / "c.py")]
+    assert sorted(collection.docs) == sorted(f"{code / 'lib' / n}::chunk_0::hash_h" for n in ("a.py", "b.py", "c.py"))
+    assert daemon.manifest.tracked_files_under(collection.name, str(code / "pkg")) == []
+
+class CountingThrottle:
+    def __init__(self):
+        self.active = False
+        self.units = 0
+
+    @contextlib.contextmanager
+    def work(self):
+        self.active = True
+        self.units += 1
+        try:
+            yield
+        finally:
+            self.active = False
+
+def test_reindex_after_rename_is_throttled(tmp_path):
+    code = tmp_path / "code"
+    code.mkdir()
+    throttle = CountingThrottle()
+    seen = []
+
+    def reindex(filepath, collection, embed_model, writer=None, manifest=None):
+        seen.append((filepath, throttle.active))
+        return 1
+
+    source = IndexSource("codebase", "codebase_coll", [str(code)], set(), lambda fp: fp.endswith(".py"), reindex)
+    daemon = IndexingDaemon([source], chroma_path=str(tmp_path / "chroma"), client=StoreClient(),
+                            embed_model=object(), throttle=throttle)
+    (code / "new.py").write_text("# renamed\n")
+    daemon.move_path(str(code / "old.txt"), str(code / "new.py"))
+    assert seen == [(str(code / "new.py"), True)]
+    assert throttle.units == 1
+
+def test_backup_style_save_keeps_the_chunks(tmp_path):
+    code = tmp_path / "code"
+    code.mkdir()
+    path = str(code / "a.py")
+
+    def reindex(filepath, collection, embed_model, writer=None, manifest=None):
+        doc_id = f"{filepath}::chunk_0::hash_h"
+        collection.upsert([doc_id], ["text"], [[1.0, 2.0]], [{"filepath": filepath, "rel_path": filepath, "hash": "h"}])
+        daemon.manifest.set_file_chunks(collection.name, filepath, [(doc_id, "h")])
+        return 1
+
+    source = IndexSource("codebase", "codebase_coll", [str(code)], set(), lambda fp: fp.endswith(".py"), reindex)
+    daemon = IndexingDaemon([source], chroma_path=str(tmp_path / "chroma"), client=StoreClient(), embed_model=object())
+    collection = daemon.collections["codebase"]
+    (code / "a.py").write_text("x = 1\n")
+    reindex(path, collection, None)
+    os.rename(path, path + "~")
+    (code / "a.py").write_text("x = 2\n")
+    daemon.move_path(path, path + "~")
+    assert list(collection.docs) == [f"{path}::chunk_0::hash_h"]
+    assert daemon.manifest.is_tracked(collection.name, path)
@@ -0,0 +1,278 @@
+"""
+test_indexing_utils.py
+
+Checks the batched embed/write path shared by the line-chunking indexers:
+ - one embed_documents() call and one add() per batch
+ - ChunkBatchWriter batches across files and flushes the remainder on exit
+ - manifest rows for queued chunks are only written once the chunks are
+ - sync_file_chunks only embeds chunks whose hash is new
+ - plan_incremental_index skips files whose stat signature is unchanged
+ - renamed files keep their vectors (move_file_chunks, reconcile move pairing)
+"""
+
+import os
+import pytest
+
+from scripts.index_manifest import IndexManifest
+from scripts.indexing_utils import (
+    ChunkBatchWriter, apply_index_plan, embed_and_write, iter_batches, move_file_chunks,
+    plan_incremental_index, record_file_state, sync_file_chunks
+)
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 0.0, 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.0, 1.0]
+
+class FakeCollection:
+    def __init__(self, name="fake_collection"):
+        self.name = name
+        self.writes = []
+        self.docs = {}
+
+    def get(self, ids=None, where=None, include=None):
+        if ids is not None:
+            matched = [i for i in ids if i in self.docs]
+        else:
+            key, value = next(iter(where.items()))
+            matched = [i for i, (_, _, meta) in self.docs.items() if meta.get(key) == value]
+        return {
+            "ids": matched,
+            "documents": [self.docs[i][0] for i in matched],
+            "embeddings": [self.docs[i][1] for i in matched],
+            "metadatas": [dict(self.docs[i][2]) for i in matched],
+        }
+
+    def delete(self, ids):
+        self.writes.append(("delete", list(ids)))
+        for i in ids:
+            self.docs.pop(i, None)
+
+    def update(self, ids, metadatas):
+        self.writes.append(("update", list(ids)))
+        for i, meta in zip(ids, metadatas):
+            doc, emb, _ = self.docs[i]
+            self.docs[i] = (doc, emb, meta)
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self.writes.append(("add", list(ids)))
+        for doc_id, doc, emb, meta in zip(ids, documents, embeddings, metadatas):
+            assert doc_id not in self.docs, f"duplicate id {doc_id}"
+            self.docs[doc_id] = (doc, emb, meta)
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        self.writes.append(("upsert", list(ids)))
+        for doc_id, doc, emb, meta in zip(ids, documents, embeddings, metadatas):
+            self.docs[doc_id] = (doc, emb, meta)
+
+def make_chunks(prefix, n):
+    return [(f"{prefix}::chunk_{i}", f"text {prefix} {i}", {"chunk_index": i}) for i in range(n)]
+
+def test_iter_batches_sizes():
+    assert [len(b) for b in iter_batches(list(range(10)), 4)] == [4, 4, 2]
+    assert list(iter_batches([], 4)) == []
+
+def test_embed_and_write_one_call_per_batch():
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+    written = embed_and_write(coll, make_chunks("a.py", 5), emb, batch_size=2)
+    assert written == 5
+    assert [len(c) for c in emb.calls] == [2, 2, 1]
+    assert [w[0] for w in coll.writes] == ["add", "add", "add"]
+    assert len(coll.docs) == 5
+
+def test_embed_and_write_upsert():
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+    embed_and_write(coll, make_chunks("a.py", 3), emb, batch_size=10, upsert=True)
+    assert coll.writes == [("upsert", ["a.py::chunk_0", "a.py::chunk_1", "a.py::chunk_2"])]
+
+def test_batch_writer_batches_across_files():
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+    with ChunkBatchWriter(coll, emb, batch_size=4) as writer:
+        writer.add(make_chunks("a.py", 3))
+        writer.add(make_chunks("b.py", 3))
+        # 6 queued => one full batch already written, 2 still pending
+        assert writer.total_written == 4
+    assert writer.total_written == 6
+    assert writer.total_batches == 2
+    assert [len(c) for c in emb.calls] == [4, 2]
+    assert len(coll.docs) == 6
+
+def test_batch_writer_discards_on_error():
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+    with pytest.raises(RuntimeError):
+        with ChunkBatchWriter(coll, emb, batch_size=10) as writer:
+            writer.add(make_chunks("a.py", 3))
+            raise RuntimeError("boom")
+    assert coll.docs == {}
+
+def test_queued_files_are_recorded_only_after_their_flush(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    coll = FakeCollection()
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    with pytest.raises(RuntimeError):
+        with ChunkBatchWriter(coll, FakeEmbeddings(), batch_size=10) as writer:
+            sync_file_chunks(coll, str(path), file_chunks(str(path), ["f1"]), None, manifest=manifest, writer=writer)
+            record_file_state(manifest, coll.name, str(path), writer=writer)
+            raise RuntimeError("a later file failed")
+    assert coll.docs == {}
+    assert not manifest.is_tracked(coll.name, str(path))
+    assert manifest.file_state(coll.name, str(path)) is None
+
+    with ChunkBatchWriter(coll, FakeEmbeddings(), batch_size=10) as writer:
+        sync_file_chunks(coll, str(path), file_chunks(str(path), ["f1"]), None, manifest=manifest, writer=writer)
+        record_file_state(manifest, coll.name, str(path), writer=writer)
+        assert manifest.file_state(coll.name, str(path)) is None
+    assert manifest.chunk_ids(coll.name, str(path)) == list(coll.docs)
+    assert manifest.file_state(coll.name, str(path)) is not None
+    manifest.close()
+
+def file_chunks(filepath, texts):
+    chunks = []
+    for idx, text in enumerate(texts):
+        h = f"h_{text}"
+        meta = {"filepath": filepath, "chunk_index": idx, "hash": h}
+        chunks.append((f"{filepath}::chunk_{idx}::hash_{h}", text, meta))
+    return chunks
+
+def test_sync_file_chunks_only_embeds_changed(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+
+    first = sync_file_chunks(coll, "/a.py", file_chunks("/a.py", ["f1", "f2", "f3"]), emb, manifest=manifest)
+    assert first == {"added": 3, "kept": 0, "removed": 0}
+
+    # Edit the middle chunk and insert a new one at the top: "f1" and "f3" shift index but keep their vectors
+    emb.calls.clear()
+    second = sync_file_chunks(coll, "/a.py", file_chunks("/a.py", ["new", "f1", "f2b", "f3"]), emb, manifest=manifest)
+    assert second == {"added": 2, "kept": 2, "removed": 1}
+    assert emb.calls == [["new", "f2b"]]
+    assert sorted(doc for doc, _, _ in coll.docs.values()) == ["f1", "f2b", "f3", "new"]
+    # Kept chunks get their new position in metadata
+    positions = {doc: meta["chunk_index"] for doc, _, meta in coll.docs.values()}
+    assert positions == {"new": 0, "f1": 1, "f2b": 2, "f3": 3}
+    assert sorted(manifest.chunk_ids(coll.name, "/a.py")) == sorted(coll.docs)
+
+    # Touching the file with identical content embeds nothing
+    emb.calls.clear()
+    third = sync_file_chunks(coll, "/a.py", file_chunks("/a.py", ["new", "f1", "f2b", "f3"]), emb, manifest=manifest)
+    assert third == {"added": 0, "kept": 4, "removed": 0}
+    assert emb.calls == []
+    manifest.close()
+
+def test_sync_file_chunks_ignores_stale_manifest(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+    sync_file_chunks(coll, "/a.py", file_chunks("/a.py", ["f1"]), emb, manifest=manifest)
+
+    coll.docs.clear()  # collection wiped behind the manifest's back
+    stats = sync_file_chunks(coll, "/a.py", file_chunks("/a.py", ["f1"]), emb, manifest=manifest)
+    assert stats == {"added": 1, "kept": 0, "removed": 0}
+    assert len(coll.docs) == 1
+    manifest.close()
+
+def test_plan_incremental_index(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    root = tmp_path / "root"
+    (root / "pkg").mkdir(parents=True)
+    (root / "node_modules").mkdir()
+    for rel in ("a.py", "pkg/b.py", "pkg/notes.md", "node_modules/c.py"):
+        (root / rel).write_text(f"# {rel}\n")
+    accept = lambda fp: fp.endswith(".py")
+
+    first = plan_incremental_index([str(root)], {"node_modules"}, accept, manifest.file_states("coll"))
+    assert sorted(os.path.relpath(fp, root) for fp, _, _ in first["candidates"]) == ["a.py", os.path.join("pkg", "b.py")]
+    for fp, _, _ in first["candidates"]:
+        record_file_state(manifest, "coll", fp)
+
+    # No changes => everything skipped on stat alone
+    second = plan_incremental_index([str(root)], {"node_modules"}, accept, manifest.file_states("coll"))
+    assert second == {"candidates": [], "unchanged": 2, "deleted": []}
+
+    (root / "a.py").write_text("# changed content\n")
+    os.remove(root / "pkg" / "b.py")
+    third = plan_incremental_index([str(root)], {"node_modules"}, accept, manifest.file_states("coll"))
+    assert [fp for fp, _, _ in third["candidates"]] == [str(root / "a.py")]
+    assert third["deleted"] == [str(root / "pkg" / "b.py")]
+
+    # Tracked files outside the walked roots are never reported as deleted
+    other = plan_incremental_index([str(root / "pkg")], set(), accept, manifest.file_states("coll"))
+    assert other["deleted"] == [str(root / "pkg" / "b.py")]
+    manifest.close()
+
+def test_move_file_chunks_keeps_vectors(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+    old, new = str(tmp_path / "pkg" / "a.py"), str(tmp_path / "lib" / "a.py")
+    sync_file_chunks(coll, old, file_chunks(old, ["def f(): pass", "def g(): pass"]), emb, manifest=manifest)
+    manifest.set_file_state(coll.name, old, 10, 123, "abc")
+    vectors = sorted(v for _, v, _ in coll.docs.values())
+    emb.calls.clear()
+
+    assert move_file_chunks(coll, old, new, manifest) == 2
+    assert emb.calls == []
+    assert all(doc_id.startswith(new + "::") for doc_id in coll.docs)
+    assert all(meta["filepath"] == new for _, _, meta in coll.docs.values())
+    assert sorted(v for _, v, _ in coll.docs.values()) == vectors
+    assert sorted(manifest.chunk_ids(coll.name, new)) == sorted(coll.docs)
+    assert manifest.file_state(coll.name, new) == (10, 123, "abc")
+    assert not manifest.is_tracked(coll.name, old)
+    assert move_file_chunks(coll, old, new, manifest) == 0
+    manifest.close()
+
+def test_move_over_a_tracked_file_drops_its_chunks(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+    a, b = str(tmp_path / "a.py"), str(tmp_path / "b.py")
+    sync_file_chunks(coll, a, file_chunks(a, ["def f(): pass"]), emb, manifest=manifest)
+    sync_file_chunks(coll, b, file_chunks(b, ["x = 1", "y = 2", "z = 3"]), emb, manifest=manifest)
+
+    assert move_file_chunks(coll, a, b, manifest) == 1
+    assert sorted(coll.docs) == sorted(manifest.chunk_ids(coll.name, b))
+    assert [doc for doc, _, _ in coll.docs.values()] == ["def f(): pass"]
+    assert not manifest.is_tracked(coll.name, a)
+    manifest.close()
+
+def test_apply_index_plan_pairs_moves_by_hash(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    coll = FakeCollection()
+    emb = FakeEmbeddings()
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "a.py").write_text("def f(): pass\n")
+
+    def reindex(filepath, collection, embed_model, writer=None, manifest=None):
+        with open(filepath) as f:
+            text = f.read()
+        stats = sync_file_chunks(collection, filepath, file_chunks(filepath, [text]), embed_model, manifest=manifest)
+        record_file_state(manifest, collection.name, filepath)
+        return stats["added"]
+
+    accept = lambda fp: fp.endswith(".py")
+    plan = plan_incremental_index([str(root)], set(), accept, manifest.file_states(coll.name))
+    apply_index_plan(plan, coll, emb, manifest, manifest.file_states(coll.name), reindex)
+    emb.calls.clear()
+
+    os.rename(root / "a.py", root / "b.py")
+    known = manifest.file_states(coll.name)
+    plan = plan_incremental_index([str(root)], set(), accept, known)
+    summary = apply_index_plan(plan, coll, emb, manifest, known, reindex)
+    assert summary["moved"] == 1 and summary["deleted"] == 0 and summary["reindexed"] == 0
+    assert emb.calls == []
+    assert [meta["filepath"] for _, _, meta in coll.docs.values()] == [str(root / "b.py")]
+    assert list(manifest.file_states(coll.name)) == [str(root / "b.py")]
+    manifest.close()
@@ -0,0 +1,124 @@
+"""
+test_json_records.py
+
+Checks record-aware indexing of JSON logs:
+ - the streaming parser yields the same entries as json.load, even with tiny read blocks
+ - changing one entry of debug_logs_large.json re-embeds exactly one document
+ - inserting an entry neither re-embeds nor rewrites the metadata of the others
+ - project_structure.json is split per directory of its "structure" map
+ - malformed JSON falls back to line chunks
+"""
+
+import os
+import json
+import shutil
+
+import pytest
+
+import scripts.json_records as json_records
+import scripts.index_debug_logs as debug_idx
+import scripts.index_project_structure as structure_idx
+from scripts.index_manifest import IndexManifest
+
+MOCK_DIR = os.path.join(os.path.dirname(__file__), "..", "mock_data", "debug_logs")
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+class FakeCollection:
+    def __init__(self, name="debugging_logs_test"):
+        self.name = name
+        self.docs = {}
+        self.deleted = []
+        self.updated = []
+
+    def get(self, ids=None, where=None, include=None):
+        if ids is not None:
+            matched = [i for i in ids if i in self.docs]
+        else:
+            key, value = next(iter(where.items()))
+            matched = [i for i, (_, meta) in self.docs.items() if meta.get(key) == value]
+        return {"ids": matched, "metadatas": [dict(self.docs[i][1]) for i in matched]}
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+        for i in ids:
+            self.docs.pop(i, None)
+
+    def update(self, ids, metadatas):
+        self.updated.extend(ids)
+        for i, meta in zip(ids, metadatas):
+            self.docs[i] = (self.docs[i][0], meta)
+
+    def add(self, ids, documents, embeddings, metadatas):
+        for doc_id, doc, meta in zip(ids, documents, metadatas):
+            assert doc_id not in self.docs, f"duplicate id {doc_id}"
+            self.docs[doc_id] = (doc, meta)
+
+@pytest.fixture
+def manifest(tmp_path):
+    m = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    yield m
+    m.close()
+
+def test_streaming_parse_matches_json_load(monkeypatch):
+    path = os.path.join(MOCK_DIR, "debug_logs_large.json")
+    monkeypatch.setattr(json_records, "READ_BLOCK_SIZE", 7)
+    records = list(json_records.iter_json_records(path))
+    with open(path, encoding="utf-8") as f:
+        assert [value for _, value in records] == json.load(f)
+    assert [key for key, _ in records] == list(range(len(records)))
+
+def test_single_entry_change_reembeds_one_document(tmp_path, manifest):
+    path = tmp_path / "debug_logs.json"
+    shutil.copy(os.path.join(MOCK_DIR, "debug_logs_large.json"), path)
+    coll, emb = FakeCollection(), FakeEmbeddings()
+
+    first = debug_idx.reindex_single_file(str(path), coll, emb, manifest=manifest)
+    entries = json.loads(path.read_text())
+    assert first == len(coll.docs) == len(entries)
+    assert f"{path}::entry_{entries[3]['id']}" in coll.docs
+
+    entries[3]["resolved"] = not entries[3]["resolved"]
+    path.write_text(json.dumps(entries, indent=4))
+    emb.texts.clear()
+    assert debug_idx.reindex_single_file(str(path), coll, emb, manifest=manifest) == 1
+    assert len(emb.texts) == 1 and entries[3]["id"] in emb.texts[0]
+    assert coll.deleted == [f"{path}::entry_{entries[3]['id']}"]
+    assert coll.docs[coll.deleted[0]][1]["resolved"] == entries[3]["resolved"]
+    assert len(coll.docs) == len(entries)
+
+def test_entries_without_ids_survive_inserts(tmp_path, manifest):
+    path = tmp_path / "debugging_strategy_log.json"
+    entries = [{"error_type": f"Error{i}", "strategy": "retry"} for i in range(5)]
+    path.write_text(json.dumps(entries))
+    coll, emb = FakeCollection(), FakeEmbeddings()
+    debug_idx.reindex_single_file(str(path), coll, emb, manifest=manifest)
+
+    path.write_text(json.dumps([{"error_type": "NewError", "strategy": "skip"}] + entries))
+    emb.texts.clear()
+    assert debug_idx.reindex_single_file(str(path), coll, emb, manifest=manifest) == 1
+    assert "NewError" in emb.texts[0]
+    assert coll.updated == []
+
+def test_project_structure_split_per_directory(tmp_path):
+    path = tmp_path / "project_structure.json"
+    structure = {"scripts": {"files": ["a.py"]}, "logs": {"files": []}, "code_base": {"files": ["agent.py"]}}
+    path.write_text(json.dumps({"timestamp": "2025-02-12", "structure": structure}))
+    chunks = structure_idx.build_file_chunks(str(path))
+    assert [meta["entry_id"] for _, _, meta in chunks] == list(structure)
+    assert all(meta["structure_type"] == "project" for _, _, meta in chunks)
+    assert json.loads(chunks[2][1]) == {"code_base": structure["code_base"]}
+
+def test_corrupt_json_falls_back_to_line_chunks(tmp_path):
+    path = tmp_path / "debug_logs_corrupt.json"
+    shutil.copy(os.path.join(MOCK_DIR, "debug_logs_corrupt.json"), path)
+    with pytest.raises(json_records.JSONRecordError):
+        list(json_records.iter_json_records(str(path)))
+    chunks = debug_idx.build_file_chunks(str(path))
+    assert chunks and all("start_line" in meta and "entry_id" not in meta for _, _, meta in chunks)
@@ -0,0 +1,118 @@
+"""
+test_knowledgebase_bulk.py
+
+Checks the bulk knowledge-base indexer:
+ - chunk_markdown gives the same chunks as the old string-concatenation version
+ - one metadata query per run, embeddings from the shared model, bulk upserts
+ - a second run embeds nothing; changing one file only re-embeds that file
+ - agent READMEs (all named README.md) do not replace each other's chunks
+"""
+
+import os
+import re
+
+import pytest
+
+import scripts.index_knowledgebase as kb
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+class FakeCollection:
+    def __init__(self, name="knowledge_base_test"):
+        self.name = name
+        self.docs = {}
+        self.gets = 0
+        self.upserts = 0
+
+    def count(self):
+        return len(self.docs)
+
+    def get(self, ids=None, where=None, include=None):
+        self.gets += 1
+        names = set(where["filename"]["$in"])
+        matched = [i for i, (_, meta) in self.docs.items() if meta["filename"] in names]
+        return {"ids": matched, "metadatas": [dict(self.docs[i][1]) for i in matched]}
+
+    def delete(self, ids):
+        for i in ids:
+            self.docs.pop(i, None)
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        assert len(embeddings) == len(ids)
+        self.upserts += 1
+        for doc_id, doc, meta in zip(ids, documents, metadatas):
+            self.docs[doc_id] = (doc, meta)
+
+def old_chunk_markdown(text, chunk_size=500):
+    sections = re.split(r"\n#{1,6}\s+", text)
+    chunks = []
+    current_chunk = ""
+    for section in sections:
+        if not section.strip():
+            continue
+        for line in section.strip().split("\n"):
+            if len(current_chunk) + len(line) + 1 > chunk_size:
+                if current_chunk:
+                    chunks.append(current_chunk.strip())
+                current_chunk = line
+            else:
+                current_chunk += "\n" + line if current_chunk else line
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+@pytest.fixture
+def kb_tree(tmp_path, monkeypatch):
+    docs = tmp_path / "knowledge_base"
+    agents = tmp_path / "agent_knowledge_bases"
+    docs.mkdir()
+    for agent in ("engineer_knowledge", "reviewer_knowledge"):
+        (agents / agent).mkdir(parents=True)
+        (agents / agent / "README.md").write_text(f"# {agent}\n" + f"{agent} guidance line\n" * 40)
+    for i in range(6):
+        (docs / f"doc_{i}.md").write_text(f"# Doc {i}\n\n" + "".join(f"## Part {j}\n" + "text " * 30 + "\n" for j in range(4)))
+    monkeypatch.setattr(kb, "KNOWLEDGEBASE_DIRS", [str(docs) + "/", str(agents) + "/"])
+    monkeypatch.setattr(kb, "KNOWLEDGE_BASE_DIR", str(docs) + "/")
+    monkeypatch.setattr(kb, "AGENT_KNOWLEDGE_BASES_DIR", str(agents) + "/")
+    return docs, agents
+
+def test_chunk_markdown_matches_old_version():
+    knowledge_dir = os.path.join(os.path.dirname(__file__), "..", "..", "knowledge_base")
+    samples = ["", "# Title\n\n\nline\n\n## Sub\n" + "word " * 300, "a\n\n\nb\n" * 200]
+    samples += [open(os.path.join(knowledge_dir, f), encoding="utf-8").read()
+                for f in sorted(os.listdir(knowledge_dir)) if f.endswith(".md")]
+    for text in samples:
+        assert kb.chunk_markdown(text) == old_chunk_markdown(text)
+        assert kb.chunk_markdown(text, 80) == old_chunk_markdown(text, 80)
+
+def test_bulk_index_and_incremental_rerun(kb_tree):
+    docs, agents = kb_tree
+    coll, emb = FakeCollection(), FakeEmbeddings()
+    paths = kb.list_markdown_files()
+    assert len(paths) == 8 and all(kb.accept_file(p) for p in paths)
+
+    summary = kb.index_markdown_files(paths, coll, emb, batch_size=4, max_workers=4)
+    assert summary["indexed"] == 8 and summary["chunks"] == len(coll.docs)
+    assert coll.gets == 0            # empty collection: no lookup needed
+    assert coll.upserts == len(emb.calls) == -(-len(coll.docs) // 4)
+    readme_ids = [i for i in coll.docs if i.endswith("README.md_0")]
+    assert sorted(readme_ids) == ["engineer_knowledge_README.md_0", "reviewer_knowledge_README.md_0"]
+
+    emb.calls.clear()
+    summary = kb.index_markdown_files(paths, coll, emb, batch_size=4, max_workers=4)
+    assert (summary["skipped"], summary["indexed"], emb.calls, coll.gets) == (8, 0, [], 1)
+
+    (agents / "engineer_knowledge" / "README.md").write_text("# engineer_knowledge\nshort now\n")
+    before = len(coll.docs)
+    summary = kb.index_markdown_files(paths, coll, emb, batch_size=4, max_workers=4)
+    assert summary["indexed"] == 1 and coll.gets == 2
+    assert [t for call in emb.calls for t in call] == ["# engineer_knowledge\nshort now"]
+    assert len(coll.docs) == before - summary["removed"] + 1
+    assert any(i.startswith("reviewer_knowledge_README.md_") for i in coll.docs)
+    assert coll.docs["engineer_knowledge_README.md_0"][1]["source"] == "agent_engineer_knowledge"
@@ -0,0 +1,133 @@
+"""
+test_lexical_index.py
+
+Checks the trigram / BM25 lexical index (substring and keyword lookups, upserts and
+removals, catching up with a collection by count or by generation), that the indexing
+helpers keep it in sync, and that the aggregator's naive mode answers from it instead of
+scanning documents.
+"""
+
+import pytest
+
+import scripts.aggregator_search as aggscript
+from scripts.index_manifest import IndexManifest
+from scripts.indexing_utils import embed_and_write, remove_file_chunks
+from scripts.lexical_index import LexicalIndex, get_lexical_index, lexical_index_for
+
+class DocCollection:
+    def __init__(self, name="coll", docs=None):
+        self.name = name
+        self.docs = dict(docs or {})
+        self.gets = []
+
+    def count(self):
+        return len(self.docs)
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=0):
+        self.gets.append({"ids": ids, "include": include, "limit": limit, "offset": offset})
+        matched = [i for i in self.docs if ids is None or i in ids][offset:][:limit]
+        return {"ids": matched, "documents": [self.docs[i] for i in matched],
+                "metadatas": [{"file": f"{i}.py"} for i in matched]}
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self.docs.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+@pytest.fixture
+def index(tmp_path):
+    idx = LexicalIndex(str(tmp_path / "lexical_index.sqlite3"))
+    yield idx
+    idx.close()
+
+def test_substring_search_is_case_insensitive(index):
+    index.add("coll", [("d1", "ZeroDivisionError in math_utils"), ("d2", "all good"), ("d3", "x = a % b")])
+    index.add("other", [("o1", "zerodivisionerror elsewhere")])
+    assert index.substring_search("coll", "divisionerror") == ["d1"]
+    assert index.substring_search("coll", "% b") == ["d3"]
+    assert index.substring_search("coll", "Go") == ["d2"]
+    assert index.substring_search("coll", "missing") == []
+
+def test_keyword_search_ranks_by_bm25(index):
+    index.add("coll", [("d1", "import os"), ("d2", "retry the request, retry on timeout"),
+                       ("d3", "request handler")])
+    ranked = [doc_id for doc_id, _ in index.keyword_search("coll", "retry request")]
+    assert ranked[0] == "d2"
+    assert set(ranked) == {"d2", "d3"}
+
+def test_add_upserts_and_remove_forgets(index):
+    index.add("coll", [("d1", "old text")])
+    index.add("coll", [("d1", "new text")])
+    assert index.count("coll") == 1
+    assert index.substring_search("coll", "old") == []
+    assert index.substring_search("coll", "new") == ["d1"]
+    index.remove("coll", ["d1"])
+    assert index.substring_search("coll", "new") == []
+    assert index.count("coll") == 0
+
+def test_sync_collection_fetches_only_missing_documents(index):
+    collection = DocCollection(docs={f"d{i}": f"doc number {i}" for i in range(5)})
+    index.add("coll", [("d0", "doc number 0"), ("gone", "deleted upstream")])
+    assert index.sync_collection(collection, page_size=2) == (4, 1)
+    assert index.doc_ids("coll") == set(collection.docs)
+    fetched = [g["ids"] for g in collection.gets if g["ids"] is not None]
+    assert sorted(sum(fetched, [])) == ["d1", "d2", "d3", "d4"]
+    collection.gets.clear()
+    assert index.sync_collection(collection) == (0, 0)
+    assert collection.gets == []
+
+def test_sync_collection_rereads_in_place_updates_at_a_new_generation(index):
+    collection = DocCollection(docs={"d1": "old text", "d2": "kept"})
+    assert index.sync_collection(collection, generation=1) == (2, 0)
+    collection.docs["d1"] = "new text"               # upserted in place: same ids, same count
+    assert index.sync_collection(collection, generation=1) == (0, 0)
+    assert index.sync_collection(collection, generation=2) == (1, 0)
+    assert index.substring_search("coll", "new") == ["d1"]
+    assert index.synced_generation("coll") == 2
+
+def test_advance_generation_requires_the_previous_one(index):
+    index.set_synced_generation("coll", 3)
+    index.advance_generation("coll", 4)
+    assert index.synced_generation("coll") == 4
+    index.advance_generation("coll", 6)              # generation 5 was not mirrored here
+    assert index.synced_generation("coll") == 4
+
+def test_indexing_helpers_keep_the_index_in_sync(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "index_manifest.sqlite3"))
+    lexical = lexical_index_for(manifest)
+    collection = DocCollection()
+    embed_and_write(collection, [("f1_0", "def divide(a, b):", {"filepath": "/p/f1.py"})],
+                    FakeEmbeddings(), lexical=lexical)
+    manifest.set_file_chunks(collection.name, "/p/f1.py", [("f1_0", "h0")])
+    assert lexical.substring_search("coll", "divide") == ["f1_0"]
+    lexical.sync_collection(collection, generation=manifest.generations(["coll"])["coll"])
+    assert remove_file_chunks(collection, "/p/f1.py", manifest) == 1
+    assert lexical.substring_search("coll", "divide") == []
+    assert lexical.synced_generation("coll") == manifest.generations(["coll"])["coll"]
+    manifest.close()
+
+def test_naive_search_uses_the_lexical_index(tmp_path):
+    chroma_path = tmp_path / "chroma_db"
+    chroma_path.mkdir()
+    collection = DocCollection("coll_a", {"a1": "nothing", "a2": "Division Error here", "a3": "division error too"})
+
+    class Client:
+        def get_or_create_collection(self, name):
+            return collection
+
+    searcher = aggscript.AggregatorSearcher(client=Client(), emb_model=object(), chroma_path=str(chroma_path))
+    results = searcher.search("division error", top_n=5, mode="naive", collections=["coll_a"])
+    assert [r["doc_id"] for r in results] == ["a2", "a3"]
+    assert [r["distance"] for r in results] == [9.0, 10.0]
+    assert results[0]["metadata"] == {"file": "a2.py"}
+    assert get_lexical_index(str(chroma_path)).count("coll_a") == 3
+    collection.gets.clear()
+    searcher.search("error", top_n=5, mode="naive", collections=["coll_a"])
+    assert all(g["ids"] is not None for g in collection.gets)   # nothing re-read at the same generation
+    searcher.close()
@@ -0,0 +1,117 @@
+"""
+test_poll_observer.py
+
+Checks the polling change detector used where inotify misses events (WSL drvfs):
+ - the first tick reports only differences from the manifest baseline
+ - file and directory renames are reported as moves
+ - idle ticks back off, activity snaps the interval back
+ - cold directories are rescanned round-robin, a slice per tick
+"""
+
+import os
+
+import pytest
+
+from scripts.poll_observer import PollingObserver, mount_fstype, watch_mode
+
+class Events:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, path, action):
+        self.calls.append((action, path))
+
+    def submit_move(self, src, dest, is_directory):
+        self.calls.append(("move_dir" if is_directory else "move", src, dest))
+
+def signature(path):
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns, "hash")
+
+def make_observer(root, events, known_states=None, **kwargs):
+    kwargs.setdefault("cpu_budget", 0)
+    return PollingObserver([str(root)], {"__pycache__"}, lambda fp: fp.endswith(".py"),
+                           events.submit, events.submit_move, known_states=known_states, **kwargs)
+
+def test_mount_fstype_and_watch_mode(tmp_path):
+    mounts = tmp_path / "mounts"
+    mounts.write_text("/dev/sdb / ext4 rw 0 0\nC:\\134 /mnt/c 9p rw 0 0\ndrvfs /mnt/f drvfs rw 0 0\n")
+    assert mount_fstype("/mnt/f/projects/x", str(mounts)) == "drvfs"
+    assert mount_fstype("/mnt/c", str(mounts)) == "9p"
+    assert mount_fstype("/home/me", str(mounts)) == "ext4"
+    assert watch_mode(["/anything"], "poll") == "poll"
+    with pytest.raises(ValueError):
+        watch_mode(["/anything"], "fanotify")
+
+def test_first_tick_reports_changes_since_manifest(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    for name in ("same.py", "edited.py", "pkg/new.py", "notes.md"):
+        (tmp_path / name).write_text(f"# {name}\n")
+    known = {str(tmp_path / "same.py"): signature(tmp_path / "same.py"),
+             str(tmp_path / "edited.py"): (1, 1, "old"),
+             str(tmp_path / "gone.py"): (5, 5, "old"),
+             str(tmp_path / "old_dir" / "x.py"): (7, 7, "old")}
+    events = Events()
+    make_observer(tmp_path, events, known).tick()
+    assert sorted(events.calls) == [
+        ("delete", str(tmp_path / "gone.py")),
+        ("delete", str(tmp_path / "old_dir" / "x.py")),
+        ("index", str(tmp_path / "edited.py")),
+        ("index", str(tmp_path / "pkg" / "new.py")),
+    ]
+
+def test_renames_become_moves(tmp_path):
+    (tmp_path / "pkg" / "sub").mkdir(parents=True)
+    (tmp_path / "a.py").write_text("a\n")
+    (tmp_path / "pkg" / "b.py").write_text("b\n")
+    (tmp_path / "pkg" / "sub" / "c.py").write_text("c\n")
+    events = Events()
+    observer = make_observer(tmp_path, events)
+    observer.tick()
+    events.calls.clear()
+
+    os.rename(tmp_path / "a.py", tmp_path / "renamed.py")
+    os.rename(tmp_path / "pkg", tmp_path / "lib")
+    observer.tick(now=1e9)
+    assert sorted(events.calls) == [
+        ("move", str(tmp_path / "a.py"), str(tmp_path / "renamed.py")),
+        ("move_dir", str(tmp_path / "pkg"), str(tmp_path / "lib")),
+    ]
+
+    # The snapshot follows the move: editing the moved file is a plain modification
+    events.calls.clear()
+    (tmp_path / "lib" / "sub" / "c.py").write_text("changed\n")
+    for _ in range(3):
+        observer.tick(now=1e9 + 1)
+    assert events.calls == [("index", str(tmp_path / "lib" / "sub" / "c.py"))]
+
+def test_interval_adapts(tmp_path):
+    (tmp_path / "a.py").write_text("a\n")
+    events = Events()
+    observer = make_observer(tmp_path, events, min_interval=0.5, max_interval=4.0)
+    observer.tick()
+    observer.tick()
+    observer.tick()
+    assert observer.interval == 2.0
+    observer.tick()
+    observer.tick()
+    assert observer.interval == 4.0
+    (tmp_path / "b.py").write_text("b\n")
+    observer.tick()
+    assert observer.interval == 0.5
+
+def test_cold_directories_scanned_round_robin(tmp_path):
+    for name in ("d1", "d2", "d3"):
+        (tmp_path / name).mkdir()
+    events = Events()
+    observer = make_observer(tmp_path, events, hot_seconds=0)
+    observer.tick()
+    scanned = observer.stats["dirs_scanned"]
+    observer.tick()
+    assert observer.stats["dirs_scanned"] == scanned + 1
+
+    # A new file is found within one full round of ticks
+    (tmp_path / "d2" / "x.py").write_text("x\n")
+    for _ in range(4):
+        observer.tick()
+    assert events.calls == [("index", str(tmp_path / "d2" / "x.py"))]
@@ -0,0 +1,77 @@
+"""
+test_python_chunking.py
+
+Checks the AST symbol chunker in index_codebase.py:
+ - one chunk per top-level function, method, class body and module-level block
+ - function_name / class_name / node_type metadata is filled in
+ - editing one function changes exactly one chunk hash
+ - symbols over the token budget fall back to overlapping windows that keep the symbol name
+"""
+
+import scripts.index_codebase as idx
+
+SOURCE = '''"""Module docstring."""
+import os
+
+LIMIT = 3
+
+# Divides two numbers
+def divide(a, b):
+    return a / b
+
+class Calculator:
+    factor = 2
+
+    @staticmethod
+    def double(x):
+        return x * 2
+
+    async def fetch(self):
+        def helper():
+            return 1
+        return helper()
+
+if __name__ == "__main__":
+    print(divide(1, 2))
+'''
+
+def chunk_metas(tmp_path, source):
+    path = tmp_path / "calc.py"
+    path.write_text(source)
+    return [(text, meta) for _, text, meta in idx.build_file_chunks(str(path))]
+
+def test_symbol_chunks_and_metadata(tmp_path):
+    chunks = chunk_metas(tmp_path, SOURCE)
+    summary = [(m["node_type"], m["class_name"], m["function_name"], m["start_line"], m["end_line"]) for _, m in chunks]
+    assert summary == [
+        ("module", "", "", 1, 5),
+        ("function", "", "divide", 6, 8),
+        ("class", "Calculator", "", 10, 12),
+        ("method", "Calculator", "double", 13, 15),
+        ("async_method", "Calculator", "fetch", 17, 20),
+        ("module", "", "", 21, 23),
+    ]
+    assert chunks[1][0].startswith("# Divides two numbers\ndef divide")
+    assert "def helper" in chunks[4][0]  # nested functions stay in their parent
+    assert chunks[4][1]["qualified_name"] == "Calculator.fetch"
+
+def test_single_function_edit_changes_one_chunk(tmp_path):
+    before = [m["hash"] for _, m in chunk_metas(tmp_path, SOURCE)]
+    after = [m["hash"] for _, m in chunk_metas(tmp_path, SOURCE.replace("return x * 2", "return x + x"))]
+    assert len(before) == len(after)
+    assert sum(b != a for b, a in zip(before, after)) == 1
+
+def test_oversized_function_is_windowed(tmp_path, monkeypatch):
+    monkeypatch.setattr(idx, "CHUNK_MAX_TOKENS", 40)
+    monkeypatch.setattr(idx, "CHUNK_OVERLAP_TOKENS", 8)
+    body = "".join(f"    x{i} = {i}\n" for i in range(25))
+    chunks = chunk_metas(tmp_path, "def big():\n" + body + "    return x0\n")
+    assert len(chunks) > 1
+    assert {m["function_name"] for _, m in chunks} == {"big"}
+    assert all(m["token_count"] <= 40 for _, m in chunks)
+    assert chunks[1][1]["start_line"] <= chunks[0][1]["end_line"]  # windows overlap
+    assert chunks[-1][1]["end_line"] == 27  # every line is covered
+
+def test_unparsable_python_falls_back_to_windows(tmp_path):
+    chunks = chunk_metas(tmp_path, "def broken(:\n    pass\n")
+    assert [m["node_type"] for _, m in chunks] == ["lines"]
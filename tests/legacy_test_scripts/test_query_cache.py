@@ -0,0 +1,111 @@
+"""
+test_query_cache.py
+
+Checks the LRU + TTL query cache (generation invalidation, expiry, eviction, stats),
+the manifest's collection generation counters (also bumped by direct Chroma writers),
+and that AggregatorSearcher only searches the collections written to since a query was
+cached, recording retrievals only for what it actually searched.
+"""
+
+import pytest
+
+import scripts.aggregator_search as aggscript
+from scripts.index_manifest import IndexManifest, bump_collection_generation, get_manifest
+from scripts.query_cache import QueryCache
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class CountingCollection:
+    def __init__(self, name, docs):
+        self.name = name
+        self.docs = docs
+        self.queries = 0
+
+    def query(self, query_embeddings, n_results):
+        self.queries += 1
+        ids = list(self.docs)[:n_results]
+        return {"ids": [ids], "documents": [[self.docs[i] for i in ids]],
+                "metadatas": [[{"filepath": f"/p/{i}.py"} for i in ids]], "distances": [[0.5 for _ in ids]]}
+
+class Client:
+    def __init__(self, data):
+        self.collections = {name: CountingCollection(name, docs) for name, docs in data.items()}
+
+    def get_or_create_collection(self, name):
+        return self.collections[name]
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.queries = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return [1.0, 0.0]
+
+def test_cache_hit_and_generation_invalidation():
+    cache = QueryCache()
+    cache.put("k", 1, ["hit"], cost_seconds=0.5)
+    assert cache.get("k", 1) == ["hit"]
+    assert cache.get("k", 2) is None
+    assert cache.get("k", 1) is None            # dropped on invalidation
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidated"]) == (1, 2, 1)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+    assert stats["saved_seconds"] == pytest.approx(0.5)
+
+def test_cache_ttl_and_lru_eviction():
+    clock = Clock()
+    cache = QueryCache(max_entries=2, ttl=10, clock=clock)
+    cache.put("a", 0, "A")
+    cache.put("b", 0, "B")
+    assert cache.get("a", 0) == "A"             # "b" is now least recently used
+    cache.put("c", 0, "C")
+    assert cache.get("b", 0) is None
+    clock.now = 11
+    assert cache.get("a", 0) is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["evicted"] == 1
+
+def test_manifest_generations_only_grow(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "index_manifest.sqlite3"))
+    assert manifest.generations(["c1", "c2"]) == {"c1": 0, "c2": 0}
+    assert manifest.bump_generation("c1") == 1
+    manifest.clear_collection("c1")
+    assert manifest.generations(["c1", "c2"]) == {"c1": 2, "c2": 0}
+    manifest.close()
+
+def test_bump_collection_generation_for_direct_writers(tmp_path):
+    assert bump_collection_generation("logs", str(tmp_path / "missing")) is None
+    assert bump_collection_generation("logs", str(tmp_path)) == 1
+    assert get_manifest(str(tmp_path)).generations(["logs"]) == {"logs": 1}
+
+def test_searcher_only_requeries_changed_collections(tmp_path):
+    chroma_path = tmp_path / "chroma_db"
+    chroma_path.mkdir()
+    client = Client({"coll_a": {"a1": "division error in a"}, "coll_b": {"b1": "division error in b"}})
+    emb = FakeEmbeddings()
+    searcher = aggscript.AggregatorSearcher(client=client, emb_model=emb, chroma_path=str(chroma_path),
+                                            cache=QueryCache())
+    first = searcher.search("division error", top_n=2, collections=["coll_a", "coll_b"])
+    first[0]["document"] = "mutated by the caller"
+    second = searcher.search("division error", top_n=2, collections=["coll_a", "coll_b"])
+    assert [r["doc_id"] for r in second] == ["a1", "b1"]
+    assert second[0]["document"] == "division error in a"
+    assert emb.queries == 1
+    assert [c.queries for c in client.collections.values()] == [1, 1]
+
+    get_manifest(str(chroma_path)).bump_generation("coll_b")
+    searcher.search("division error", top_n=2, collections=["coll_a", "coll_b"])
+    assert [c.queries for c in client.collections.values()] == [1, 2]
+    searcher.search("division error", top_n=1, collections=["coll_a"])
+    assert client.collections["coll_a"].queries == 2     # top_n is part of the key
+    stats = searcher.cache.stats()
+    assert stats["hits"] == 3 and stats["invalidated"] == 1
+    counts = get_manifest(str(chroma_path)).retrieval_counts
+    assert counts("coll_a") == {"/p/a1.py": 2}          # first search and the top_n=1 one
+    assert counts("coll_b") == {"/p/b1.py": 2}          # first search and after the bump
+    searcher.close()
@@ -0,0 +1,180 @@
+"""
+test_recall_daemon.py
+
+Checks the resident recall daemon over a real Unix socket (fake model and Chroma client):
+ - embed / upsert / get / query / delete round-trips through RemoteClient
+ - add/upsert without embeddings are embedded with the daemon's model
+ - aggregator_search runs inside the daemon when it serves CHROMA_PATH
+ - write ops are mirrored into the lexical index, which stays at the collection's generation
+ - with no daemon, the factories fall back to in-process objects
+ - a daemon that goes away is forgotten and Remote* objects carry on in-process
+ - each calling thread gets its own connection
+"""
+
+import threading
+
+import pytest
+
+import scripts.recall_daemon as rd
+import scripts.aggregator_search as aggscript
+from scripts.index_manifest import get_manifest
+from scripts.lexical_index import get_lexical_index
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+
+    def upsert(self, ids, documents, metadatas=None, embeddings=None):
+        for i, doc_id in enumerate(ids):
+            self.docs[doc_id] = (documents[i], (metadatas or [{}] * len(ids))[i], embeddings[i])
+
+    add = upsert
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        for i, doc_id in enumerate(ids):
+            doc, meta, emb = self.docs[doc_id]
+            self.docs[doc_id] = (documents[i] if documents else doc, meta, emb)
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        matched = [i for i in self.docs if ids is None or i in ids][:limit]
+        return {"ids": matched, "documents": [self.docs[i][0] for i in matched],
+                "metadatas": [self.docs[i][1] for i in matched]}
+
+    def query(self, query_embeddings, n_results=10, include=None):
+        q = query_embeddings[0][0]
+        ranked = sorted(self.docs, key=lambda i: abs(self.docs[i][2][0] - q))[:n_results]
+        return {"ids": [ranked], "documents": [[self.docs[i][0] for i in ranked]],
+                "metadatas": [[self.docs[i][1] for i in ranked]],
+                "distances": [[abs(self.docs[i][2][0] - q) for i in ranked]]}
+
+    def delete(self, ids=None, where=None):
+        for i in ids or [i for i in self.docs if where and self.docs[i][1].items() >= where.items()]:
+            self.docs.pop(i, None)
+
+    def count(self):
+        return len(self.docs)
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name):
+        return self.collections.setdefault(name, FakeCollection(name))
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    socket_path = str(tmp_path / "recall.sock")
+    monkeypatch.setattr(rd, "DEFAULT_SOCKET_PATH", socket_path)
+    monkeypatch.setattr(rd, "_daemon", None)
+    monkeypatch.setattr(rd, "_daemon_failed_at", 0.0)
+    d = rd.RecallDaemon(socket_path, chroma_path=aggscript.CHROMA_PATH,
+                        client=FakeClient(), embed_model=FakeEmbeddings()).start()
+    yield d
+    d.stop()
+    if rd._daemon is not None:
+        rd._daemon.close()
+
+def test_collection_round_trip(daemon):
+    client = rd.get_chroma_client(aggscript.CHROMA_PATH)
+    assert isinstance(client, rd.RemoteClient)
+    coll = client.get_or_create_collection("notes")
+    coll.upsert(ids=["a", "bb"], documents=["x", "division error"], metadatas=[{"k": 1}, {"k": 2}])
+    assert daemon.client.collections["notes"].docs["a"][2] == [1.0, 1.0]   # embedded in the daemon
+    assert coll.count() == 2
+    assert coll.get(ids=["bb"])["metadatas"] == [{"k": 2}]
+    res = coll.query(query_texts=["division errors"], n_results=1)
+    assert res["ids"] == [["bb"]]
+    coll.delete(ids=["a"])
+    assert coll.get()["ids"] == ["bb"]
+
+    emb = rd.get_embed_model()
+    assert isinstance(emb, rd.RemoteEmbeddings)
+    assert emb.embed_documents(["abc"]) == [[3.0, 1.0]]
+    assert emb.embed_query("ab") == [2.0, 1.0]
+
+def test_errors_are_reported(daemon):
+    client = rd.daemon_client()
+    with pytest.raises(rd.RecallDaemonError, match="Unknown op"):
+        client.call("explode")
+    assert client.call("ping")["errors"] == 1
+
+def test_aggregator_search_runs_in_daemon(daemon, monkeypatch):
+    coll = daemon.client.get_or_create_collection("test_agg_coll1")
+    coll.upsert(ids=["d1"], documents=["division error here"], embeddings=[[19.0, 1.0]], metadatas=[{"file": "div.py"}])
+    monkeypatch.setattr(aggscript, "COLLECTIONS_TO_QUERY", ["test_agg_coll1"])
+    monkeypatch.setattr(aggscript, "local_chroma_client", lambda path: pytest.fail("should not run in-process"))
+    results = aggscript.aggregator_search("division error", top_n=1)
+    assert [r["doc_id"] for r in results] == ["d1"]
+    assert results[0]["metadata"] == {"file": "div.py"}
+
+def test_writes_are_mirrored_into_the_lexical_index(tmp_path):
+    chroma_path = tmp_path / "chroma_db"
+    chroma_path.mkdir()
+    d = rd.RecallDaemon(str(tmp_path / "unused.sock"), chroma_path=str(chroma_path),
+                        client=FakeClient(), embed_model=FakeEmbeddings())
+    lexical = get_lexical_index(str(chroma_path))
+    lexical.set_synced_generation("notes", 0)
+    d.handle({"op": "upsert", "collection": "notes", "ids": ["a", "b"], "documents": ["old note", "other"]})
+    d.handle({"op": "update", "collection": "notes", "ids": ["a"], "documents": ["new note"]})
+    d.handle({"op": "delete", "collection": "notes", "ids": ["b"]})
+    assert lexical.substring_search("notes", "note") == ["a"]
+    assert lexical.substring_search("notes", "old") == []
+    assert lexical.synced_generation("notes") == get_manifest(str(chroma_path)).generations(["notes"])["notes"] == 3
+    d.handle({"op": "delete", "collection": "notes", "where": {"k": 1}})
+    assert lexical.synced_generation("notes") == 3        # not mirrored: the searcher re-reads it
+
+def test_lost_daemon_falls_back_in_process(daemon, monkeypatch):
+    local_client = FakeClient()
+    monkeypatch.setattr(rd, "_local_clients", {})
+    monkeypatch.setattr(rd, "_local_models", {False: FakeEmbeddings()})
+    monkeypatch.setattr(rd, "local_chroma_client", lambda path: local_client)
+    client = rd.daemon_client()
+    coll = rd.get_chroma_client(aggscript.CHROMA_PATH).get_or_create_collection("notes")
+    coll.upsert(ids=["a"], documents=["remote"])
+    daemon.stop()
+    client.close()
+    coll.upsert(ids=["b"], documents=["local"])
+    assert list(local_client.collections["notes"].docs) == ["b"]
+    assert local_client.collections["notes"].docs["b"][2] == [5.0, 1.0]
+    assert coll.count() == 1
+    assert rd._daemon is None and rd._daemon_failed_at > 0
+    assert rd.daemon_client() is None
+    assert isinstance(rd.get_embed_model(), FakeEmbeddings)
+
+def test_threads_get_their_own_connection(daemon):
+    client = rd.daemon_client()
+    started = threading.Barrier(3)
+
+    def ping():
+        started.wait()
+        client.call("ping")
+
+    threads = [threading.Thread(target=ping) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(client._conns) == 4          # plus the main thread's ping
+
+def test_fallback_without_daemon(tmp_path, monkeypatch):
+    monkeypatch.setattr(rd, "DEFAULT_SOCKET_PATH", str(tmp_path / "missing.sock"))
+    monkeypatch.setattr(rd, "_daemon", None)
+    local = FakeEmbeddings()
+    monkeypatch.setattr(rd, "_local_models", {False: local})
+    monkeypatch.setattr(rd, "local_chroma_client", lambda path: "local-client")
+    assert rd.daemon_client() is None
+    assert rd.get_embed_model() is local
+    assert rd.get_chroma_client("/some/chroma") == "local-client"
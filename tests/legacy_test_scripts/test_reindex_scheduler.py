@@ -0,0 +1,146 @@
+"""
+test_reindex_scheduler.py
+
+Checks the coalescing watcher scheduler:
+ - repeated events for one path run a single job after the debounce window
+ - the latest action for a path wins
+ - no more than max_workers jobs run at once, and a saturated pool does not busy-wait
+ - a burst past storm_threshold runs one reconcile pass instead of per-path jobs
+ - renames become one move job that absorbs the old path's pending work
+ - work for a move's old path waits until the move has finished
+"""
+
+import time
+import threading
+
+from scripts.reindex_scheduler import ReindexScheduler
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _record(self, kind, path):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+            self.calls.append((kind, path))
+
+    def index(self, path):
+        self._record("index", path)
+
+    def delete(self, path):
+        self._record("delete", path)
+
+    def reconcile(self):
+        self._record("reconcile", None)
+
+def make_scheduler(rec, **kwargs):
+    kwargs.setdefault("debounce_seconds", 0.05)
+    return ReindexScheduler(rec.index, rec.delete, reconcile_fn=rec.reconcile, **kwargs).start()
+
+def test_events_coalesce_per_path():
+    rec = Recorder()
+    sched = make_scheduler(rec)
+    for _ in range(50):
+        sched.submit("/repo/a.py")
+    sched.submit("/repo/b.py")
+    assert sched.wait_idle(timeout=5)
+    sched.stop()
+    assert sorted(rec.calls) == [("index", "/repo/a.py"), ("index", "/repo/b.py")]
+    assert sched.stats["coalesced"] == 49
+
+def test_latest_action_wins():
+    rec = Recorder()
+    sched = make_scheduler(rec)
+    sched.submit("/repo/a.py", "index")
+    sched.submit("/repo/a.py", "delete")
+    assert sched.wait_idle(timeout=5)
+    sched.stop()
+    assert rec.calls == [("delete", "/repo/a.py")]
+
+def test_worker_pool_is_bounded():
+    rec = Recorder(delay=0.05)
+    sched = make_scheduler(rec, max_workers=2, storm_threshold=1000)
+    for i in range(8):
+        sched.submit(f"/repo/f{i}.py")
+    assert sched.wait_idle(timeout=10)
+    sched.stop()
+    assert len(rec.calls) == 8
+    assert rec.max_active <= 2
+
+def test_storm_switches_to_single_reconcile():
+    rec = Recorder()
+    sched = make_scheduler(rec, storm_threshold=20)
+    for i in range(500):
+        sched.submit(f"/repo/f{i}.py")
+    assert sched.wait_idle(timeout=5)
+    sched.stop()
+    assert rec.calls == [("reconcile", None)]
+    assert sched.stats["storms"] == 1
+
+def test_moves_coalesce_with_pending_work():
+    rec = Recorder()
+    moves = []
+    sched = ReindexScheduler(rec.index, rec.delete, reconcile_fn=rec.reconcile,
+                             move_fn=lambda src, dest: moves.append((src, dest)),
+                             debounce_seconds=0.05).start()
+    sched.submit("/repo/a.py", "index")
+    sched.submit_move("/repo/a.py", "/repo/b.py")
+    sched.submit_move("/repo/b.py", "/repo/c.py")
+    sched.submit("/repo/c.py", "index")
+    sched.submit_move("/repo/x.py", "/repo/y.py")
+    sched.submit("/repo/y.py", "delete")
+    assert sched.wait_idle(timeout=5)
+    sched.stop()
+    assert moves == [("/repo/a.py", "/repo/c.py")]
+    assert sorted(rec.calls) == [("delete", "/repo/x.py"), ("delete", "/repo/y.py")]
+
+def test_index_of_a_moved_path_waits_for_the_move():
+    spans = {}
+
+    def move(src, dest):
+        spans["move"] = (time.monotonic(), None)
+        time.sleep(0.2)
+        spans["move"] = (spans["move"][0], time.monotonic())
+
+    def index(path):
+        spans["index"] = time.monotonic()
+
+    sched = ReindexScheduler(index, lambda path: None, move_fn=move, debounce_seconds=0.02).start()
+    sched.submit_move("/repo/a.py", "/repo/a.py~")      # backup-style save ...
+    time.sleep(0.08)
+    sched.submit("/repo/a.py", "index")                 # ... then a new a.py
+    assert sched.wait_idle(timeout=5)
+    sched.stop()
+    assert spans["index"] >= spans["move"][1]
+
+class CountingCondition(threading.Condition):
+    def __init__(self):
+        super().__init__()
+        self.waits = 0
+
+    def wait(self, timeout=None):
+        self.waits += 1
+        return super().wait(timeout)
+
+def test_saturated_pool_waits_for_a_free_worker():
+    rec = Recorder(delay=0.5)
+    sched = ReindexScheduler(rec.index, rec.delete, debounce_seconds=0.01, max_workers=1)
+    sched._cond = CountingCondition()
+    sched.start()
+    sched.submit("/repo/a.py")
+    sched.submit("/repo/b.py")
+    time.sleep(0.3)                 # a.py running, b.py past due with no free worker
+    waits = sched._cond.waits
+    time.sleep(0.15)
+    assert sched._cond.waits - waits <= 1
+    assert sched.wait_idle(timeout=5)
+    sched.stop()
+    assert sorted(rec.calls) == [("index", "/repo/a.py"), ("index", "/repo/b.py")]
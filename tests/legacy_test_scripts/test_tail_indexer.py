@@ -0,0 +1,123 @@
+"""
+test_tail_indexer.py
+
+Checks append-aware log indexing:
+ - an append only embeds the open (last) chunk and the new chunks
+ - truncation and rotation trigger a full rebuild
+ - streaming in small line batches gives the same chunks as one pass
+"""
+
+import os
+import hashlib
+
+import pytest
+
+from scripts.index_manifest import IndexManifest
+from scripts.tail_indexer import index_file_tail
+from scripts.token_chunker import RegexTokenCounter
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+class FakeCollection:
+    def __init__(self, name="logs"):
+        self.name = name
+        self.docs = {}
+
+    def get(self, ids=None, where=None, include=None):
+        key, value = next(iter(where.items()))
+        return {"ids": [i for i, meta in self.docs.items() if meta[1].get(key) == value]}
+
+    def delete(self, ids):
+        for i in ids:
+            self.docs.pop(i, None)
+
+    def add(self, ids, documents, embeddings, metadatas):
+        for doc_id, doc, meta in zip(ids, documents, metadatas):
+            assert doc_id not in self.docs, f"duplicate id {doc_id}"
+            self.docs[doc_id] = (doc, meta)
+
+def make_meta(filepath, chunk_index, chunk_hash, start_line, end_line, token_count, mod_time):
+    return {"filepath": filepath, "chunk_index": chunk_index, "hash": chunk_hash,
+            "start_line": start_line, "end_line": end_line, "token_count": token_count}
+
+def md5(text):
+    return hashlib.md5(text.strip().encode("utf-8")).hexdigest()
+
+@pytest.fixture
+def env(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    yield tmp_path, FakeCollection(), FakeEmbeddings(), manifest
+    manifest.close()
+
+def log_lines(start, n):
+    return "".join(f"2025-01-01 INFO request {i} handled in {i % 7} ms\n" for i in range(start, start + n))
+
+def run(coll, emb, manifest, path, **kwargs):
+    kwargs.setdefault("max_tokens", 60)
+    kwargs.setdefault("overlap_tokens", 0)
+    kwargs.setdefault("counter", RegexTokenCounter())
+    return index_file_tail(coll, str(path), emb, manifest, make_meta, md5, **kwargs)
+
+def stored_texts(coll):
+    return [doc for doc, meta in sorted(coll.docs.values(), key=lambda d: d[1]["chunk_index"])]
+
+def test_append_only_embeds_tail(env):
+    tmp_path, coll, emb, manifest = env
+    path = tmp_path / "agent_debug.log"
+    path.write_text(log_lines(0, 40))
+    first = run(coll, emb, manifest, path)
+    assert first["added"] == len(coll.docs) > 2
+    sealed_before = {i: d for i, d in coll.docs.items() if d[1]["chunk_index"] < len(coll.docs) - 1}
+
+    with open(path, "a") as f:
+        f.write(log_lines(40, 3))
+    emb.texts.clear()
+    second = run(coll, emb, manifest, path)
+
+    assert second["rebuilt"] is None
+    assert second["added"] <= 2           # the re-opened last chunk (+ one spill-over)
+    assert len(emb.texts) == second["added"]
+    for doc_id, doc in sealed_before.items():
+        assert coll.docs[doc_id] == doc   # sealed chunks untouched
+    assert "request 42 " in stored_texts(coll)[-1]
+    assert sorted(manifest.chunk_ids("logs", str(path))) == sorted(coll.docs)
+
+    emb.texts.clear()
+    assert run(coll, emb, manifest, path)["added"] == 0   # nothing new
+    assert emb.texts == []
+
+def test_truncation_and_rotation_rebuild(env):
+    tmp_path, coll, emb, manifest = env
+    path = tmp_path / "blueprint_debug.log"
+    path.write_text(log_lines(0, 30))
+    run(coll, emb, manifest, path)
+
+    path.write_text(log_lines(100, 5))   # truncated + rewritten in place
+    stats = run(coll, emb, manifest, path)
+    assert stats["rebuilt"] == "truncated"
+    assert all("request 1" in d for d in stored_texts(coll))
+
+    rotated = tmp_path / "rotated.tmp"
+    rotated.write_text(log_lines(100, 5) + log_lines(200, 5))
+    os.replace(rotated, path)            # new inode, longer than before
+    stats = run(coll, emb, manifest, path)
+    assert stats["rebuilt"] == "rotated"
+    assert "request 204 " in stored_texts(coll)[-1]
+
+def test_small_batches_match_single_pass(env):
+    tmp_path, coll, emb, manifest = env
+    path = tmp_path / "big.log"
+    path.write_text(log_lines(0, 200))
+    run(coll, emb, manifest, path)
+    single = stored_texts(coll)
+
+    coll2 = FakeCollection("logs_batched")
+    run(coll2, emb, manifest, path, batch_lines=17)
+    assert stored_texts(coll2) == single
+    assert "".join(single).count("request 199 ") == 1
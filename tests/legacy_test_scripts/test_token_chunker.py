@@ -0,0 +1,43 @@
+"""
+test_token_chunker.py
+
+Checks token-budget chunking:
+ - no chunk exceeds max_tokens and every line lands in some chunk
+ - consecutive chunks overlap by at most overlap_tokens worth of lines
+ - over-budget single lines are split on token boundaries
+"""
+
+from scripts.token_chunker import RegexTokenCounter, chunk_lines_by_tokens
+
+counter = RegexTokenCounter()
+
+def test_chunks_respect_budget_and_cover_all_lines():
+    lines = [f"value_{i} = compute(alpha, beta, {i})" for i in range(60)]
+    chunks = chunk_lines_by_tokens(lines, max_tokens=50, overlap_tokens=10, counter=counter)
+    assert len(chunks) > 1
+    assert all(count <= 50 for _, _, _, count in chunks)
+    assert chunks[0][1] == 0 and chunks[-1][2] == 59
+    for (_, _, prev_end, _), (_, start, _, _) in zip(chunks, chunks[1:]):
+        assert start <= prev_end + 1                 # no gaps
+        overlap_lines = lines[start:prev_end + 1]
+        assert sum(counter.count_many(overlap_lines)) <= 10
+
+def test_token_count_matches_counter():
+    lines = ["def f(x):", "    return x + 1", "", "print(f(2))"]
+    (text, start, end, count), = chunk_lines_by_tokens(lines, max_tokens=100, counter=counter)
+    assert (start, end) == (0, 3)
+    assert count == sum(counter.count_many(lines))
+    assert text == "\n".join(lines)
+
+def test_start_idx_offsets_line_numbers():
+    chunks = chunk_lines_by_tokens(["a b c", "d e f"], start_idx=10, max_tokens=3, overlap_tokens=0, counter=counter)
+    assert [(s, e) for _, s, e, _ in chunks] == [(10, 10), (11, 11)]
+
+def test_long_line_is_split_on_token_boundaries():
+    line = " ".join(f"word{i}" for i in range(100))  # 200 regex tokens
+    chunks = chunk_lines_by_tokens(["short line", line, "tail"], max_tokens=64, overlap_tokens=8, counter=counter)
+    pieces = [c for c in chunks if c[1] == 1]
+    assert len(pieces) > 1
+    assert all(count <= 64 for _, _, _, count in pieces)
+    assert pieces[0][0].startswith("word0") and pieces[-1][0].endswith("word99")
+    assert chunks[0][0] == "short line" and chunks[-1][0] == "tail"